@@ -1,5 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q
 from .models_messaging import Conversacion, Mensaje
 from .models import (
     Usuario, Categoria, Curso, Tutoria, Reseña, Pago, Reserva,
@@ -51,7 +52,7 @@ class ReseñaAdmin(admin.ModelAdmin):
 
 @admin.register(Tutoria)
 class TutoriaAdmin(admin.ModelAdmin):
-    list_display = ('id_tutoria', 'curso', 'fecha_tutoria','modalidad_tutoria', 'duracion', 'estado')
+    list_display = ('id_tutoria', 'curso', 'fecha_tutoria', 'hora_tutoria', 'modalidad_tutoria', 'duracion', 'estado')
     list_filter = ('estado', 'curso')
 
 
@@ -81,18 +82,50 @@ class BloqueoHorarioAdmin(admin.ModelAdmin):
     search_fields = ('usuario__username', 'usuario__email', 'motivo')
 
 
+class MensajeriaAdminMixin:
+    """Admin de los modelos de la base de mensajería: usuarios y cursos están
+    en la otra base, así que se traen con prefetch en vez de JOIN y la
+    búsqueda por usuario resuelve primero los ids en la base principal."""
+    campos_usuario = ()
+    list_select_related = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        base = queryset
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            ids = list(
+                Usuario.objects.filter(Q(username__icontains=search_term) | Q(email__icontains=search_term))
+                .values_list('pk', flat=True)
+            )
+            if ids:
+                filtro = Q()
+                for campo in self.campos_usuario:
+                    filtro |= Q(**{f'{campo}_id__in': ids})
+                queryset |= base.filter(filtro)
+        return queryset, may_have_duplicates
+
+
 @admin.register(Conversacion)
-class ConversacionAdmin(admin.ModelAdmin):
+class ConversacionAdmin(MensajeriaAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'tutor', 'estudiante', 'curso', 'estado_solicitud', 'unread_tutor', 'unread_estudiante', 'created_at', 'updated_at')
     list_filter = ('estado_solicitud', 'tutor')
-    search_fields = ('tutor__username', 'tutor__email', 'estudiante__username', 'estudiante__email')
+    search_fields = ('ultimo_mensaje_preview',)
+    campos_usuario = ('tutor', 'estudiante')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('tutor', 'estudiante', 'curso')
 
 
 @admin.register(Mensaje)
-class MensajeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'conversacion', 'remitente', 'preview', 'creado_en', 'leido')
-    list_filter = ('leido', 'remitente')
-    search_fields = ('remitente__username', 'remitente__email', 'contenido')
+class MensajeAdmin(MensajeriaAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'conversacion', 'remitente', 'preview', 'creado_en')
+    list_filter = ('remitente',)
+    list_select_related = ('conversacion',)
+    search_fields = ('contenido',)
+    campos_usuario = ('remitente',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('remitente')
 
     def preview(self, obj):
         return (obj.contenido or '')[:40]
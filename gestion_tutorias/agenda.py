@@ -0,0 +1,246 @@
+"""Motor de horarios libres de los tutores.
+
+Expande los bloques semanales de ``DisponibilidadSemanal`` en la zona horaria
+del tutor, les resta los ``BloqueoHorario`` y las ``Tutoria`` ya agendadas y
+corta lo que queda en sesiones de ``duracion_sesion_minutos``.
+
+Todos los intervalos se manejan como tuplas ``(inicio, fin)`` de datetimes
+con zona horaria, semiabiertos ``[inicio, fin)``.
+"""
+import threading
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Usuario, DisponibilidadSemanal, BloqueoHorario, Tutoria, FranjaLibre
+
+# Ventana máxima que se puede consultar de una sola vez
+MAX_DIAS_CONSULTA = 56
+# Horizonte cubierto por el índice de franjas libres
+HORIZONTE_INDICE_DIAS = 56
+
+
+def zona_del_tutor(tutor):
+    try:
+        return ZoneInfo(tutor.zona_horaria or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.get_default_timezone()
+
+
+def fusionar(intervalos):
+    """Ordena y une intervalos solapados o contiguos."""
+    resultado = []
+    for inicio, fin in sorted(intervalos):
+        if resultado and inicio <= resultado[-1][1]:
+            if fin > resultado[-1][1]:
+                resultado[-1] = (resultado[-1][0], fin)
+        else:
+            resultado.append((inicio, fin))
+    return resultado
+
+
+def restar(base, quitar):
+    """Resta a ``base`` los intervalos de ``quitar`` en una sola pasada."""
+    base = fusionar(base)
+    quitar = fusionar(quitar)
+    resultado = []
+    j = 0
+    for inicio, fin in base:
+        # Saltar los recortes que terminan antes de este intervalo
+        while j < len(quitar) and quitar[j][1] <= inicio:
+            j += 1
+        k = j
+        actual = inicio
+        while k < len(quitar) and quitar[k][0] < fin:
+            if quitar[k][0] > actual:
+                resultado.append((actual, quitar[k][0]))
+            actual = max(actual, quitar[k][1])
+            k += 1
+        if actual < fin:
+            resultado.append((actual, fin))
+    return resultado
+
+
+def expandir_semana(bloques, desde, hasta, tz):
+    """Convierte bloques ``(dia_semana, hora_inicio, hora_fin)`` en intervalos
+    concretos (en UTC) para cada fecha entre ``desde`` y ``hasta`` inclusive."""
+    por_dia = {}
+    for dia, hora_inicio, hora_fin in bloques:
+        por_dia.setdefault(dia, []).append((hora_inicio, hora_fin))
+
+    intervalos = []
+    fecha = desde
+    while fecha <= hasta:
+        for hora_inicio, hora_fin in por_dia.get(fecha.weekday(), ()):
+            inicio = datetime.combine(fecha, hora_inicio, tzinfo=tz)
+            fin = datetime.combine(fecha, hora_fin, tzinfo=tz)
+            intervalos.append((inicio.astimezone(dt_timezone.utc), fin.astimezone(dt_timezone.utc)))
+        fecha += timedelta(days=1)
+    return intervalos
+
+
+def detectar_solapamientos(bloques):
+    """Pares de índices de bloques semanales activos que se superponen.
+
+    ``bloques`` es una lista de dicts con ``dia_semana``, ``hora_inicio``,
+    ``hora_fin`` y opcionalmente ``activo``. Se ordena una vez y se barre
+    cada día manteniendo solo los bloques que siguen abiertos.
+    """
+    orden = sorted(
+        (i for i, b in enumerate(bloques) if b.get('activo', True)),
+        key=lambda i: (bloques[i]['dia_semana'], bloques[i]['hora_inicio']),
+    )
+    pares = []
+    abiertos = []
+    dia_actual = None
+    for i in orden:
+        bloque = bloques[i]
+        if bloque['dia_semana'] != dia_actual:
+            dia_actual = bloque['dia_semana']
+            abiertos = []
+        abiertos = [j for j in abiertos if bloques[j]['hora_fin'] > bloque['hora_inicio']]
+        pares.extend((j, i) for j in abiertos)
+        abiertos.append(i)
+    return pares
+
+
+def cortar(intervalos, minutos):
+    """Divide cada intervalo en sesiones consecutivas de ``minutos``."""
+    paso = timedelta(minutes=minutos)
+    slots = []
+    for inicio, fin in intervalos:
+        while inicio + paso <= fin:
+            slots.append((inicio, inicio + paso))
+            inicio += paso
+    return slots
+
+
+def intervalos_libres(tutor, desde, hasta, ahora=None):
+    """Intervalos libres (UTC, ya fusionados) del tutor entre dos fechas locales.
+
+    Hace una consulta por fuente: disponibilidad semanal, bloqueos y tutorías.
+    """
+    tz = zona_del_tutor(tutor)
+    ventana_inicio = datetime.combine(desde, time.min, tzinfo=tz)
+    ventana_fin = datetime.combine(hasta + timedelta(days=1), time.min, tzinfo=tz)
+
+    bloques = (
+        DisponibilidadSemanal.objects
+        .filter(usuario=tutor, activo=True)
+        .values_list('dia_semana', 'hora_inicio', 'hora_fin')
+    )
+    ocupados = list(
+        BloqueoHorario.objects
+        .filter(usuario=tutor, inicio__lt=ventana_fin, fin__gt=ventana_inicio)
+        .values_list('inicio', 'fin')
+    )
+    sesiones = (
+        Tutoria.objects
+        .filter(
+            curso__tutor=tutor, estado=True, hora_tutoria__isnull=False,
+            # Desde la víspera: una sesión nocturna puede entrar en la ventana
+            fecha_tutoria__range=(desde - timedelta(days=1), hasta),
+        )
+        .values_list('fecha_tutoria', 'hora_tutoria', 'duracion')
+    )
+    for fecha, hora, duracion in sesiones:
+        inicio = datetime.combine(fecha, hora, tzinfo=tz)
+        ocupados.append((inicio, inicio + timedelta(minutes=duracion or tutor.duracion_sesion_minutos)))
+
+    # Lo que ya pasó tampoco se puede reservar
+    ahora = ahora or timezone.now()
+    if ahora > ventana_inicio:
+        ocupados.append((ventana_inicio, ahora))
+
+    return restar(expandir_semana(bloques, desde, hasta, tz), ocupados)
+
+
+def slots_libres(tutor, desde, hasta, ahora=None):
+    """Sesiones reservables del tutor, expresadas en su zona horaria."""
+    tz = zona_del_tutor(tutor)
+    minutos = tutor.duracion_sesion_minutos or 60
+    return [
+        (inicio.astimezone(tz), fin.astimezone(tz))
+        for inicio, fin in cortar(intervalos_libres(tutor, desde, hasta, ahora), minutos)
+    ]
+
+
+def truncar_hora(momento):
+    return momento.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def buckets(inicio, fin):
+    """Horas (UTC) que toca el intervalo ``[inicio, fin)``."""
+    hora = truncar_hora(inicio)
+    while hora < fin:
+        yield hora
+        hora += timedelta(hours=1)
+
+
+def reconstruir_indice(tutor_id, ahora=None):
+    """Recalcula las franjas libres del tutor para el horizonte del índice."""
+    tutor = (
+        Usuario.objects
+        .only('id', 'zona_horaria', 'duracion_sesion_minutos')
+        .filter(pk=tutor_id)
+        .first()
+    )
+    franjas = []
+    if tutor is not None:
+        hoy = (ahora or timezone.now()).astimezone(zona_del_tutor(tutor)).date()
+        hasta = hoy + timedelta(days=HORIZONTE_INDICE_DIAS - 1)
+        for inicio, fin in intervalos_libres(tutor, hoy, hasta, ahora):
+            franjas.extend(
+                FranjaLibre(tutor_id=tutor_id, bucket=hora, inicio=inicio, fin=fin)
+                for hora in buckets(inicio, fin)
+            )
+    with transaction.atomic():
+        FranjaLibre.objects.filter(tutor_id=tutor_id).delete()
+        FranjaLibre.objects.bulk_create(franjas, batch_size=500)
+    return len(franjas)
+
+
+# Lote del hilo: tutores ya reconstruidos por los hooks de la transacción en curso
+_lote = threading.local()
+
+
+def programar_reconstruccion(tutor_id):
+    """Reconstruye el índice del tutor al confirmar la transacción actual,
+    una sola vez aunque cambien varias filas de su agenda.
+
+    Se deduplica al ejecutar y no al registrar: los hooks de una transacción o
+    un savepoint revertidos se descartan sin avisar, y un registro omitido por
+    uno de ellos dejaría el índice sin reconstruir.
+    """
+    if not tutor_id:
+        return
+    lote = getattr(_lote, 'actual', None)
+    if lote is None:
+        lote = _lote.actual = set()
+
+    def ejecutar():
+        # El primer hook que corre cierra el lote: lo que se programe después
+        # pertenece a otra transacción
+        if getattr(_lote, 'actual', None) is lote:
+            _lote.actual = None
+        if tutor_id in lote:
+            return
+        lote.add(tutor_id)
+        reconstruir_indice(tutor_id)
+
+    transaction.on_commit(ejecutar)
+
+
+def tutores_libres(desde, hasta):
+    """Ids de los tutores con un intervalo libre que cubre ``[desde, hasta)``.
+
+    Todo intervalo que contiene ``desde`` está guardado en el bucket de esa
+    hora, así que basta con una búsqueda por índice sobre un solo bucket.
+    """
+    return (
+        FranjaLibre.objects
+        .filter(bucket=truncar_hora(desde), inicio__lte=desde, fin__gte=hasta)
+        .values('tutor_id')
+    )
@@ -0,0 +1,120 @@
+"""Autenticación JWT sin consultar la base en la mayoría de las peticiones.
+
+Los tokens emitidos al iniciar sesión llevan firmados ``rol`` e ``is_staff``
+además del id. Los autenticadores de este módulo resuelven el usuario desde
+un LRU por proceso y solo van a la base si no está en caché, si venció o si
+los claims del token ya no coinciden con la copia guardada. Si tampoco
+coinciden con la base (cambió el rol o se quitó el staff) el token se rechaza
+y hay que volver a iniciar sesión. Las señales de ``Usuario`` invalidan la
+entrada en cada ``post_save``/``post_delete``.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from dj_rest_auth.jwt_auth import JWTCookieAuthentication
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+CLAIMS_USUARIO = ('rol', 'is_staff')
+
+
+def agregar_claims(token, user):
+    for claim in CLAIMS_USUARIO:
+        token[claim] = getattr(user, claim, None)
+    return token
+
+
+def claims_coinciden(token, user):
+    """Tokens anteriores a los claims no los traen y se aceptan."""
+    return all(claim not in token or token[claim] == getattr(user, claim, None) for claim in CLAIMS_USUARIO)
+
+
+def tokens_para_usuario(user):
+    """Par refresh/access con los claims de usuario (el access los hereda)."""
+    refresh = agregar_claims(RefreshToken.for_user(user), user)
+    return refresh, refresh.access_token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return agregar_claims(super().get_token(user), user)
+
+
+class CacheUsuarios:
+    """LRU de usuarios por id con caducidad, seguro entre hilos."""
+
+    def __init__(self, max_entradas=1024, ttl=300):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._datos = OrderedDict()
+
+    # simplejwt guarda el id como texto en el token; se normaliza la clave
+    def obtener(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            entrada = self._datos.get(user_id)
+            if entrada is None:
+                return None
+            user, vence = entrada
+            if vence < time.monotonic():
+                del self._datos[user_id]
+                return None
+            self._datos.move_to_end(user_id)
+            return user
+
+    def guardar(self, user):
+        with self._lock:
+            clave = str(user.pk)
+            self._datos[clave] = (user, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._datos.pop(str(user_id), None)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+usuarios = CacheUsuarios(
+    getattr(settings, 'AUTH_USUARIOS_CACHE_MAX', 1024),
+    getattr(settings, 'AUTH_USUARIOS_CACHE_TTL', 300),
+)
+
+
+class UsuarioCacheMixin:
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[jwt_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('El token no contiene un identificador de usuario.')
+
+        user = usuarios.obtener(user_id)
+        if user is not None and claims_coinciden(validated_token, user):
+            # Copia para que la petición pueda modificarla sin tocar la caché
+            return copy.copy(user)
+
+        user = super().get_user(validated_token)
+        if not claims_coinciden(validated_token, user):
+            raise InvalidToken('El rol del usuario cambió; vuelve a iniciar sesión.')
+        usuarios.guardar(copy.copy(user))
+        return user
+
+
+class CachedJWTAuthentication(UsuarioCacheMixin, JWTAuthentication):
+    pass
+
+
+class CachedJWTCookieAuthentication(UsuarioCacheMixin, JWTCookieAuthentication):
+    pass
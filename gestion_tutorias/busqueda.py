@@ -0,0 +1,120 @@
+"""Búsqueda de texto completo sobre los cursos.
+
+El backend se elige con ``settings.BUSQUEDA_CURSOS_BACKEND``; si no está
+definido se usa FTS5 cuando la base es SQLite y ``icontains`` en otro caso.
+El índice se mantiene con las señales ``post_save``/``post_delete`` de Curso.
+"""
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+from .models import Curso
+
+CAMPOS = ('nombre', 'descripcion', 'ciudad')
+
+
+def terminos(texto):
+    return re.findall(r'\w+', texto or '')
+
+
+class BaseBusquedaCursos:
+    def indexar(self, curso):
+        pass
+
+    def eliminar(self, curso_id):
+        pass
+
+    def reconstruir(self):
+        pass
+
+    def filtrar(self, queryset, texto):
+        """Filtra ``queryset`` por ``texto`` y lo ordena por relevancia."""
+        raise NotImplementedError
+
+
+class ContainsBusquedaCursos(BaseBusquedaCursos):
+    """Sin índice: ``icontains`` por término, sin orden por relevancia."""
+
+    def filtrar(self, queryset, texto):
+        for termino in terminos(texto):
+            condicion = Q()
+            for campo in CAMPOS:
+                condicion |= Q(**{f'{campo}__icontains': termino})
+            queryset = queryset.filter(condicion)
+        return queryset
+
+
+class SQLiteFTS5BusquedaCursos(BaseBusquedaCursos):
+    """Tabla virtual FTS5 con ``rowid = id_curso``.
+
+    El tokenizador ``unicode61 remove_diacritics 2`` ignora mayúsculas y
+    tildes ("matematicas" encuentra "Matemáticas") y cada término se busca
+    como prefijo. El orden es por ``bm25``, dando más peso al nombre.
+    """
+    tabla = 'gestion_tutorias_curso_fts'
+    pesos = (10.0, 1.0, 2.0)
+
+    def indexar(self, curso):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.tabla} WHERE rowid = %s', [curso.pk])
+            cursor.execute(
+                f'INSERT INTO {self.tabla} (rowid, nombre, descripcion, ciudad) VALUES (%s, %s, %s, %s)',
+                [curso.pk, curso.nombre or '', curso.descripcion or '', curso.ciudad or ''],
+            )
+
+    def eliminar(self, curso_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.tabla} WHERE rowid = %s', [curso_id])
+
+    def reconstruir(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.tabla}')
+            cursor.execute(
+                f'INSERT INTO {self.tabla} (rowid, nombre, descripcion, ciudad) '
+                f'SELECT id_curso, nombre, COALESCE(descripcion, \'\'), COALESCE(ciudad, \'\') '
+                f'FROM {Curso._meta.db_table}'
+            )
+
+    def filtrar(self, queryset, texto):
+        palabras = terminos(texto)
+        if not palabras:
+            return queryset
+        consulta = ' '.join(f'"{palabra}"*' for palabra in palabras)
+        curso_tabla = Curso._meta.db_table
+        pesos = ', '.join(str(p) for p in self.pesos)
+        # extra() para que el JOIN con la tabla FTS lo dirija el MATCH
+        return queryset.extra(
+            tables=[self.tabla],
+            where=[
+                f'{self.tabla}.rowid = {curso_tabla}.id_curso',
+                f'{self.tabla} MATCH %s',
+            ],
+            params=[consulta],
+            select={'relevancia': f'bm25({self.tabla}, {pesos})'},
+            order_by=['relevancia'],
+        )
+
+
+@lru_cache(maxsize=None)
+def get_busqueda():
+    ruta = getattr(settings, 'BUSQUEDA_CURSOS_BACKEND', None)
+    if ruta:
+        return import_string(ruta)()
+    if connection.vendor == 'sqlite':
+        return SQLiteFTS5BusquedaCursos()
+    return ContainsBusquedaCursos()
+
+
+class CursoSearchFilter(filters.SearchFilter):
+    """``?search=`` para cursos usando el backend de búsqueda configurado."""
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.search_param, '')
+        if not texto.strip():
+            return queryset
+        return get_busqueda().filtrar(queryset, texto)
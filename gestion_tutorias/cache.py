@@ -0,0 +1,124 @@
+"""Caché de lectura para el catálogo público (categorías y cursos).
+
+Las respuestas se guardan en el backend de ``settings.CATALOGO_CACHE_ALIAS``
+(memoria local por defecto; basta con apuntarlo a un caché compartido en
+despliegues con varios procesos). Los listados llevan en la clave la versión
+del modelo, que las señales incrementan en cada ``post_save``/``post_delete``;
+los detalles se borran directamente por pk.
+
+Las mismas versiones por modelo sirven de token para los ETag de
+``views/mixins.ETagMixin``; los cambios masivos que no disparan señales
+deben llamar a ``invalidar`` a mano.
+
+Con memoria local cada proceso tiene sus propias versiones y solo ve las
+invalidaciones de las escrituras que atendió. Por eso las versiones caducan
+(``CATALOGO_VERSION_TTL``) y el GET condicional solo se activa con un caché
+compartido (``etag_disponible``): un 304 con una versión vieja no caduca nunca.
+"""
+import hashlib
+import random
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOGO_CACHE_ALIAS', 'default')]
+
+
+def ttl():
+    return getattr(settings, 'CATALOGO_CACHE_TTL', 300)
+
+
+def version_ttl():
+    return getattr(settings, 'CATALOGO_VERSION_TTL', 3600)
+
+
+def compartido():
+    """Si el backend del catálogo lo ven todos los procesos."""
+    return not isinstance(get_cache(), (LocMemCache, DummyCache))
+
+
+def etag_disponible():
+    """``ETAG_CONDICIONAL``: ``None`` lo activa solo con un caché compartido;
+    ``True`` lo fuerza (un único proceso, p. ej. ``runserver``)."""
+    forzado = getattr(settings, 'ETAG_CONDICIONAL', None)
+    return compartido() if forzado is None else forzado
+
+
+def _clave_version(modelo):
+    return f'catalogo:version:{modelo}'
+
+
+def version(modelo):
+    """Versión actual de los listados de ``modelo``.
+
+    Si la clave no existe (caché nuevo o desalojado) arranca en un valor
+    aleatorio, para no volver a coincidir con versiones viejas.
+    """
+    cache = get_cache()
+    clave = _clave_version(modelo)
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, random.getrandbits(48), version_ttl())
+        valor = cache.get(clave)
+    return valor
+
+
+def invalidar(modelo, pk=None):
+    cache = get_cache()
+    try:
+        cache.incr(_clave_version(modelo))
+    except ValueError:
+        cache.add(_clave_version(modelo), random.getrandbits(48), version_ttl())
+    if pk is not None:
+        cache.delete(clave_detalle(modelo, pk))
+
+
+def _firma(request):
+    params = sorted(request.query_params.lists())
+    crudo = f'{request.get_host()}{request.path}?{params}'
+    return hashlib.sha1(crudo.encode('utf-8')).hexdigest()
+
+
+def clave_lista(modelo, request):
+    return f'catalogo:{modelo}:lista:{version(modelo)}:{_firma(request)}'
+
+
+def clave_detalle(modelo, pk):
+    return f'catalogo:{modelo}:detalle:{pk}'
+
+
+class _Estadisticas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+    def registrar(self, modelo, hit):
+        with self._lock:
+            self._contadores[modelo]['hits' if hit else 'misses'] += 1
+
+    def resumen(self):
+        with self._lock:
+            datos = {modelo: dict(c) for modelo, c in self._contadores.items()}
+        for c in datos.values():
+            total = c['hits'] + c['misses']
+            c['hit_ratio'] = round(c['hits'] / total, 4) if total else None
+        return datos
+
+
+estadisticas = _Estadisticas()
+
+
+def obtener(modelo, clave):
+    datos = get_cache().get(clave)
+    estadisticas.registrar(modelo, datos is not None)
+    return datos
+
+
+def guardar(clave, datos):
+    get_cache().set(clave, datos, ttl())
@@ -0,0 +1,76 @@
+"""Promedio de calificaciones de los tutores.
+
+Cada tutor guarda cuántas reseñas recibió y la suma de sus puntuaciones;
+una reseña nueva solo incrementa esos acumulados. ``reconciliar`` los
+compara contra el cálculo completo por lotes de tutores.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.apps import apps
+from django.db.models import Count, F, Sum
+
+from .models import Usuario
+
+DOS_DECIMALES = Decimal('0.01')
+
+
+def promedio(suma, total):
+    if not total:
+        return Decimal('0')
+    return (Decimal(suma) / total).quantize(DOS_DECIMALES, rounding=ROUND_HALF_UP)
+
+
+def registrar_resena(tutor_id, puntuacion):
+    """Suma una reseña al tutor. Llamar dentro de la transacción que la crea."""
+    Usuario.objects.filter(pk=tutor_id).update(
+        resenas_total=F('resenas_total') + 1,
+        resenas_suma=F('resenas_suma') + puntuacion,
+    )
+    # La fila ya está bloqueada por el UPDATE: el valor leído es el definitivo
+    total, suma = Usuario.objects.filter(pk=tutor_id).values_list('resenas_total', 'resenas_suma').get()
+    calificacion = promedio(suma, total)
+    Usuario.objects.filter(pk=tutor_id).update(calificacion_promedio=calificacion)
+    return calificacion
+
+
+def acumulados_reales(tutor_ids):
+    """Total y suma de reseñas de cada tutor calculados desde cero."""
+    Resena = apps.get_model('gestion_tutorias', 'Reseña')
+    filas = (
+        Resena.objects
+        .filter(tutorias__curso__tutor_id__in=tutor_ids)
+        .values('tutorias__curso__tutor_id')
+        .annotate(total=Count('pk'), suma=Sum('puntuacion'))
+    )
+    return {
+        fila['tutorias__curso__tutor_id']: (
+            fila['total'], Decimal(fila['suma'] or 0).quantize(DOS_DECIMALES)
+        )
+        for fila in filas
+    }
+
+
+def reconciliar(tutores, guardar=True):
+    """Corrige los acumulados de ``tutores`` (instancias de Usuario) que no
+    coincidan con el cálculo completo. Devuelve la lista de corregidos."""
+    reales = acumulados_reales([t.pk for t in tutores])
+    corregidos = []
+    for tutor in tutores:
+        total, suma = reales.get(tutor.pk, (0, Decimal('0')))
+        calificacion = promedio(suma, total) if total else None
+        if (
+            tutor.resenas_total != total
+            or Decimal(tutor.resenas_suma) != Decimal(suma)
+            or (tutor.calificacion_promedio is not None and calificacion is None)
+            or (calificacion is not None and tutor.calificacion_promedio != calificacion)
+        ):
+            tutor.resenas_total = total
+            tutor.resenas_suma = suma
+            # Sin reseñas vuelve a None; si no, el valor viejo se marcaría en cada corrida
+            tutor.calificacion_promedio = calificacion
+            corregidos.append(tutor)
+    if guardar and corregidos:
+        Usuario.objects.bulk_update(
+            corregidos, ['resenas_total', 'resenas_suma', 'calificacion_promedio']
+        )
+    return corregidos
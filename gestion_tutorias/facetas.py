@@ -0,0 +1,91 @@
+"""Conteos por faceta del buscador de cursos.
+
+Una sola consulta agrupada por (categoría, ciudad, modalidad, rango de
+precio) sobre el queryset ya filtrado; las sumas por faceta se hacen en
+Python. El resultado se guarda ``CURSO_FACETAS_TTL`` segundos con la versión
+de ``curso`` y los filtros en la clave, así que la paginación no lo recalcula
+y cualquier cambio en el catálogo lo invalida.
+"""
+import hashlib
+from collections import Counter
+
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from . import cache
+
+# Límites de los rangos de precio: [0, 200), [200, 400), ..., [1000, ∞)
+LIMITES_PRECIO = (200, 400, 700, 1000)
+
+# Parámetros que no cambian el conjunto filtrado
+PARAMETROS_IGNORADOS = {'page', 'page_size', 'facetas'}
+
+
+def solicitadas(request):
+    return request.query_params.get('facetas', '').lower() in ('1', 'true', 'si', 'sí')
+
+
+def ttl():
+    return getattr(settings, 'CURSO_FACETAS_TTL', 30)
+
+
+def clave(request):
+    params = sorted(
+        (nombre, valores) for nombre, valores in request.query_params.lists()
+        if nombre not in PARAMETROS_IGNORADOS
+    )
+    firma = hashlib.sha1(f'{request.path}?{params}'.encode('utf-8')).hexdigest()
+    return f'catalogo:curso:facetas:{cache.version("curso")}:{firma}'
+
+
+def _rango_precio():
+    casos = [When(precio__lt=limite, then=Value(i)) for i, limite in enumerate(LIMITES_PRECIO)]
+    return Case(*casos, default=Value(len(LIMITES_PRECIO)), output_field=IntegerField())
+
+
+def _rangos():
+    bordes = (0, *LIMITES_PRECIO, None)
+    return list(zip(bordes, bordes[1:]))
+
+
+def calcular(queryset):
+    filas = (
+        queryset.order_by()
+        .annotate(rango_precio=_rango_precio())
+        .values('categoria_id', 'categoria__nombre', 'ciudad', 'modalidad', 'rango_precio')
+        .annotate(total=Count('pk'))
+    )
+    categorias, nombres, ciudades, modalidades, precios = Counter(), {}, Counter(), Counter(), Counter()
+    for fila in filas:
+        total = fila['total']
+        categorias[fila['categoria_id']] += total
+        nombres[fila['categoria_id']] = fila['categoria__nombre']
+        ciudades[fila['ciudad']] += total
+        modalidades[fila['modalidad']] += total
+        precios[fila['rango_precio']] += total
+
+    return {
+        'categoria': [
+            {'id': categoria_id, 'nombre': nombres[categoria_id], 'total': total}
+            for categoria_id, total in categorias.most_common()
+        ],
+        'ciudad': [{'valor': ciudad, 'total': total} for ciudad, total in ciudades.most_common()],
+        'modalidad': [{'valor': modalidad, 'total': total} for modalidad, total in modalidades.most_common()],
+        # Los rangos vacíos también se devuelven, en orden de precio
+        'precio': [
+            {'desde': desde, 'hasta': hasta, 'total': precios[i]}
+            for i, (desde, hasta) in enumerate(_rangos())
+        ],
+    }
+
+
+def obtener(request, queryset, usar_cache=True):
+    """Facetas de ``queryset`` (ya filtrado con los parámetros de ``request``)."""
+    if not usar_cache:
+        return calcular(queryset)
+    clave_facetas = clave(request)
+    datos = cache.obtener('curso_facetas', clave_facetas)
+    if datos is None:
+        datos = calcular(queryset)
+        cache.get_cache().set(clave_facetas, datos, ttl())
+    return datos
@@ -0,0 +1,123 @@
+"""Hash de contraseñas fuera del hilo que atiende la petición.
+
+PBKDF2 consume cientos de milisegundos de CPU por login. Las vistas async de
+``views/users.py`` lo mandan a un ``ThreadPoolExecutor`` acotado
+(``PASSWORD_HASH_WORKERS`` hilos; ``hashlib.pbkdf2_hmac`` suelta el GIL, así
+que corren en paralelo) y, si ya hay ``PASSWORD_HASH_MAX_PENDIENTES`` trabajos
+en cola o en curso, rechazan la petición con 503 en vez de encolarla sin
+límite. Solo se ejecuta aquí el cálculo del hash: las consultas a la base
+siguen en el hilo de Django (``sync_to_async``).
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+
+
+class PoolSaturado(Exception):
+    pass
+
+
+class _Metricas:
+    def __init__(self, muestras=512):
+        self._lock = threading.Lock()
+        self.en_cola = 0
+        self.en_curso = 0
+        self.completados = 0
+        self.rechazados = 0
+        self.max_en_cola = 0
+        self._hash_ms = deque(maxlen=muestras)
+        self._espera_ms = deque(maxlen=muestras)
+
+    def encolado(self):
+        with self._lock:
+            self.en_cola += 1
+            self.max_en_cola = max(self.max_en_cola, self.en_cola)
+
+    def iniciado(self, espera):
+        with self._lock:
+            self.en_cola -= 1
+            self.en_curso += 1
+            self._espera_ms.append(espera * 1000)
+
+    def terminado(self, duracion):
+        with self._lock:
+            self.en_curso -= 1
+            self.completados += 1
+            self._hash_ms.append(duracion * 1000)
+
+    def rechazado(self):
+        with self._lock:
+            self.rechazados += 1
+
+    @staticmethod
+    def _resumir(valores):
+        if not valores:
+            return {'promedio': None, 'p95': None, 'max': None}
+        ordenados = sorted(valores)
+        return {
+            'promedio': round(sum(ordenados) / len(ordenados), 2),
+            'p95': round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))], 2),
+            'max': round(ordenados[-1], 2),
+        }
+
+    def resumen(self):
+        with self._lock:
+            hash_ms, espera_ms = list(self._hash_ms), list(self._espera_ms)
+            datos = {
+                'en_cola': self.en_cola,
+                'en_curso': self.en_curso,
+                'max_en_cola': self.max_en_cola,
+                'completados': self.completados,
+                'rechazados': self.rechazados,
+            }
+        datos['hash_ms'] = self._resumir(hash_ms)
+        datos['espera_ms'] = self._resumir(espera_ms)
+        return datos
+
+
+class PoolHashing:
+    def __init__(self, workers, max_pendientes):
+        self.workers = workers
+        self.max_pendientes = max_pendientes
+        self.metricas = _Metricas()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hash')
+        self._lock = threading.Lock()
+        self._pendientes = 0
+
+    def _medir(self, encolado_en, fn, args):
+        inicio = time.perf_counter()
+        self.metricas.iniciado(inicio - encolado_en)
+        try:
+            return fn(*args)
+        finally:
+            self.metricas.terminado(time.perf_counter() - inicio)
+
+    async def ejecutar(self, fn, *args):
+        """Corre ``fn(*args)`` en el pool; lanza ``PoolSaturado`` si está lleno."""
+        with self._lock:
+            if self._pendientes >= self.max_pendientes:
+                self.metricas.rechazado()
+                raise PoolSaturado()
+            self._pendientes += 1
+        self.metricas.encolado()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, self._medir, time.perf_counter(), fn, args
+            )
+        finally:
+            with self._lock:
+                self._pendientes -= 1
+
+
+@lru_cache(maxsize=None)
+def get_pool():
+    workers = getattr(settings, 'PASSWORD_HASH_WORKERS', None) or min(4, os.cpu_count() or 1)
+    max_pendientes = getattr(settings, 'PASSWORD_HASH_MAX_PENDIENTES', None) or workers * 8
+    return PoolHashing(workers, max_pendientes)
@@ -0,0 +1,20 @@
+"""Utilidades compartidas por los comandos de medición (bench y compañía)."""
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista no vacía."""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+def resumen_tiempos(segundos):
+    if not segundos:
+        return {'n': 0}
+    return {
+        'n': len(segundos),
+        'p50_ms': round(percentil(segundos, 50) * 1000, 3),
+        'p95_ms': round(percentil(segundos, 95) * 1000, 3),
+        'promedio_ms': round(sum(segundos) / len(segundos) * 1000, 3),
+        'max_ms': round(max(segundos) * 1000, 3),
+    }
@@ -0,0 +1,258 @@
+import json
+import os
+import sqlite3
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from gestion_tutorias import cache
+from gestion_tutorias.authentication import tokens_para_usuario
+from gestion_tutorias.models import Curso, Reserva, SolicitudReserva, Usuario
+from gestion_tutorias.models_messaging import Conversacion
+from gestion_tutorias.routers import alias_mensajeria
+
+from ._medicion import percentil, resumen_tiempos
+
+
+class Caso:
+    """Un endpoint a medir: ``peticion(i)`` devuelve ``(metodo, ruta, datos,
+    usuario)`` para la iteración ``i`` o ``None`` si no quedan datos."""
+
+    def __init__(self, nombre, peticion, descripcion=''):
+        self.nombre = nombre
+        self.peticion = peticion
+        self.descripcion = descripcion
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide los endpoints más usados con el cliente de pruebas y reporta p50/p95 de '
+        'latencia y número de consultas en JSON. Pensado para correr sobre datos de '
+        'seed_load y comparar resultados entre commits. Cada petición confirma su '
+        'propia transacción (con sus hooks on_commit), sobre una copia temporal de '
+        'las bases SQLite salvo con --persistir.'
+    )
+
+    CASOS = ('filtrar_cursos', 'buscar_cursos', 'resumen_conversaciones', 'mensajes', 'aceptar', 'crear_resena')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=30)
+        parser.add_argument('--calentamiento', type=int, default=3)
+        parser.add_argument('--solo', nargs='+', choices=self.CASOS, help='Medir solo estos casos.')
+        parser.add_argument('--sin-cache', action='store_true',
+                            help='Vaciar el caché de catálogo antes de cada petición.')
+        parser.add_argument('--etiqueta', default='', help='Nombre de la corrida; por defecto el commit actual.')
+        parser.add_argument('--salida', help='Escribir el JSON en este archivo además de la salida estándar.')
+        parser.add_argument('--persistir', action='store_true',
+                            help='Medir sobre las bases configuradas, sin copia: las escrituras quedan.')
+
+    def handle(self, *args, **options):
+        self.tokens = {}
+        self.client = Client(HTTP_HOST='localhost')
+        self.bases = {DEFAULT_DB_ALIAS, alias_mensajeria()}
+        nombres = options['solo'] or self.CASOS
+
+        resultados = {}
+        # El bench cuenta sus propias consultas; la instrumentación del
+        # middleware solo añadiría ruido
+        ajustes = override_settings(
+            INSTRUMENTACION_SQL_MUESTREO=0,
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'localhost'],
+        )
+        # Sin transacción externa: cada petición confirma (fsync incluido) y
+        # dispara sus on_commit como en producción
+        with ajustes, ExitStack() as pila:
+            if not options['persistir']:
+                pila.enter_context(self._copia_temporal())
+            casos = {nombre: getattr(self, f'_caso_{nombre}')(options['calentamiento'] + options['repeticiones'])
+                     for nombre in nombres}
+            for nombre, caso in casos.items():
+                if isinstance(caso, str):
+                    resultados[nombre] = {'omitido': caso}
+                    continue
+                self.stderr.write(f'Midiendo {nombre}...')
+                resultados[nombre] = self._medir(caso, options)
+
+        informe = {
+            'etiqueta': options['etiqueta'] or self._commit(),
+            'fecha': timezone.now().isoformat(timespec='seconds'),
+            'base_de_datos': connection.vendor,
+            'repeticiones': options['repeticiones'],
+            'sin_cache': options['sin_cache'],
+            'copia_temporal': not options['persistir'],
+            'casos': resultados,
+        }
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+        self.stdout.write(texto)
+
+    @contextmanager
+    def _copia_temporal(self):
+        """Apunta cada alias a una copia de su base en un directorio temporal
+        y lo restaura al salir; las escrituras del bench se pierden con ella."""
+        for alias in self.bases:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'La copia temporal solo funciona con SQLite ("{alias}"); usa --persistir.')
+        originales = {}
+        with tempfile.TemporaryDirectory() as directorio:
+            try:
+                for alias in self.bases:
+                    conexion = connections[alias]
+                    copia = os.path.join(directorio, f'{alias}.sqlite3')
+                    conexion.ensure_connection()
+                    destino = sqlite3.connect(copia)
+                    conexion.connection.backup(destino)
+                    destino.close()
+                    conexion.close()
+                    originales[alias] = conexion.settings_dict['NAME']
+                    conexion.settings_dict['NAME'] = copia
+                yield
+            finally:
+                for alias, nombre in originales.items():
+                    connections[alias].close()
+                    connections[alias].settings_dict['NAME'] = nombre
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ''
+
+    def _token(self, usuario):
+        if usuario.pk not in self.tokens:
+            self.tokens[usuario.pk] = tokens_para_usuario(usuario)[1]
+        return self.tokens[usuario.pk]
+
+    def _medir(self, caso, options):
+        tiempos, consultas, estados = [], [], Counter()
+        total = options['calentamiento'] + options['repeticiones']
+        for i in range(total):
+            peticion = caso.peticion(i)
+            if peticion is None:
+                break
+            metodo, ruta, datos, usuario = peticion
+            if options['sin_cache']:
+                cache.get_cache().clear()
+            extra = {'HTTP_AUTHORIZATION': f'Bearer {self._token(usuario)}'}
+            enviar = getattr(self.client, metodo)
+            with ExitStack() as pila:
+                capturadas = [pila.enter_context(CaptureQueriesContext(connections[alias])) for alias in self.bases]
+                inicio = time.perf_counter()
+                if metodo == 'get':
+                    response = enviar(ruta, datos, **extra)
+                else:
+                    response = enviar(ruta, datos, content_type='application/json', **extra)
+                duracion = time.perf_counter() - inicio
+            if i < options['calentamiento']:
+                continue
+            tiempos.append(duracion)
+            consultas.append(sum(len(captura) for captura in capturadas))
+            estados[response.status_code] += 1
+
+        resultado = {'descripcion': caso.descripcion, **resumen_tiempos(tiempos)}
+        if consultas:
+            resultado['consultas_p50'] = percentil(consultas, 50)
+            resultado['consultas_max'] = max(consultas)
+        resultado['status'] = {str(codigo): veces for codigo, veces in sorted(estados.items())}
+        return resultado
+
+    # Cada _caso_* elige sus datos una sola vez, antes de medir. Devuelve un
+    # Caso o el motivo (str) por el que no se puede medir.
+
+    def _estudiante(self):
+        return Usuario.objects.filter(rol='estudiante').order_by('pk').first()
+
+    def _caso_filtrar_cursos(self, n):
+        estudiante = self._estudiante()
+        fila = Curso.objects.values('ciudad').annotate(n=Count('pk')).order_by('-n').first()
+        if estudiante is None or fila is None:
+            return 'No hay cursos o estudiantes.'
+        ruta = reverse('filtrar-cursos')
+        datos = {'ciudad': fila['ciudad'], 'modalidad': 'virtual'}
+        return Caso('filtrar_cursos', lambda i: ('get', ruta, datos, estudiante),
+                    f'GET {ruta} ciudad={fila["ciudad"]!r} modalidad=virtual')
+
+    def _caso_buscar_cursos(self, n):
+        estudiante = self._estudiante()
+        curso = Curso.objects.order_by('pk').first()
+        if estudiante is None or curso is None:
+            return 'No hay cursos o estudiantes.'
+        termino = curso.nombre.split()[0]
+        ruta = reverse('filtrar-cursos')
+        return Caso('buscar_cursos', lambda i: ('get', ruta, {'search': termino}, estudiante),
+                    f'GET {ruta} search={termino!r}')
+
+    def _caso_resumen_conversaciones(self, n):
+        fila = (
+            Conversacion.objects.values('estudiante').annotate(n=Count('pk')).order_by('-n').first()
+        )
+        if fila is None:
+            return 'No hay conversaciones.'
+        estudiante = Usuario.objects.get(pk=fila['estudiante'])
+        ruta = reverse('conversacion-resumen')
+        return Caso('resumen_conversaciones', lambda i: ('get', ruta, {}, estudiante),
+                    f'GET {ruta} como el estudiante con más conversaciones ({fila["n"]})')
+
+    def _caso_mensajes(self, n):
+        conversacion = (
+            Conversacion.objects.annotate(n=Count('mensajes')).order_by('-n').first()
+        )
+        if conversacion is None or not conversacion.n:
+            return 'No hay mensajes.'
+        # El estudiante está en la base principal: sin select_related
+        estudiante = Usuario.objects.get(pk=conversacion.estudiante_id)
+        ruta = reverse('mensaje-list')
+        datos = {'conversacion': conversacion.pk}
+        return Caso('mensajes', lambda i: ('get', ruta, datos, estudiante),
+                    f'GET {ruta} conversacion={conversacion.pk} ({conversacion.n} mensajes)')
+
+    def _caso_aceptar(self, n):
+        pendientes = SolicitudReserva.objects.filter(
+            estado='pendiente', fecha_propuesta__gte=timezone.localdate(),
+        )
+        fila = pendientes.values('curso__tutor').annotate(n=Count('pk')).order_by('-n').first()
+        if fila is None:
+            return 'No hay solicitudes pendientes.'
+        tutor = Usuario.objects.get(pk=fila['curso__tutor'])
+        ids = list(pendientes.filter(curso__tutor=tutor).order_by('pk').values_list('pk', flat=True)[:n])
+
+        def peticion(i):
+            if i >= len(ids):
+                return None
+            return 'post', reverse('solicitud-reserva-aceptar', args=[ids[i]]), {}, tutor
+        return Caso('aceptar', peticion,
+                    f'POST aceptar con {len(ids)} solicitudes pendientes distintas del mismo tutor')
+
+    def _caso_crear_resena(self, n):
+        reservas = list(
+            Reserva.objects
+            .filter(tutoria__fecha_tutoria__lt=timezone.localdate(), tutoria__reseña__isnull=True)
+            .select_related('estudiante')
+            .order_by('pk')[:n]
+        )
+        if not reservas:
+            return 'No hay tutorías pasadas sin reseña.'
+        ruta = reverse('crear_resena')
+
+        def peticion(i):
+            if i >= len(reservas):
+                return None
+            reserva = reservas[i]
+            datos = {'reserva': reserva.pk, 'puntuacion': 4.5, 'comentario': 'Muy buena clase.'}
+            return 'post', ruta, datos, reserva.estudiante
+        return Caso('crear_resena', peticion, f'POST {ruta} sobre {len(reservas)} reservas distintas')
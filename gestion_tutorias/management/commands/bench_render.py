@@ -0,0 +1,112 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from rest_framework.renderers import JSONRenderer as DRFJSONRenderer
+
+from gestion_tutorias import facetas, middleware, renderers
+from gestion_tutorias.models import Categoria, Curso, Reseña
+from gestion_tutorias.models_messaging import Conversacion, Mensaje
+from gestion_tutorias.serializers_lectura import CategoriaLectura, CursoLectura, MensajeLectura
+
+from ._medicion import resumen_tiempos
+
+
+def _medir(funcion, repeticiones):
+    """Tiempo de CPU de cada llamada y el resultado de la última."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.process_time()
+        resultado = funcion()
+        tiempos.append(time.process_time() - inicio)
+    return tiempos, resultado
+
+
+def _pagina(datos):
+    return {'count': len(datos), 'next': None, 'previous': None, 'results': datos}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el JSON de DRF con el renderer de la API (orjson y biblioteca '
+        'estándar) y la compresión gzip/brotli: bytes y CPU por respuesta sobre '
+        'páginas reales de la base (conviene correrlo después de seed_load).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=50)
+        parser.add_argument('--salida', help='Escribir el JSON en este archivo además de la salida estándar.')
+
+    def handle(self, *args, **options):
+        cargas = self._cargas()
+        if not cargas:
+            raise CommandError('No hay datos que renderizar; ejecuta antes seed_load.')
+        repeticiones = options['repeticiones']
+
+        codificadores = {'drf': lambda datos: DRFJSONRenderer().render(datos)}
+        codificadores['estandar'] = lambda datos: renderers.dumps(datos, rapido=False)
+        if renderers.orjson is not None:
+            codificadores['orjson'] = renderers.dumps
+        compresiones = ['gzip'] + (['br'] if middleware.brotli is not None else [])
+
+        resultados = {}
+        for nombre, datos in cargas.items():
+            self.stderr.write(f'Midiendo {nombre}...')
+            render = {}
+            for codificador, funcion in codificadores.items():
+                tiempos, cuerpo = _medir(lambda: funcion(datos), repeticiones)
+                render[codificador] = {'bytes': len(cuerpo), **resumen_tiempos(tiempos)}
+            cuerpo = renderers.dumps(datos)
+            compresion = {}
+            for codificacion in compresiones:
+                tiempos, comprimido = _medir(lambda: middleware.comprimir(cuerpo, codificacion), repeticiones)
+                compresion[codificacion] = {
+                    'bytes': len(comprimido),
+                    'ratio': round(len(comprimido) / len(cuerpo), 3),
+                    **resumen_tiempos(tiempos),
+                }
+            resultados[nombre] = {'render': render, 'compresion': compresion}
+
+        informe = {
+            'orjson': renderers.orjson is not None,
+            'brotli': middleware.brotli is not None,
+            'repeticiones': repeticiones,
+            'cargas': resultados,
+        }
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+        self.stdout.write(texto)
+
+    def _cargas(self):
+        """Respuestas representativas, con la forma que devuelve la API."""
+        cargas = {}
+        cursos = Curso.objects.order_by('id_curso')
+        if cursos.exists():
+            lectura = CursoLectura()
+            cargas['cursos_pagina_50'] = _pagina(lectura.representar(lectura.valores(cursos[:50])))
+            datos = _pagina(lectura.representar(lectura.valores(cursos[:10])))
+            datos['facetas'] = facetas.calcular(Curso.objects.all())
+            cargas['cursos_con_facetas'] = datos
+        conversacion = Conversacion.objects.annotate(n=Count('mensajes')).order_by('-n').first()
+        if conversacion is not None and conversacion.n:
+            lectura = MensajeLectura()
+            mensajes = (
+                Mensaje.objects.filter(conversacion=conversacion).select_related('conversacion')
+                .order_by('-creado_en', '-id')[:100]
+            )
+            cargas['mensajes_pagina_100'] = {
+                'next': None, 'previous': None, 'has_more': True,
+                'results': lectura.representar(lectura.valores(mensajes)),
+            }
+        categorias = Categoria.objects.order_by('nombre')
+        if categorias.exists():
+            lectura = CategoriaLectura()
+            cargas['categorias'] = _pagina(lectura.representar(lectura.valores(categorias)))
+        resenas = list(Reseña.objects.order_by('-id_reseña').values()[:100])
+        if resenas:
+            # Decimal y fechas sin pasar por un serializador
+            cargas['resenas_decimales'] = resenas
+        return cargas
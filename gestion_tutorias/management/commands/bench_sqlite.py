@@ -0,0 +1,140 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from principal import settings_prod
+
+from ._medicion import resumen_tiempos
+
+
+def _conectar(ruta, perfil):
+    # Mismo timeout por defecto que Django (5 s) para la configuración sin perfil
+    conexion = sqlite3.connect(ruta, isolation_level=None, check_same_thread=False, timeout=5)
+    if perfil:
+        for comando in settings_prod.SQLITE_INIT_COMMAND.split(';'):
+            conexion.execute(comando)
+    return conexion
+
+
+def _preparar(ruta, perfil, filas, conversaciones):
+    conexion = _conectar(ruta, perfil)
+    conexion.execute(
+        'CREATE TABLE mensaje (id INTEGER PRIMARY KEY, conversacion_id INTEGER, contenido TEXT, creado_en REAL)'
+    )
+    conexion.execute('CREATE INDEX mensaje_conv_idx ON mensaje (conversacion_id, creado_en, id)')
+    conexion.execute('BEGIN')
+    conexion.executemany(
+        'INSERT INTO mensaje (conversacion_id, contenido, creado_en) VALUES (?, ?, ?)',
+        ((i % conversaciones, f'Mensaje {i} de prueba con algo de texto', i) for i in range(filas)),
+    )
+    conexion.execute('COMMIT')
+    conexion.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide lecturas y escrituras por segundo con varios lectores y un escritor '
+        'en paralelo, con el journal por defecto de SQLite y con el perfil de '
+        'settings_prod (WAL y PRAGMA). Trabaja sobre bases temporales; no toca la '
+        'base configurada.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lectores', type=int, default=8)
+        parser.add_argument('--segundos', type=float, default=3.0)
+        parser.add_argument('--filas', type=int, default=50000)
+        parser.add_argument('--conversaciones', type=int, default=500)
+        parser.add_argument('--salida', help='Escribir el JSON en este archivo además de la salida estándar.')
+
+    def handle(self, *args, **options):
+        resultados = {}
+        with tempfile.TemporaryDirectory() as directorio:
+            for nombre, perfil in (('por_defecto', False), ('produccion', True)):
+                self.stderr.write(f'Midiendo {nombre}...')
+                ruta = os.path.join(directorio, f'{nombre}.sqlite3')
+                _preparar(ruta, perfil, options['filas'], options['conversaciones'])
+                resultados[nombre] = self._medir(ruta, perfil, options)
+
+        base, prod = resultados['por_defecto'], resultados['produccion']
+        informe = {
+            'lectores': options['lectores'],
+            'segundos': options['segundos'],
+            'pragmas': settings_prod.SQLITE_PRAGMAS,
+            'perfiles': resultados,
+            'mejora': {
+                'lecturas': round(prod['lecturas_por_segundo'] / max(base['lecturas_por_segundo'], 1e-9), 2),
+                'escrituras': round(prod['escrituras_por_segundo'] / max(base['escrituras_por_segundo'], 1e-9), 2),
+            },
+        }
+        texto = json.dumps(informe, indent=2, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as archivo:
+                archivo.write(texto + '\n')
+        self.stdout.write(texto)
+
+    def _medir(self, ruta, perfil, options):
+        fin = time.perf_counter() + options['segundos']
+        conversaciones = options['conversaciones']
+        lecturas, escrituras, errores = [], [], []
+
+        def lector(numero):
+            conexion = _conectar(ruta, perfil)
+            propios, conv = [], numero
+            while time.perf_counter() < fin:
+                conv = (conv * 31 + 7) % conversaciones
+                inicio = time.perf_counter()
+                try:
+                    # Una página de mensajes, como MensajeKeysetPagination
+                    conexion.execute(
+                        'SELECT id, contenido, creado_en FROM mensaje WHERE conversacion_id = ? '
+                        'ORDER BY creado_en DESC, id DESC LIMIT 30', (conv,),
+                    ).fetchall()
+                except sqlite3.OperationalError as exc:
+                    errores.append(str(exc))
+                    continue
+                propios.append(time.perf_counter() - inicio)
+            conexion.close()
+            lecturas.extend(propios)
+
+        def escritor():
+            conexion = _conectar(ruta, perfil)
+            i = 0
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    conexion.execute('BEGIN IMMEDIATE')
+                    conexion.execute(
+                        'INSERT INTO mensaje (conversacion_id, contenido, creado_en) VALUES (?, ?, ?)',
+                        (i % conversaciones, 'Mensaje nuevo', time.time()),
+                    )
+                    conexion.execute('COMMIT')
+                except sqlite3.OperationalError as exc:
+                    errores.append(str(exc))
+                    if conexion.in_transaction:
+                        conexion.execute('ROLLBACK')
+                    continue
+                escrituras.append(time.perf_counter() - inicio)
+                i += 1
+            conexion.close()
+
+        hilos = [threading.Thread(target=lector, args=(n,)) for n in range(options['lectores'])]
+        hilos.append(threading.Thread(target=escritor))
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        return {
+            'lecturas_por_segundo': round(len(lecturas) / duracion, 1),
+            'escrituras_por_segundo': round(len(escrituras) / duracion, 1),
+            'lectura': resumen_tiempos(lecturas),
+            'escritura': resumen_tiempos(escrituras),
+            'errores': len(errores),
+        }
@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Substr
+
+from gestion_tutorias.models_messaging import PREVIEW_MAX, Conversacion, Mensaje
+from gestion_tutorias.routers import alias_mensajeria
+
+# Conversacion primero: los mensajes la referencian (y ultimo_mensaje a ellos,
+# pero la restricción es diferida y se comprueba al confirmar)
+MODELOS = (Conversacion, Mensaje)
+
+
+class Command(BaseCommand):
+    help = (
+        'Copia conversaciones y mensajes de la base principal a la base de '
+        'mensajería (con los mismos ids) y vacía las tablas de origen. Para '
+        'instalaciones anteriores a la separación; antes hay que ejecutar '
+        '"migrate --database=mensajeria".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=5000)
+        parser.add_argument('--conservar', action='store_true',
+                            help='No borrar las filas de la base principal.')
+
+    def handle(self, *args, **options):
+        destino = alias_mensajeria()
+        if destino == DEFAULT_DB_ALIAS:
+            raise CommandError('DATABASES no define la base "mensajeria"; no hay nada que mover.')
+        origen = connections[DEFAULT_DB_ALIAS]
+        origen_tablas = set(origen.introspection.table_names())
+        destino_tablas = set(connections[destino].introspection.table_names())
+        faltan = [m._meta.db_table for m in MODELOS if m._meta.db_table not in destino_tablas]
+        if faltan:
+            raise CommandError(f'Faltan tablas en "{destino}" ({", ".join(faltan)}): ejecuta migrate --database={destino}.')
+        modelos = [m for m in MODELOS if m._meta.db_table in origen_tablas]
+        if not modelos:
+            self.stdout.write('La base principal no tiene tablas de mensajería.')
+            return
+        if any(m.objects.using(destino).exists() for m in MODELOS):
+            raise CommandError(f'La base "{destino}" ya tiene conversaciones o mensajes.')
+
+        completar = set()
+        with transaction.atomic(using=destino):
+            for modelo in modelos:
+                copiadas, faltantes = self._copiar(modelo, destino, options['lote'])
+                completar.update(faltantes)
+                self.stdout.write(f'{modelo._meta.db_table}: {copiadas} filas copiadas.')
+            if completar:
+                self._completar(destino, completar)
+
+        # Solo con la copia ya confirmada. Las tablas viejas conservan sus FK a
+        # usuarios y cursos: si quedaran filas, borrar un usuario fallaría
+        if not options['conservar']:
+            with transaction.atomic(using=DEFAULT_DB_ALIAS), origen.cursor() as cursor:
+                for modelo in reversed(modelos):
+                    cursor.execute(f'DELETE FROM {origen.ops.quote_name(modelo._meta.db_table)}')
+        self.stdout.write(self.style.SUCCESS('Mensajería movida.'))
+
+    def _copiar(self, modelo, destino, lote):
+        """Copia las filas con las columnas que tenga el origen; las que le
+        falten (tablas de antes de alguna migración) salen con su valor por
+        defecto. Devuelve cuántas filas copió y los campos que faltaban."""
+        origen = connections[DEFAULT_DB_ALIAS]
+        escritura = connections[destino]
+        tabla = modelo._meta.db_table
+        with origen.cursor() as cursor:
+            existentes = {c.name for c in origen.introspection.get_table_description(cursor, tabla)}
+        campos = modelo._meta.concrete_fields
+        leidos = [campo for campo in campos if campo.column in existentes]
+        faltantes = [campo for campo in campos if campo.column not in existentes]
+        defectos = [campo.get_db_prep_save(campo.get_default(), escritura) for campo in faltantes]
+
+        seleccion = ', '.join(origen.ops.quote_name(campo.column) for campo in leidos)
+        columnas = ', '.join(escritura.ops.quote_name(campo.column) for campo in leidos + faltantes)
+        insertar = (
+            f'INSERT INTO {escritura.ops.quote_name(tabla)} ({columnas}) '
+            f'VALUES ({", ".join(["%s"] * (len(leidos) + len(faltantes)))})'
+        )
+        copiadas = 0
+        with origen.cursor() as lectura, escritura.cursor() as cursor:
+            lectura.execute(f'SELECT {seleccion} FROM {origen.ops.quote_name(tabla)}')
+            while filas := lectura.fetchmany(lote):
+                cursor.executemany(insertar, [(*fila, *defectos) for fila in filas])
+                copiadas += len(filas)
+        return copiadas, {campo.name for campo in faltantes}
+
+    def _completar(self, destino, faltantes):
+        """Rehace lo que rellenaban las migraciones 0013 y 0015 cuando el
+        origen no llegó a tener esas columnas."""
+        conversaciones = Conversacion.objects.using(destino)
+        if 'ultimo_mensaje' in faltantes:
+            ultimo = (
+                Mensaje.objects.using(destino).filter(conversacion=OuterRef('pk'))
+                .order_by('-creado_en', '-id')
+            )
+            conversaciones.update(
+                ultimo_mensaje=Subquery(ultimo.values('pk')[:1]),
+                ultimo_mensaje_en=Subquery(ultimo.values('creado_en')[:1]),
+                ultimo_mensaje_preview=Coalesce(Substr(Subquery(ultimo.values('contenido')[:1]), 1, PREVIEW_MAX), Value('')),
+            )
+        # Sin pendientes, todo lo recibido está leído
+        if 'ultimo_leido_tutor' in faltantes:
+            conversaciones.filter(unread_tutor=0).update(ultimo_leido_tutor=Coalesce(F('ultimo_mensaje'), Value(0)))
+        if 'ultimo_leido_estudiante' in faltantes:
+            conversaciones.filter(unread_estudiante=0).update(
+                ultimo_leido_estudiante=Coalesce(F('ultimo_mensaje'), Value(0))
+            )
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from gestion_tutorias import calificaciones
+from gestion_tutorias.models import Usuario
+
+
+class Command(BaseCommand):
+    help = 'Compara los acumulados de reseñas de cada tutor con un recálculo completo y los corrige.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Solo informar, sin guardar.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        guardar = not options['dry_run']
+        revisados = corregidos = 0
+        ultimo_id = 0
+        campos = ('id', 'username', 'resenas_total', 'resenas_suma', 'calificacion_promedio')
+        while True:
+            lote = list(
+                Usuario.objects.filter(pk__gt=ultimo_id).order_by('pk').only(*campos)[:batch_size]
+            )
+            if not lote:
+                break
+            ultimo_id = lote[-1].pk
+            revisados += len(lote)
+            for tutor in calificaciones.reconciliar(lote, guardar=guardar):
+                corregidos += 1
+                self.stdout.write(
+                    f'{tutor.username}: {tutor.resenas_total} reseñas, '
+                    f'suma {tutor.resenas_suma}, promedio {tutor.calificacion_promedio}'
+                )
+        accion = 'a corregir' if not guardar else 'corregidos'
+        self.stdout.write(self.style.SUCCESS(f'{revisados} usuarios revisados, {corregidos} {accion}.'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from gestion_tutorias import agenda
+from gestion_tutorias.models import Usuario
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el índice de franjas libres de los tutores. Conviene ejecutarlo '
+        'una vez al día para que el horizonte del índice siga avanzando.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tutor', type=int, action='append', help='Solo este tutor (se puede repetir).')
+
+    def handle(self, *args, **options):
+        tutores = options['tutor'] or list(
+            Usuario.objects.filter(rol='tutor').values_list('id', flat=True)
+        )
+        total = 0
+        for tutor_id in tutores:
+            total += agenda.reconstruir_indice(tutor_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Índice reconstruido para {len(tutores)} tutores ({total} franjas).'
+        ))
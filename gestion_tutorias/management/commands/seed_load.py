@@ -0,0 +1,338 @@
+import random
+import time as reloj
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from gestion_tutorias import agenda, cache, calificaciones
+from gestion_tutorias.busqueda import get_busqueda
+from gestion_tutorias.models import (
+    Categoria, Curso, DisponibilidadSemanal, Reserva, Reseña, SolicitudReserva, Tutoria, Usuario,
+)
+from gestion_tutorias.models_messaging import Conversacion, Mensaje, PREVIEW_MAX
+from gestion_tutorias.routers import alias_mensajeria
+
+PREFIJO = 'carga_'
+PASSWORD = 'carga-1234'
+
+CATEGORIAS = [
+    'Matemáticas', 'Ciencias', 'Idiomas', 'Programación', 'Música', 'Arte',
+    'Historia', 'Economía', 'Preparación de exámenes', 'Deportes',
+]
+TEMAS = [
+    'Álgebra', 'Cálculo', 'Estadística', 'Física', 'Química', 'Biología', 'Inglés',
+    'Francés', 'Portugués', 'Python', 'JavaScript', 'Bases de datos', 'Guitarra',
+    'Piano', 'Dibujo', 'Fotografía', 'Historia universal', 'Microeconomía',
+    'Contabilidad', 'Redacción', 'Geometría', 'Trigonometría', 'Ajedrez', 'Yoga',
+]
+NIVELES = ['desde cero', 'básico', 'intermedio', 'avanzado', 'para exámenes', 'intensivo']
+CIUDADES = [
+    'Ciudad de México', 'Guadalajara', 'Monterrey', 'Bogotá', 'Medellín', 'Lima',
+    'Santiago', 'Buenos Aires', 'Quito', 'Madrid', 'Puebla', 'Querétaro',
+]
+ZONAS = ['America/Mexico_City', 'America/Bogota', 'America/Lima', 'America/Santiago', 'Europe/Madrid']
+FRASES = [
+    'Hola, ¿tienes disponibilidad esta semana?',
+    'Perfecto, nos vemos el jueves.',
+    '¿Podemos repasar los ejercicios del capítulo 3?',
+    'Te envío el material por aquí.',
+    'Gracias por la clase de hoy, me quedó mucho más claro.',
+    '¿Cuánto dura cada sesión?',
+    'Sí, la modalidad virtual me queda mejor.',
+    'Tengo examen el lunes, ¿podemos adelantar la clase?',
+]
+
+
+@contextmanager
+def fechas_manuales(*campos):
+    """``bulk_create`` aplica ``auto_now``/``auto_now_add``; mientras dure el
+    bloque las fechas las pone el comando."""
+    previos = [(campo, campo.auto_now, campo.auto_now_add) for campo in campos]
+    for campo, _, _ in previos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in previos:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def _campo(modelo, nombre):
+    return modelo._meta.get_field(nombre)
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos en volumen (tutores, cursos, mensajes, reservas y '
+        'reseñas) con inserciones masivas, para pruebas de carga y el comando bench. '
+        'Los usuarios creados empiezan por "carga_" y su contraseña es "carga-1234".'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tutores', type=int, default=2000)
+        parser.add_argument('--estudiantes', type=int, default=10000)
+        parser.add_argument('--cursos-por-tutor', type=int, default=10)
+        parser.add_argument('--reservas', type=int, default=100000)
+        parser.add_argument('--resenas', type=int, default=40000)
+        parser.add_argument('--solicitudes', type=int, default=20000)
+        parser.add_argument('--conversaciones', type=int, default=50000)
+        parser.add_argument('--mensajes', type=int, default=1000000)
+        parser.add_argument('--escala', type=float, default=1.0,
+                            help='Multiplica todos los volúmenes (p. ej. 0.01 para una prueba rápida).')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por INSERT masivo.')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--forzar', action='store_true', help='Permitir la carga con DEBUG = False.')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['forzar']:
+            raise CommandError('DEBUG está desactivado; usa --forzar si de verdad quieres cargar datos sintéticos.')
+
+        def volumen(clave):
+            return max(1, int(options[clave] * options['escala']))
+
+        self.lote = options['lote']
+        self.rng = random.Random(options['semilla'])
+        self.ahora = timezone.now()
+        self.corrida = self.ahora.strftime('%Y%m%d%H%M%S')
+        self.inicio = reloj.perf_counter()
+
+        # La mensajería está en su propia base: una transacción en cada una
+        with transaction.atomic(), transaction.atomic(using=alias_mensajeria()):
+            categorias = self._categorias()
+            tutores = self._usuarios('tutor', volumen('tutores'))
+            estudiantes = self._usuarios('estudiante', volumen('estudiantes'))
+            self._disponibilidades(tutores)
+            cursos = self._cursos(tutores, categorias, options['cursos_por_tutor'])
+            self._tutorias(cursos, estudiantes, volumen('reservas'), min(volumen('resenas'), volumen('reservas')))
+            self._solicitudes(cursos, estudiantes, volumen('solicitudes'))
+            self._mensajeria(cursos, estudiantes, volumen('conversaciones'), volumen('mensajes'))
+        self._derivados(tutores)
+        self.stdout.write(self.style.SUCCESS(f'Carga completa en {self._transcurrido()}.'))
+
+    def _transcurrido(self):
+        return f'{reloj.perf_counter() - self.inicio:.1f}s'
+
+    def _informar(self, texto):
+        self.stdout.write(f'[{self._transcurrido()}] {texto}')
+
+    def _categorias(self):
+        existentes = {c.nombre: c for c in Categoria.objects.filter(nombre__in=CATEGORIAS)}
+        nuevas = [Categoria(nombre=nombre) for nombre in CATEGORIAS if nombre not in existentes]
+        Categoria.objects.bulk_create(nuevas)
+        return list(existentes.values()) + nuevas
+
+    def _usuarios(self, rol, cantidad):
+        password = make_password(PASSWORD)
+        usuarios = [
+            Usuario(
+                username=f'{PREFIJO}{rol}_{self.corrida}_{i}',
+                email=f'{PREFIJO}{rol}_{self.corrida}_{i}@carga.local',
+                password=password,
+                rol=rol,
+                zona_horaria=self.rng.choice(ZONAS),
+                duracion_sesion_minutos=self.rng.choice([45, 60, 60, 90]),
+                especialidad=self.rng.choice(TEMAS) if rol == 'tutor' else None,
+            )
+            for i in range(cantidad)
+        ]
+        Usuario.objects.bulk_create(usuarios, batch_size=self.lote)
+        self._informar(f'{cantidad} usuarios con rol {rol}.')
+        return usuarios
+
+    def _disponibilidades(self, tutores):
+        bloques = []
+        for tutor in tutores:
+            for dia in self.rng.sample(range(7), self.rng.randint(2, 5)):
+                manana = self.rng.randint(7, 10)
+                bloques.append(DisponibilidadSemanal(
+                    usuario=tutor, dia_semana=dia, hora_inicio=time(manana), hora_fin=time(manana + 3),
+                ))
+                tarde = self.rng.randint(15, 18)
+                bloques.append(DisponibilidadSemanal(
+                    usuario=tutor, dia_semana=dia, hora_inicio=time(tarde), hora_fin=time(tarde + 3),
+                ))
+        DisponibilidadSemanal.objects.bulk_create(bloques, batch_size=self.lote)
+        self._informar(f'{len(bloques)} bloques de disponibilidad.')
+
+    def _cursos(self, tutores, categorias, por_tutor):
+        cursos = []
+        for tutor in tutores:
+            for _ in range(self.rng.randint(1, max(1, 2 * por_tutor - 1))):
+                tema = self.rng.choice(TEMAS)
+                cursos.append(Curso(
+                    nombre=f'{tema} {self.rng.choice(NIVELES)}',
+                    descripcion=f'Clases de {tema.lower()} adaptadas a tu ritmo. {self.rng.choice(FRASES)}',
+                    modalidad=self.rng.choice(['presencial', 'virtual', 'virtual', 'ambas']),
+                    ciudad=self.rng.choice(CIUDADES),
+                    precio=Decimal(self.rng.randrange(150, 1200, 10)),
+                    tutor=tutor,
+                    categoria=self.rng.choice(categorias),
+                ))
+        Curso.objects.bulk_create(cursos, batch_size=self.lote)
+        self._informar(f'{len(cursos)} cursos.')
+        return cursos
+
+    def _modalidad(self, curso):
+        return curso.modalidad if curso.modalidad != 'ambas' else self.rng.choice(['presencial', 'virtual'])
+
+    def _tutorias(self, cursos, estudiantes, cantidad, con_resena):
+        hoy = self.ahora.date()
+        resenas = [
+            Reseña(
+                comentario=self.rng.choice(['Excelente tutor.', 'Muy claro.', 'Buena clase.', '']),
+                puntuacion=Decimal(self.rng.choice(['3.00', '3.50', '4.00', '4.50', '5.00', '5.00'])),
+                fecha_reseña=hoy - timedelta(days=self.rng.randint(0, 300)),
+            )
+            for _ in range(con_resena)
+        ]
+        Reseña.objects.bulk_create(resenas, batch_size=self.lote)
+
+        tutorias, reservas = [], []
+        for i in range(cantidad):
+            curso = self.rng.choice(cursos)
+            # Las reseñadas y dos de cada tres del resto ya ocurrieron
+            pasada = i < con_resena or self.rng.random() < 0.66
+            dias = -self.rng.randint(1, 365) if pasada else self.rng.randint(1, 60)
+            fecha = hoy + timedelta(days=dias)
+            tutoria = Tutoria(
+                duracion=curso.tutor.duracion_sesion_minutos,
+                fecha_tutoria=fecha,
+                hora_tutoria=time(self.rng.randint(8, 20)),
+                estado=True,
+                modalidad_tutoria=self._modalidad(curso),
+                reseña=resenas[i] if i < con_resena else None,
+                curso=curso,
+            )
+            tutorias.append(tutoria)
+            reservas.append(Reserva(
+                fecha_reserva=fecha - timedelta(days=self.rng.randint(1, 14)),
+                estado_reserva=True,
+                estudiante=self.rng.choice(estudiantes),
+                tutoria=tutoria,
+            ))
+        Tutoria.objects.bulk_create(tutorias, batch_size=self.lote)
+        Reserva.objects.bulk_create(reservas, batch_size=self.lote)
+        self._informar(f'{cantidad} tutorías con su reserva ({con_resena} reseñadas).')
+
+    def _solicitudes(self, cursos, estudiantes, cantidad):
+        hoy = self.ahora.date()
+        vistas = set()
+        solicitudes = []
+        for _ in range(cantidad):
+            curso = self.rng.choice(cursos)
+            estudiante = self.rng.choice(estudiantes)
+            fecha = hoy + timedelta(days=self.rng.randint(1, 45))
+            # uniq_solicitud_pendiente_por_fecha
+            if (estudiante.pk, curso.pk, fecha) in vistas:
+                continue
+            vistas.add((estudiante.pk, curso.pk, fecha))
+            creada = self.ahora - timedelta(minutes=self.rng.randint(1, 60 * 24 * 14))
+            solicitudes.append(SolicitudReserva(
+                estudiante=estudiante,
+                curso=curso,
+                fecha_propuesta=fecha,
+                hora_propuesta=time(self.rng.randint(8, 20)),
+                modalidad=self._modalidad(curso),
+                duracion=curso.tutor.duracion_sesion_minutos,
+                mensaje=self.rng.choice(FRASES),
+                creado_en=creada,
+                actualizado_en=creada,
+            ))
+        with fechas_manuales(_campo(SolicitudReserva, 'creado_en'), _campo(SolicitudReserva, 'actualizado_en')):
+            SolicitudReserva.objects.bulk_create(solicitudes, batch_size=self.lote)
+        self._informar(f'{len(solicitudes)} solicitudes pendientes.')
+
+    def _mensajeria(self, cursos, estudiantes, n_conversaciones, n_mensajes):
+        conversaciones = []
+        for _ in range(n_conversaciones):
+            curso = self.rng.choice(cursos)
+            creada = self.ahora - timedelta(days=self.rng.randint(1, 180), seconds=self.rng.randint(0, 86400))
+            conversaciones.append(Conversacion(
+                tutor_id=curso.tutor_id,
+                estudiante=self.rng.choice(estudiantes),
+                curso=curso,
+                estado_solicitud=self.rng.choice(['pendiente', 'aceptada', 'aceptada', 'archivada']),
+                created_at=creada,
+                updated_at=creada,
+            ))
+        campos_fecha = (_campo(Conversacion, 'created_at'), _campo(Conversacion, 'updated_at'))
+        with fechas_manuales(*campos_fecha):
+            Conversacion.objects.bulk_create(conversaciones, batch_size=self.lote)
+
+        # Pocas conversaciones muy largas y muchas cortas, como en producción
+        pesos = [self.rng.paretovariate(1.2) for _ in conversaciones]
+        total_pesos = sum(pesos)
+        cuentas = [int(peso / total_pesos * n_mensajes) for peso in pesos]
+        cuentas[pesos.index(max(pesos))] += n_mensajes - sum(cuentas)
+
+        pendientes = []
+        creados = 0
+        with fechas_manuales(_campo(Mensaje, 'creado_en'), *campos_fecha):
+            for conv, cuenta in zip(conversaciones, cuentas):
+                segundos = int((self.ahora - conv.created_at).total_seconds())
+                for desfase in sorted(self.rng.randint(1, segundos) for _ in range(cuenta)):
+                    pendientes.append(Mensaje(
+                        conversacion=conv,
+                        remitente_id=self.rng.choice((conv.tutor_id, conv.estudiante_id)),
+                        contenido=self.rng.choice(FRASES),
+                        creado_en=conv.created_at + timedelta(seconds=desfase),
+                    ))
+                if len(pendientes) >= self.lote * 4:
+                    creados += self._guardar_mensajes(pendientes)
+                    pendientes = []
+            creados += self._guardar_mensajes(pendientes)
+        self._informar(f'{n_conversaciones} conversaciones y {creados} mensajes.')
+
+    def _guardar_mensajes(self, mensajes):
+        """Inserta los mensajes y deja cada conversación con su último mensaje,
+        marcas de lectura y no leídos coherentes."""
+        if not mensajes:
+            return 0
+        Mensaje.objects.bulk_create(mensajes, batch_size=self.lote)
+        por_conv = {}
+        for mensaje in mensajes:
+            por_conv.setdefault(mensaje.conversacion, []).append(mensaje)
+        for conv, lista in por_conv.items():
+            ultimo = lista[-1]
+            conv.ultimo_mensaje = ultimo
+            conv.ultimo_mensaje_preview = ultimo.contenido[:PREVIEW_MAX]
+            conv.ultimo_mensaje_en = ultimo.creado_en
+            conv.updated_at = ultimo.creado_en
+            # Cada participante leyó hasta algún punto del final de la conversación
+            for marca, contador, remitente_ajeno in (
+                ('ultimo_leido_tutor', 'unread_tutor', conv.estudiante_id),
+                ('ultimo_leido_estudiante', 'unread_estudiante', conv.tutor_id),
+            ):
+                leidos = self.rng.randint(int(len(lista) * 0.7), len(lista))
+                setattr(conv, marca, lista[leidos - 1].id if leidos else 0)
+                setattr(conv, contador, sum(1 for m in lista[leidos:] if m.remitente_id == remitente_ajeno))
+        Conversacion.objects.bulk_update(
+            list(por_conv),
+            ['ultimo_mensaje', 'ultimo_mensaje_preview', 'ultimo_mensaje_en', 'updated_at',
+             'ultimo_leido_tutor', 'ultimo_leido_estudiante', 'unread_tutor', 'unread_estudiante'],
+            batch_size=500,
+        )
+        return len(mensajes)
+
+    def _derivados(self, tutores):
+        # bulk_create no dispara señales: índice FTS, acumulados de reseñas,
+        # franjas libres y versiones del caché se rehacen aquí
+        get_busqueda().reconstruir()
+        self._informar('Índice de búsqueda de cursos reconstruido.')
+
+        corregidos = 0
+        for i in range(0, len(tutores), 500):
+            corregidos += len(calificaciones.reconciliar(tutores[i:i + 500]))
+        self._informar(f'Calificaciones recalculadas ({corregidos} tutores).')
+
+        franjas = sum(agenda.reconstruir_indice(tutor.pk) for tutor in tutores)
+        self._informar(f'Índice de disponibilidad reconstruido ({franjas} franjas).')
+
+        for modelo in ('categoria', 'curso', 'disponibilidad', 'solicitud'):
+            cache.invalidar(modelo)
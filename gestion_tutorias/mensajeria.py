@@ -0,0 +1,113 @@
+"""Mantenimiento de los contadores de la conversación al recibir mensajes.
+
+Por defecto cada mensaje actualiza su conversación con un ``UPDATE`` atómico
+(``F()``) dentro de la misma transacción que lo inserta. Con
+``MENSAJES_COALESCER_CONTADORES = True`` los incrementos se acumulan en
+memoria y se aplican por lotes cada ``MENSAJES_COALESCER_INTERVALO``
+segundos, un ``UPDATE`` por conversación en una sola transacción; a cambio
+los contadores y el último mensaje pueden ir hasta un intervalo atrasados.
+"""
+import atexit
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import realtime
+from .models_messaging import Conversacion, PREVIEW_MAX
+from .routers import alias_mensajeria
+
+
+def campo_no_leidos(conv, mensaje):
+    """Contador del participante que recibe el mensaje."""
+    return 'unread_estudiante' if mensaje.remitente_id == conv.tutor_id else 'unread_tutor'
+
+
+def _campos_ultimo_mensaje(mensaje):
+    return {
+        'ultimo_mensaje': mensaje,
+        'ultimo_mensaje_preview': (mensaje.contenido or '')[:PREVIEW_MAX],
+        'ultimo_mensaje_en': mensaje.creado_en,
+        'updated_at': timezone.now(),
+    }
+
+
+class CoalescedorContadores:
+    """Acumula los incrementos de no leídos por conversación y los escribe
+    juntos, para no pelear por el bloqueo de escritura en cada mensaje."""
+
+    def __init__(self, intervalo=0.2):
+        self.intervalo = intervalo
+        self._lock = threading.Lock()
+        self._pendientes = {}
+        self._timer = None
+
+    def agregar(self, conv_id, campo, mensaje):
+        with self._lock:
+            pendiente = self._pendientes.setdefault(
+                conv_id, {'unread_tutor': 0, 'unread_estudiante': 0, 'mensaje': None}
+            )
+            pendiente[campo] += 1
+            if pendiente['mensaje'] is None or mensaje.id > pendiente['mensaje'].id:
+                pendiente['mensaje'] = mensaje
+            if self._timer is None:
+                self._timer = threading.Timer(self.intervalo, self._vaciar_en_hilo)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _vaciar_en_hilo(self):
+        try:
+            self.vaciar()
+        finally:
+            # El hilo del temporizador no vuelve a usar su conexión
+            connections[alias_mensajeria()].close()
+
+    def vaciar(self):
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pendientes:
+            return
+        with transaction.atomic(using=alias_mensajeria()):
+            for conv_id, pendiente in pendientes.items():
+                Conversacion.objects.filter(pk=conv_id).update(
+                    unread_tutor=F('unread_tutor') + pendiente['unread_tutor'],
+                    unread_estudiante=F('unread_estudiante') + pendiente['unread_estudiante'],
+                    **_campos_ultimo_mensaje(pendiente['mensaje']),
+                )
+            for conv in Conversacion.objects.filter(pk__in=list(pendientes)).only(
+                'id', 'tutor_id', 'estudiante_id', 'unread_tutor', 'unread_estudiante'
+            ):
+                realtime.publicar_no_leidos(conv)
+
+
+@lru_cache(maxsize=None)
+def get_coalescedor():
+    coalescedor = CoalescedorContadores(getattr(settings, 'MENSAJES_COALESCER_INTERVALO', 0.2))
+    atexit.register(coalescedor.vaciar)
+    return coalescedor
+
+
+def registrar_mensaje(mensaje):
+    """Suma el mensaje a los no leídos del destinatario y lo deja como último
+    mensaje de la conversación. Debe llamarse dentro de la transacción que
+    insertó el mensaje."""
+    conv = mensaje.conversacion
+    campo = campo_no_leidos(conv, mensaje)
+
+    if getattr(settings, 'MENSAJES_COALESCER_CONTADORES', False):
+        coalescedor = get_coalescedor()
+        transaction.on_commit(lambda: coalescedor.agregar(conv.pk, campo, mensaje), using=alias_mensajeria())
+        return
+
+    Conversacion.objects.filter(pk=conv.pk).update(
+        **{campo: F(campo) + 1},
+        **_campos_ultimo_mensaje(mensaje),
+    )
+    conv.refresh_from_db(fields=['unread_tutor', 'unread_estudiante'])
+    realtime.publicar_no_leidos(conv)
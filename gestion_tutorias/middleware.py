@@ -0,0 +1,315 @@
+"""Middleware propios: instrumentación SQL y compresión de respuestas.
+
+Instrumentación SQL: en las peticiones muestreadas (``INSTRUMENTACION_SQL_MUESTREO``, fracción de
+0 a 1) se envuelven todas las conexiones con ``execute_wrapper`` para contar
+consultas, sumar su tiempo y agrupar las repetidas por huella (el SQL con
+literales y listas ``IN`` normalizados). El resultado se registra como una
+línea JSON en el logger ``gestion_tutorias.sql`` (WARNING si hay sospecha de
+N+1) y se acumula por vista en ``estadisticas``, que el staff consulta en
+``/api/auth/estadisticas/sql/``; la cabecera ``Server-Timing`` solo se añade
+para el staff o con ``DEBUG``, para no enseñar tiempos ni número de consultas
+a cualquiera. Las peticiones no muestreadas solo pagan un ``random()``.
+El muestreo está a 0 por defecto.
+
+Bajo ASGI la cadena de middleware es async (``__acall__``): los wrappers se
+instalan vía ``sync_to_async``, en el mismo contexto con el que Django corre
+las vistas síncronas y las consultas de las async, así que también se miden.
+Lo que un stream (SSE de ``eventos``) consulta después de devolver la
+respuesta queda fuera, igual que bajo WSGI.
+
+Compresión: ``CompresionMiddleware`` es el ``GZipMiddleware`` de Django más
+brotli (si el paquete está instalado), según ``Accept-Encoding``, para las
+respuestas de texto/JSON de al menos ``COMPRESION_MINIMO_BYTES``. El gzip es
+el de Django, con su mitigación de BREACH (bytes aleatorios en la cabecera);
+brotli no la tiene, así que solo se usa en peticiones sin credenciales, cuyas
+respuestas no llevan secretos de sesión. Los streams (SSE de ``eventos``)
+nunca se comprimen: el búfer del compresor retrasaría cada evento.
+"""
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger('gestion_tutorias.sql')
+
+_LISTA_IN = re.compile(r'\bIN \((?:[^()]|\([^()]*\))*\)', re.IGNORECASE)
+_CADENA = re.compile(r"'(?:[^']|'')*'")
+_NUMERO = re.compile(r'\b\d+(?:\.\d+)?\b')
+_ESPACIOS = re.compile(r'\s+')
+_COLUMNAS = re.compile(r'^SELECT (?:DISTINCT )?.*? FROM ', re.IGNORECASE)
+
+
+def huella(sql):
+    """SQL normalizado: mismas consultas con distintos valores coinciden."""
+    sql = _LISTA_IN.sub('IN (...)', sql)
+    sql = _CADENA.sub('?', sql)
+    sql = _NUMERO.sub('?', sql)
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+def _id_huella(texto):
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:12]
+
+
+def _para_mostrar(texto, largo):
+    # La lista de columnas no ayuda a reconocer la consulta; el FROM/WHERE sí
+    return _COLUMNAS.sub('SELECT … FROM ', texto, count=1)[:largo]
+
+
+class RegistroConsultas:
+    """``execute_wrapper`` que acumula las consultas de una petición."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+        self.huellas = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.consultas += 1
+            self.huellas[huella(sql)] += 1
+
+    def repetidas(self, umbral):
+        return [(texto, veces) for texto, veces in self.huellas.most_common() if veces >= umbral]
+
+
+class _Estadisticas:
+    MAX_HUELLAS = 20
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vistas = defaultdict(lambda: {
+            'peticiones': 0, 'consultas': 0, 'consultas_max': 0,
+            'db_ms': 0.0, 'total_ms': 0.0, 'n_mas_1': 0, 'repetidas': Counter(),
+        })
+        self._textos = {}
+
+    def registrar(self, vista, registro, total, repetidas):
+        with self._lock:
+            datos = self._vistas[vista]
+            datos['peticiones'] += 1
+            datos['consultas'] += registro.consultas
+            datos['consultas_max'] = max(datos['consultas_max'], registro.consultas)
+            datos['db_ms'] += registro.tiempo * 1000
+            datos['total_ms'] += total * 1000
+            if repetidas:
+                datos['n_mas_1'] += 1
+            for texto, veces in repetidas:
+                clave = _id_huella(texto)
+                self._textos[clave] = _para_mostrar(texto, 300)
+                datos['repetidas'][clave] = max(datos['repetidas'][clave], veces)
+            # Acotar memoria: solo las huellas más repetidas de cada vista
+            if len(datos['repetidas']) > self.MAX_HUELLAS * 2:
+                datos['repetidas'] = Counter(dict(datos['repetidas'].most_common(self.MAX_HUELLAS)))
+
+    def resumen(self):
+        with self._lock:
+            resultado = {}
+            for vista, datos in self._vistas.items():
+                peticiones = datos['peticiones']
+                resultado[vista] = {
+                    'peticiones': peticiones,
+                    'consultas_promedio': round(datos['consultas'] / peticiones, 2),
+                    'consultas_max': datos['consultas_max'],
+                    'db_ms_promedio': round(datos['db_ms'] / peticiones, 2),
+                    'total_ms_promedio': round(datos['total_ms'] / peticiones, 2),
+                    'peticiones_n_mas_1': datos['n_mas_1'],
+                    'repetidas': [
+                        {'huella': clave, 'sql': self._textos.get(clave), 'max_por_peticion': veces}
+                        for clave, veces in datos['repetidas'].most_common(self.MAX_HUELLAS)
+                    ],
+                }
+            return resultado
+
+    def reiniciar(self):
+        with self._lock:
+            self._vistas.clear()
+            self._textos.clear()
+
+
+estadisticas = _Estadisticas()
+
+
+def _nombre_vista(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return f'{request.method} <sin ruta>'
+    return f'{request.method} {match.view_name or match.route}'
+
+
+class InstrumentacionSQLMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self._muestreada():
+            return self.get_response(request)
+
+        registro = RegistroConsultas()
+        inicio = time.perf_counter()
+        with self._envolver(registro):
+            response = self.get_response(request)
+        return self._informar(request, response, registro, time.perf_counter() - inicio)
+
+    async def __acall__(self, request):
+        if not self._muestreada():
+            return await self.get_response(request)
+
+        registro = RegistroConsultas()
+        inicio = time.perf_counter()
+        pila = await sync_to_async(self._envolver)(registro)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+        return self._informar(request, response, registro, time.perf_counter() - inicio)
+
+    def _muestreada(self):
+        muestreo = getattr(settings, 'INSTRUMENTACION_SQL_MUESTREO', 0)
+        return bool(muestreo) and random.random() < muestreo
+
+    def _envolver(self, registro):
+        pila = ExitStack()
+        for alias in connections:
+            pila.enter_context(connections[alias].execute_wrapper(registro))
+        return pila
+
+    def _informar(self, request, response, registro, total):
+        umbral = getattr(settings, 'INSTRUMENTACION_SQL_UMBRAL_REPETIDAS', 5)
+        repetidas = registro.repetidas(umbral)
+        vista = _nombre_vista(request)
+        estadisticas.registrar(vista, registro, total, repetidas)
+
+        if settings.DEBUG or getattr(getattr(request, 'user', None), 'is_staff', False):
+            response['Server-Timing'] = (
+                f'db;dur={registro.tiempo * 1000:.2f};desc="{registro.consultas} consultas", '
+                f'total;dur={total * 1000:.2f}'
+            )
+        linea = {
+            'vista': vista,
+            'ruta': request.path,
+            'status': response.status_code,
+            'consultas': registro.consultas,
+            'db_ms': round(registro.tiempo * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'repetidas': [
+                {'huella': _id_huella(texto), 'veces': veces, 'sql': _para_mostrar(texto, 200)}
+                for texto, veces in repetidas
+            ],
+        }
+        logger.log(
+            logging.WARNING if repetidas else logging.INFO,
+            json.dumps(linea, ensure_ascii=False),
+        )
+        return response
+
+
+TIPOS_COMPRIMIBLES = ('application/json', 'text/', 'application/javascript', 'application/xml')
+
+
+def codificaciones_aceptadas(cabecera):
+    """``{codificacion: q}`` de una cabecera ``Accept-Encoding``."""
+    aceptadas = {}
+    for parte in cabecera.split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        if not nombre:
+            continue
+        q = 1.0
+        parametro = parametros.strip()
+        if parametro.startswith('q='):
+            try:
+                q = float(parametro[2:])
+            except ValueError:
+                q = 0.0
+        aceptadas[nombre.strip().lower()] = q
+    return aceptadas
+
+
+def elegir_codificacion(cabecera, brotli_permitido=True):
+    aceptadas = codificaciones_aceptadas(cabecera)
+    comodin = aceptadas.get('*', 0)
+    for codificacion in ('br', 'gzip'):
+        if codificacion == 'br' and (brotli is None or not brotli_permitido):
+            continue
+        if aceptadas.get(codificacion, comodin) > 0:
+            return codificacion
+    return None
+
+
+def comprimir(contenido, codificacion):
+    if codificacion == 'br':
+        return brotli.compress(contenido, quality=getattr(settings, 'COMPRESION_BROTLI_CALIDAD', 4))
+    return compress_string(contenido, max_random_bytes=GZipMiddleware.max_random_bytes)
+
+
+def con_credenciales(request):
+    """Si la petición se autentica (cabecera o cookie de sesión/JWT)."""
+    if 'Authorization' in request.headers:
+        return True
+    rest_auth = getattr(settings, 'REST_AUTH', {})
+    cookies = (
+        settings.SESSION_COOKIE_NAME, rest_auth.get('JWT_AUTH_COOKIE'), rest_auth.get('JWT_AUTH_REFRESH_COOKIE'),
+    )
+    return any(nombre and nombre in request.COOKIES for nombre in cookies)
+
+
+class CompresionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        tipo = response.get('Content-Type', '')
+        if tipo.startswith('text/event-stream') or not tipo.startswith(TIPOS_COMPRIMIBLES):
+            return response
+        # Varía por Accept-Encoding aunque esta respuesta no se comprima
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < getattr(settings, 'COMPRESION_MINIMO_BYTES', 1024):
+            return response
+        codificacion = elegir_codificacion(
+            request.headers.get('Accept-Encoding', ''), brotli_permitido=not con_credenciales(request),
+        )
+        if codificacion == 'gzip':
+            return super().process_response(request, response)
+        if codificacion is None:
+            return response
+
+        comprimido = comprimir(response.content, codificacion)
+        if len(comprimido) >= len(response.content):
+            return response
+        response.content = comprimido
+        response['Content-Length'] = str(len(comprimido))
+        response['Content-Encoding'] = codificacion
+        # El cuerpo ya no es byte a byte el mismo
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
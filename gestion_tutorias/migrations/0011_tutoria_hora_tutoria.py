@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_tutorias', '0010_conversacion_unread_estudiante_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tutoria',
+            name='hora_tutoria',
+            field=models.TimeField(blank=True, null=True),
+        ),
+    ]
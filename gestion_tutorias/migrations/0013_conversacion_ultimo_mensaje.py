@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def rellenar_ultimo_mensaje(apps, schema_editor):
+    Conversacion = apps.get_model('gestion_tutorias', 'Conversacion')
+    Mensaje = apps.get_model('gestion_tutorias', 'Mensaje')
+    db = schema_editor.connection.alias
+    for conv in Conversacion.objects.using(db).iterator():
+        msg = Mensaje.objects.using(db).filter(conversacion=conv).order_by('-creado_en', '-id').first()
+        if msg:
+            conv.ultimo_mensaje = msg
+            conv.ultimo_mensaje_preview = (msg.contenido or '')[:120]
+            conv.ultimo_mensaje_en = msg.creado_en
+            conv.save(update_fields=['ultimo_mensaje', 'ultimo_mensaje_preview', 'ultimo_mensaje_en'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_tutorias', '0012_franjalibre'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversacion',
+            name='ultimo_mensaje',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='gestion_tutorias.mensaje'),
+        ),
+        migrations.AddField(
+            model_name='conversacion',
+            name='ultimo_mensaje_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversacion',
+            name='ultimo_mensaje_preview',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.RunPython(rellenar_ultimo_mensaje, migrations.RunPython.noop, hints={'model_name': 'conversacion'}),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_tutorias', '0013_conversacion_ultimo_mensaje'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mensaje',
+            index=models.Index(fields=['conversacion', 'creado_en', 'id'], name='mensaje_conv_creado_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:44
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def rellenar_marcas(apps, schema_editor):
+    Conversacion = apps.get_model('gestion_tutorias', 'Conversacion')
+    Mensaje = apps.get_model('gestion_tutorias', 'Mensaje')
+    db = schema_editor.connection.alias
+    for conv in Conversacion.objects.using(db).iterator():
+        recibidos_tutor = Mensaje.objects.using(db).filter(conversacion=conv).exclude(remitente_id=conv.tutor_id)
+        recibidos_estudiante = Mensaje.objects.using(db).filter(conversacion=conv, remitente_id=conv.tutor_id)
+        # Sin pendientes todo está leído; si no, hasta el último marcado como leído
+        if conv.unread_tutor:
+            conv.ultimo_leido_tutor = recibidos_tutor.filter(leido=True).aggregate(m=Max('id'))['m'] or 0
+        else:
+            conv.ultimo_leido_tutor = conv.ultimo_mensaje_id or 0
+        if conv.unread_estudiante:
+            conv.ultimo_leido_estudiante = recibidos_estudiante.filter(leido=True).aggregate(m=Max('id'))['m'] or 0
+        else:
+            conv.ultimo_leido_estudiante = conv.ultimo_mensaje_id or 0
+        conv.save(update_fields=['ultimo_leido_tutor', 'ultimo_leido_estudiante'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_tutorias', '0014_mensaje_conv_creado_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversacion',
+            name='ultimo_leido_estudiante',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversacion',
+            name='ultimo_leido_tutor',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.RunPython(rellenar_marcas, migrations.RunPython.noop, hints={'model_name': 'conversacion'}),
+        migrations.RemoveField(
+            model_name='mensaje',
+            name='leido',
+        ),
+    ]
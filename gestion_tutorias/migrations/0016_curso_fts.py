@@ -0,0 +1,34 @@
+from django.db import migrations
+
+TABLA = 'gestion_tutorias_curso_fts'
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA} USING fts5("
+        "nombre, descripcion, ciudad, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        f"INSERT INTO {TABLA} (rowid, nombre, descripcion, ciudad) "
+        "SELECT id_curso, nombre, COALESCE(descripcion, ''), COALESCE(ciudad, '') "
+        "FROM gestion_tutorias_curso"
+    )
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TABLA}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_tutorias', '0015_marcas_de_lectura'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+def rellenar_acumulados(apps, schema_editor):
+    Usuario = apps.get_model('gestion_tutorias', 'Usuario')
+    Resena = apps.get_model('gestion_tutorias', 'Rese\u00f1a')
+    filas = (
+        Resena.objects
+        .exclude(tutorias__isnull=True)
+        .values('tutorias__curso__tutor_id')
+        .annotate(total=models.Count('pk'), suma=models.Sum('puntuacion'))
+    )
+    for fila in filas:
+        Usuario.objects.filter(pk=fila['tutorias__curso__tutor_id']).update(
+            resenas_total=fila['total'], resenas_suma=fila['suma'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_tutorias', '0016_curso_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='resenas_suma',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='usuario',
+            name='resenas_total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(rellenar_acumulados, migrations.RunPython.noop),
+    ]
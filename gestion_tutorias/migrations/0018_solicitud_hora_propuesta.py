@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_tutorias', '0017_usuario_resenas_acumuladas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solicitudreserva',
+            name='hora_propuesta',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='tutoria',
+            index=models.Index(fields=['curso', 'fecha_tutoria'], name='tutoria_curso_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_tutorias', '0018_solicitud_hora_propuesta'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='tutoria',
+            name='tutoria_curso_fecha_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bloqueohorario',
+            index=models.Index(fields=['usuario', 'inicio'], name='bloqueo_usuario_inicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='categoria',
+            index=models.Index(fields=['nombre'], name='categoria_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversacion',
+            index=models.Index(fields=['tutor', '-updated_at'], name='conversacion_tutor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversacion',
+            index=models.Index(fields=['estudiante', '-updated_at'], name='conversacion_estudiante_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='curso',
+            index=models.Index(fields=['categoria', 'ciudad', 'modalidad'], name='curso_categoria_ciudad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='curso',
+            index=models.Index(fields=['ciudad', 'modalidad'], name='curso_ciudad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='disponibilidadsemanal',
+            index=models.Index(fields=['usuario', 'dia_semana', 'hora_inicio'], name='disponibilidad_usuario_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudreserva',
+            index=models.Index(fields=['curso', 'estado', '-creado_en'], name='solicitud_curso_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='solicitudreserva',
+            index=models.Index(fields=['estudiante', '-creado_en'], name='solicitud_estudiante_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tutoria',
+            index=models.Index(condition=models.Q(('estado', True), ('hora_tutoria__isnull', False)), fields=['curso', 'fecha_tutoria'], name='tutoria_agenda_idx'),
+        ),
+    ]
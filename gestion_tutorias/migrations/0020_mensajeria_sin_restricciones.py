@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion_tutorias', '0019_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conversacion',
+            name='curso',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='conversaciones', to='gestion_tutorias.curso'),
+        ),
+        migrations.AlterField(
+            model_name='conversacion',
+            name='estudiante',
+            field=models.ForeignKey(db_constraint=False, limit_choices_to={'rol': 'estudiante'}, on_delete=django.db.models.deletion.DO_NOTHING, related_name='conversaciones_como_estudiante', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='conversacion',
+            name='tutor',
+            field=models.ForeignKey(db_constraint=False, limit_choices_to={'rol': 'tutor'}, on_delete=django.db.models.deletion.DO_NOTHING, related_name='conversaciones_como_tutor', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='mensaje',
+            name='remitente',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='mensajes_enviados', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -22,6 +22,9 @@ class Usuario(AbstractUser):
     calificacion_promedio = models.DecimalField(
         max_digits=5, decimal_places=2, blank=True, null=True
     )
+    # Acumulados de reseñas recibidas para recalcular el promedio en O(1)
+    resenas_total = models.PositiveIntegerField(default=0)
+    resenas_suma = models.DecimalField(max_digits=12, decimal_places=2, default=0)
 
     zona_horaria = models.CharField(max_length=50, default='America/Mexico_City')
     duracion_sesion_minutos = models.PositiveSmallIntegerField(default=60)
@@ -50,6 +53,9 @@ class DisponibilidadSemanal(models.Model):
 
     class Meta:
         ordering = ['usuario', 'dia_semana', 'hora_inicio']
+        indexes = [
+            models.Index(fields=['usuario', 'dia_semana', 'hora_inicio'], name='disponibilidad_usuario_idx'),
+        ]
 
     def clean(self):
         if self.hora_inicio >= self.hora_fin:
@@ -77,6 +83,9 @@ class BloqueoHorario(models.Model):
 
     class Meta:
         ordering = ['inicio']
+        indexes = [
+            models.Index(fields=['usuario', 'inicio'], name='bloqueo_usuario_inicio_idx'),
+        ]
 
     def clean(self):
         if self.inicio >= self.fin:
@@ -86,12 +95,39 @@ class BloqueoHorario(models.Model):
         return f"Bloqueo {self.usuario.username} {self.inicio} - {self.fin}"
 
 
+class FranjaLibre(models.Model):
+    """Índice precalculado de los intervalos libres de cada tutor.
+
+    Cada intervalo se repite en cada hora (``bucket``) que toca, de modo que
+    buscar quién está libre en una ventana solo mira las filas de una hora.
+    Se reconstruye con ``agenda.reconstruir_indice``.
+    """
+    tutor = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='franjas_libres')
+    bucket = models.DateTimeField()
+    inicio = models.DateTimeField()
+    fin = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['bucket', 'inicio', 'fin'], name='franja_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"Libre {self.tutor_id} {self.inicio} - {self.fin}"
+
+
 
 class Categoria(models.Model):
     id_categoria = models.AutoField(primary_key=True)
     nombre = models.CharField(max_length=255)
     descripcion = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # El listado se ordena por nombre
+            models.Index(fields=['nombre'], name='categoria_nombre_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -113,6 +149,13 @@ class Curso(models.Model):
     tutor = models.ForeignKey(Usuario, on_delete=models.CASCADE, related_name='cursos')
     categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name='cursos')
 
+    class Meta:
+        indexes = [
+            # Filtros de /filtrar-cursos/ (?categoria=&ciudad=&modalidad=)
+            models.Index(fields=['categoria', 'ciudad', 'modalidad'], name='curso_categoria_ciudad_idx'),
+            models.Index(fields=['ciudad', 'modalidad'], name='curso_ciudad_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -131,6 +174,8 @@ class Tutoria(models.Model):
     id_tutoria = models.AutoField(primary_key=True)
     duracion = models.IntegerField(blank=True, null=True)
     fecha_tutoria = models.DateField()
+    # Hora local (zona del tutor) de inicio; las tutorías antiguas no la tienen
+    hora_tutoria = models.TimeField(blank=True, null=True)
     estado = models.BooleanField(default=True)
     modalidad_tutoria = models.CharField(
         max_length=50,
@@ -142,6 +187,16 @@ class Tutoria(models.Model):
     reseña = models.ForeignKey(Reseña, on_delete=models.SET_NULL, null=True, blank=True, related_name='tutorias')
     curso = models.ForeignKey(Curso, on_delete=models.CASCADE, related_name='tutorias')
 
+    class Meta:
+        indexes = [
+            # Solo las sesiones que ocupan agenda: choques al aceptar (reservas.py)
+            # e intervalos libres (agenda.py)
+            models.Index(
+                fields=['curso', 'fecha_tutoria'], name='tutoria_agenda_idx',
+                condition=Q(estado=True, hora_tutoria__isnull=False),
+            ),
+        ]
+
     def __str__(self):
         return f"Tutoria {self.id_tutoria} - {self.curso.nombre}"
 
@@ -185,6 +240,8 @@ class SolicitudReserva(models.Model):
     )
     curso = models.ForeignKey(Curso, on_delete=models.CASCADE, related_name='solicitudes_reserva')
     fecha_propuesta = models.DateField()
+    # Hora local (zona del tutor) propuesta; se copia a Tutoria.hora_tutoria al aceptar
+    hora_propuesta = models.TimeField(blank=True, null=True)
     modalidad = models.CharField(
         max_length=50,
         choices=[('presencial', 'Presencial'), ('virtual', 'Virtual')]
@@ -204,6 +261,10 @@ class SolicitudReserva(models.Model):
 
     class Meta:
         ordering = ['-creado_en']
+        indexes = [
+            models.Index(fields=['curso', 'estado', '-creado_en'], name='solicitud_curso_estado_idx'),
+            models.Index(fields=['estudiante', '-creado_en'], name='solicitud_estudiante_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['estudiante', 'curso', 'fecha_propuesta'],
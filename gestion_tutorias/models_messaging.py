@@ -1,21 +1,36 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
 from django.core.exceptions import ValidationError
 
+PREVIEW_MAX = 120
+
+
+# Conversaciones y mensajes viven en su propia base (ver routers.py). Las
+# relaciones con Usuario y Curso cruzan de base: sin restricción en la tabla y
+# con DO_NOTHING, porque el borrado en cascada de Django consultaría estas
+# tablas en la base del usuario. signals.py hace ese borrado a mano.
+
 
 class Conversacion(models.Model):
     tutor = models.ForeignKey(
         'gestion_tutorias.Usuario',
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         related_name='conversaciones_como_tutor',
         limit_choices_to={'rol': 'tutor'}
     )
     estudiante = models.ForeignKey(
         'gestion_tutorias.Usuario',
-        on_delete=models.CASCADE,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
         related_name='conversaciones_como_estudiante',
         limit_choices_to={'rol': 'estudiante'}
     )
-    curso = models.ForeignKey('gestion_tutorias.Curso', on_delete=models.SET_NULL, null=True, blank=True, related_name='conversaciones')
+    curso = models.ForeignKey(
+        'gestion_tutorias.Curso', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='conversaciones'
+    )
     estado_solicitud = models.CharField(
         max_length=20,
         choices=[('pendiente', 'Pendiente'), ('aceptada', 'Aceptada'), ('rechazada', 'Rechazada'), ('archivada', 'Archivada')],
@@ -24,34 +39,69 @@ class Conversacion(models.Model):
     # Contadores de no leídos por participante
     unread_tutor = models.PositiveIntegerField(default=0)
     unread_estudiante = models.PositiveIntegerField(default=0)
+    # Último mensaje desnormalizado para servir la bandeja sin consultar mensajes
+    ultimo_mensaje = models.ForeignKey(
+        'Mensaje', on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    ultimo_mensaje_preview = models.CharField(max_length=255, blank=True, default='')
+    ultimo_mensaje_en = models.DateTimeField(null=True, blank=True)
+    # Marcas de lectura: id del último mensaje leído por cada participante
+    ultimo_leido_tutor = models.PositiveBigIntegerField(default=0)
+    ultimo_leido_estudiante = models.PositiveBigIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['tutor', '-updated_at'], name='conversacion_tutor_idx'),
+            models.Index(fields=['estudiante', '-updated_at'], name='conversacion_estudiante_idx'),
+        ]
 
     def __str__(self):
         return f"Conv {self.id}"
 
     def marcar_leidos_por(self, user):
-        if user_id := getattr(user, 'id', None):
-            if user_id == self.tutor_id and self.unread_tutor:
-                self.unread_tutor = 0
-                self.save(update_fields=['unread_tutor'])
-            elif user_id == self.estudiante_id and self.unread_estudiante:
-                self.unread_estudiante = 0
-                self.save(update_fields=['unread_estudiante'])
+        """Mueve la marca de lectura del participante hasta el último mensaje
+        y reinicia su contador, en un único UPDATE de esta fila."""
+        user_id = getattr(user, 'id', None)
+        if user_id == self.tutor_id:
+            marca, contador = 'ultimo_leido_tutor', 'unread_tutor'
+        elif user_id == self.estudiante_id:
+            marca, contador = 'ultimo_leido_estudiante', 'unread_estudiante'
+        else:
+            return
+        if not getattr(self, contador) and getattr(self, marca) >= (self.ultimo_mensaje_id or 0):
+            return
+        Conversacion.objects.filter(pk=self.pk).update(**{
+            marca: Greatest(F(marca), Coalesce(F('ultimo_mensaje'), Value(0))),
+            contador: 0,
+        })
+        setattr(self, marca, max(getattr(self, marca), self.ultimo_mensaje_id or 0))
+        setattr(self, contador, 0)
+
+    def mensaje_leido(self, mensaje):
+        """Un mensaje está leído si no pasa la marca de quien lo recibe."""
+        if mensaje.remitente_id == self.tutor_id:
+            marca = self.ultimo_leido_estudiante
+        else:
+            marca = self.ultimo_leido_tutor
+        return mensaje.id <= marca
 
 
 class Mensaje(models.Model):
     conversacion = models.ForeignKey(Conversacion, on_delete=models.CASCADE, related_name='mensajes')
-    remitente = models.ForeignKey('gestion_tutorias.Usuario', on_delete=models.CASCADE, related_name='mensajes_enviados')
+    remitente = models.ForeignKey(
+        'gestion_tutorias.Usuario', on_delete=models.DO_NOTHING, db_constraint=False, related_name='mensajes_enviados'
+    )
     contenido = models.TextField()
     creado_en = models.DateTimeField(auto_now_add=True)
-    leido = models.BooleanField(default=False)
 
     class Meta:
         ordering = ['creado_en']
+        indexes = [
+            models.Index(fields=['conversacion', 'creado_en', 'id'], name='mensaje_conv_creado_idx'),
+        ]
 
     def clean(self):
         if self.conversacion_id and self.remitente_id:
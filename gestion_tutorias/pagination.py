@@ -0,0 +1,117 @@
+from django.db.models import Q, Subquery
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _id(fila):
+    # Instancias o dicts de .values() (serializers_lectura)
+    return fila['id'] if isinstance(fila, dict) else fila.id
+
+
+class MensajeKeysetPagination(BasePagination):
+    """Paginación por clave ``(creado_en, id)`` para los mensajes de una conversación.
+
+    Sin parámetros devuelve la página más reciente. ``?after=<id>`` trae solo
+    los mensajes posteriores a ese (sondeo incremental) y ``?before=<id>`` la
+    página anterior del historial. Nunca hace ``COUNT`` ni ``OFFSET``: cada
+    página es un rango acotado del índice ``(conversacion, creado_en, id)``.
+    """
+    page_size = 30
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def _get_id(self, request, param):
+        valor = request.query_params.get(param)
+        if valor in (None, ''):
+            return None
+        try:
+            return int(valor)
+        except ValueError:
+            raise ValidationError({param: 'Debe ser el id de un mensaje.'})
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        after = self._get_id(request, 'after')
+        before = self._get_id(request, 'before')
+
+        if after is not None:
+            ref = Subquery(queryset.model.objects.filter(pk=after).values('creado_en')[:1])
+            qs = (
+                queryset
+                .filter(Q(creado_en__gt=ref) | Q(creado_en=ref, id__gt=after))
+                .order_by('creado_en', 'id')
+            )
+            rows = list(qs[:page_size + 1])
+            self.has_newer = len(rows) > page_size
+            rows = rows[:page_size]
+            self.has_older = True
+        else:
+            qs = queryset
+            if before is not None:
+                ref = Subquery(queryset.model.objects.filter(pk=before).values('creado_en')[:1])
+                qs = qs.filter(Q(creado_en__lt=ref) | Q(creado_en=ref, id__lt=before))
+            rows = list(qs.order_by('-creado_en', '-id')[:page_size + 1])
+            self.has_older = len(rows) > page_size
+            rows = rows[:page_size]
+            rows.reverse()
+            # La página más reciente no tiene nada más nuevo; el historial sí
+            self.has_newer = before is not None
+
+        self.first_id = _id(rows[0]) if rows else None
+        self.last_id = _id(rows[-1]) if rows else after
+        return rows
+
+    def _url(self, param, valor):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'after')
+        url = remove_query_param(url, 'before')
+        return replace_query_param(url, param, valor)
+
+    def get_next_link(self):
+        # Siempre hay enlace para sondear mensajes nuevos después del último visto
+        if self.last_id is None:
+            return None
+        return self._url('after', self.last_id)
+
+    def get_previous_link(self):
+        if not self.has_older or self.first_id is None:
+            return None
+        return self._url('before', self.first_id)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'has_more': self.has_newer,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'has_more': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+class ResenaCursorPagination(CursorPagination):
+    """Reseñas de la más reciente a la más antigua, sin ``COUNT``."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id_rese\u00f1a'
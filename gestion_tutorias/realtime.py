@@ -0,0 +1,130 @@
+"""Entrega en tiempo real de eventos de mensajería.
+
+Las vistas publican eventos en canales por usuario (``usuario:<id>``) y la
+vista SSE de ``views/eventos.py`` los reenvía a cada participante conectado.
+El broker se elige con ``settings.REALTIME_BROKER``; ``InProcessBroker`` solo
+alcanza a los clientes conectados al mismo proceso, para varios procesos
+hay que enchufar un broker compartido con la misma interfaz.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .routers import alias_mensajeria
+
+
+def canal_usuario(user_id):
+    return f'usuario:{user_id}'
+
+
+class BaseSuscripcion:
+    async def recibir(self, timeout=None):
+        """Siguiente evento del canal, o ``None`` si vence ``timeout``."""
+        raise NotImplementedError
+
+    def cerrar(self):
+        raise NotImplementedError
+
+
+class BaseBroker:
+    def publicar(self, canal, evento):
+        """Envía ``evento`` (dict serializable) a los suscriptores de ``canal``.
+        Se puede llamar desde cualquier hilo."""
+        raise NotImplementedError
+
+    def suscribir(self, canal):
+        """Devuelve una suscripción; se llama desde el event loop del consumidor."""
+        raise NotImplementedError
+
+
+class _SuscripcionLocal(BaseSuscripcion):
+    def __init__(self, broker, canal, max_cola):
+        self.broker = broker
+        self.canal = canal
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=max_cola)
+
+    def entregar(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: se descarta el evento, no se bloquea al emisor
+            pass
+
+    async def recibir(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def cerrar(self):
+        self.broker._quitar(self)
+
+
+class InProcessBroker(BaseBroker):
+    """Fan-out en memoria con una cola acotada por suscriptor."""
+
+    def __init__(self, max_cola=100):
+        self.max_cola = max_cola
+        self._lock = threading.Lock()
+        self._suscriptores = defaultdict(set)
+
+    def publicar(self, canal, evento):
+        with self._lock:
+            suscriptores = list(self._suscriptores.get(canal, ()))
+        for suscripcion in suscriptores:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion.entregar, evento)
+            except RuntimeError:
+                # El loop del consumidor ya se cerró
+                self._quitar(suscripcion)
+
+    def suscribir(self, canal):
+        suscripcion = _SuscripcionLocal(self, canal, self.max_cola)
+        with self._lock:
+            self._suscriptores[canal].add(suscripcion)
+        return suscripcion
+
+    def _quitar(self, suscripcion):
+        with self._lock:
+            subs = self._suscriptores.get(suscripcion.canal)
+            if subs is not None:
+                subs.discard(suscripcion)
+                if not subs:
+                    del self._suscriptores[suscripcion.canal]
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    ruta = getattr(settings, 'REALTIME_BROKER', 'gestion_tutorias.realtime.InProcessBroker')
+    return import_string(ruta)()
+
+
+def publicar_a_usuarios(user_ids, tipo, datos):
+    """Publica un evento a varios usuarios cuando se confirme la transacción
+    de la base de mensajería."""
+    evento = {'tipo': tipo, 'datos': datos}
+
+    def enviar():
+        broker = get_broker()
+        for user_id in set(user_ids):
+            broker.publicar(canal_usuario(user_id), evento)
+
+    transaction.on_commit(enviar, using=alias_mensajeria())
+
+
+def publicar_no_leidos(conv):
+    publicar_a_usuarios(
+        (conv.tutor_id, conv.estudiante_id),
+        'no_leidos',
+        {
+            'conversacion': conv.id,
+            'unread_tutor': conv.unread_tutor,
+            'unread_estudiante': conv.unread_estudiante,
+        },
+    )
@@ -0,0 +1,92 @@
+"""JSON de la API: renderer, parser y ``dumps``/``loads`` compartidos.
+
+orjson es opcional. Si está instalado codifica las respuestas; si no, se usa
+el ``json`` de la biblioteca estándar con la misma salida (UTF-8, compacto,
+fechas como el ``JSONEncoder`` de DRF).
+
+Los ``Decimal`` nunca pasan por ``float``: se escriben como cadena, igual que
+``serializers.DecimalField`` con ``COERCE_DECIMAL_TO_STRING``, y el parser
+lee los números con decimales como ``Decimal`` (``puntuacion``, ``precio``).
+Para eso el parser usa siempre la biblioteca estándar; orjson no puede leer
+decimales sin convertirlos a ``float``.
+"""
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.utils.encoders import JSONEncoder as DRFJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# DRF escapa estos separadores de línea para poder incrustar el JSON en <script>
+_SEPARADORES = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class JSONEncoder(DRFJSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return '{:f}'.format(obj)
+        return super().default(obj)
+
+
+_encoder = JSONEncoder()
+
+
+def _por_defecto(obj):
+    # Lo que orjson no sabe codificar (Decimal, lazy strings, querysets...)
+    return _encoder.default(obj)
+
+
+def _escapar_separadores(datos):
+    for crudo, escapado in _SEPARADORES:
+        if crudo in datos:
+            datos = datos.replace(crudo, escapado)
+    return datos
+
+
+def dumps(datos, rapido=True):
+    """``datos`` como JSON compacto en bytes UTF-8. ``rapido=False`` fuerza la
+    biblioteca estándar (lo usa ``bench_render`` para comparar)."""
+    if rapido and orjson is not None:
+        return _escapar_separadores(
+            orjson.dumps(datos, default=_por_defecto, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        )
+    texto = json.dumps(datos, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'), allow_nan=False)
+    return _escapar_separadores(texto.encode('utf-8'))
+
+
+def _constante_invalida(valor):
+    raise ValueError(f'Valor JSON no válido: {valor}')
+
+
+def loads(texto):
+    """JSON con los números decimales como ``Decimal``; rechaza NaN/Infinity."""
+    return json.loads(texto, parse_float=Decimal, parse_constant=_constante_invalida)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    encoder_class = JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            # Salida indentada (?format=json; indent=4): solo la pide un humano
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+
+class JSONParser(parsers.JSONParser):
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return loads(stream.read().decode(encoding))
+        except ValueError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
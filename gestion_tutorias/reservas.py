@@ -0,0 +1,268 @@
+"""Aceptación, rechazo y cancelación de solicitudes de reserva.
+
+Los cambios de estado son un *compare-and-swap*: ``UPDATE ... WHERE
+estado='pendiente'``; si no actualiza ninguna fila es que otra petición ganó.
+En SQLite ese ``UPDATE`` es además la primera escritura de la transacción, así
+que toma el bloqueo de escritura antes de buscar choques de horario y dos
+aceptaciones simultáneas no pueden reservar la misma franja. En bases con
+bloqueo por fila se bloquea también la fila del tutor mientras dura la
+transacción (unas pocas sentencias).
+
+Al aceptar se comprueba que la hora propuesta no se solape con otra tutoría
+activa del tutor (índice parcial ``tutoria_agenda_idx``). Las solicitudes sin
+``hora_propuesta`` no pueden chocar y se aceptan como antes.
+
+El lote (``procesar_lote``) cambia cada estado con el mismo *compare-and-swap*
+y crea tutorías y reservas con ``bulk_create``/``bulk_update``. Como no
+disparan señales, aquí se invalida la versión de solicitudes y se programa la
+reconstrucción de la agenda de los tutores afectados.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import agenda, cache
+from .models import Reserva, SolicitudReserva, Tutoria, Usuario
+
+ACCIONES = {'aceptar': 'aceptada', 'rechazar': 'rechazada'}
+MAX_LOTE = 100
+
+
+class SolicitudNoPendiente(Exception):
+    pass
+
+
+class ConflictoHorario(Exception):
+    def __init__(self, tutorias):
+        super().__init__(tutorias)
+        self.tutorias = tutorias
+
+
+def _duracion(solicitud):
+    return solicitud.duracion or getattr(solicitud.curso.tutor, 'duracion_sesion_minutos', 60) or 60
+
+
+def _intervalo(tutor, fecha, hora, duracion):
+    inicio = datetime.combine(fecha, hora, tzinfo=agenda.zona_del_tutor(tutor))
+    return inicio, inicio + timedelta(minutes=duracion or tutor.duracion_sesion_minutos or 60)
+
+
+def _sesiones(tutores, fechas):
+    """Intervalos ocupados por tutor: ``{tutor_id: [(inicio, fin, id_tutoria)]}``.
+
+    Incluye el día anterior y el siguiente a cada fecha por las sesiones que
+    cruzan la medianoche (una de la víspera que entra en la fecha o una de la
+    fecha que entra en el día siguiente). Una sola consulta para todos los
+    tutores.
+    """
+    dias = {fecha + d for fecha in fechas for d in (timedelta(days=-1), timedelta(0), timedelta(days=1))}
+    ocupados = defaultdict(list)
+    filas = (
+        Tutoria.objects
+        .filter(
+            curso__tutor_id__in=list(tutores), estado=True,
+            hora_tutoria__isnull=False, fecha_tutoria__in=dias,
+        )
+        .values_list('curso__tutor_id', 'fecha_tutoria', 'hora_tutoria', 'duracion', 'id_tutoria')
+    )
+    for tutor_id, fecha, hora, duracion, tutoria_id in filas:
+        ocupados[tutor_id].append((*_intervalo(tutores[tutor_id], fecha, hora, duracion), tutoria_id))
+    return ocupados
+
+
+def _choques(ocupados, inicio, fin):
+    return [tutoria_id for a, b, tutoria_id in ocupados if a < fin and inicio < b]
+
+
+def _bloquear_tutores(tutor_ids):
+    # No-op en SQLite (ya tiene el bloqueo de escritura); fila del tutor en el resto
+    list(Usuario.objects.select_for_update().filter(pk__in=tutor_ids).values_list('pk', flat=True))
+
+
+def _nueva_tutoria(solicitud):
+    return Tutoria(
+        duracion=_duracion(solicitud),
+        fecha_tutoria=solicitud.fecha_propuesta,
+        hora_tutoria=solicitud.hora_propuesta,
+        estado=True,
+        modalidad_tutoria=solicitud.modalidad,
+        reseña=None,
+        curso=solicitud.curso,
+    )
+
+
+def _nueva_reserva(solicitud, tutoria, ahora):
+    return Reserva(
+        fecha_reserva=ahora.date(),
+        estado_reserva=True,
+        estudiante_id=solicitud.estudiante_id,
+        pago=None,
+        tutoria=tutoria,
+    )
+
+
+def _cambiar_si_pendiente(solicitud_id, estado, ahora):
+    """El *compare-and-swap*: ``True`` si la solicitud seguía pendiente."""
+    return bool(SolicitudReserva.objects.filter(pk=solicitud_id, estado='pendiente').update(
+        estado=estado, actualizado_en=ahora,
+    ))
+
+
+def _tomar(solicitud_id, estado, ahora):
+    if not _cambiar_si_pendiente(solicitud_id, estado, ahora):
+        raise SolicitudNoPendiente()
+    transaction.on_commit(lambda: cache.invalidar('solicitud'))
+
+
+def cambiar_estado(solicitud, estado):
+    """Pasa una solicitud pendiente a ``estado``; lanza ``SolicitudNoPendiente``
+    si ya no lo estaba."""
+    ahora = timezone.now()
+    _tomar(solicitud.pk, estado, ahora)
+    solicitud.estado = estado
+    solicitud.actualizado_en = ahora
+
+
+def aceptar(solicitud):
+    """Acepta la solicitud creando su tutoría y su reserva en una transacción.
+
+    Lanza ``SolicitudNoPendiente`` si otra petición la procesó antes y
+    ``ConflictoHorario`` si el tutor ya tiene una tutoría a esa hora.
+    """
+    tutor = solicitud.curso.tutor
+    ahora = timezone.now()
+    with transaction.atomic():
+        _tomar(solicitud.pk, 'aceptada', ahora)
+        if solicitud.hora_propuesta is not None:
+            _bloquear_tutores([tutor.pk])
+            inicio, fin = _intervalo(
+                tutor, solicitud.fecha_propuesta, solicitud.hora_propuesta, _duracion(solicitud)
+            )
+            choques = _choques(_sesiones({tutor.pk: tutor}, [solicitud.fecha_propuesta])[tutor.pk], inicio, fin)
+            if choques:
+                # Deshace también el cambio de estado
+                raise ConflictoHorario(choques)
+
+        tutoria = _nueva_tutoria(solicitud)
+        tutoria.save()
+        reserva = _nueva_reserva(solicitud, tutoria, ahora)
+        reserva.save()
+        SolicitudReserva.objects.filter(pk=solicitud.pk).update(tutoria=tutoria, reserva=reserva)
+    solicitud.estado = 'aceptada'
+    solicitud.actualizado_en = ahora
+    solicitud.tutoria = tutoria
+    solicitud.reserva = reserva
+    return tutoria, reserva
+
+
+def _error(solicitud_id, detalle, **extra):
+    return {'solicitud_id': solicitud_id, 'ok': False, 'detail': detalle, **extra}
+
+
+def procesar_lote(queryset, user, ids, accion):
+    """Aplica ``accion`` ('aceptar' o 'rechazar') a las solicitudes ``ids``
+    visibles en ``queryset``.
+
+    Devuelve un resultado por id, en el orden recibido. Las que fallan (no
+    existen, no son del tutor, ya no están pendientes o chocan con otra
+    tutoría) no frenan al resto.
+
+    Cada cambio de estado es el mismo *compare-and-swap* que ``aceptar``: el
+    ``select_for_update`` no bloquea nada en SQLite, así que una solicitud
+    que se leyó pendiente pero otra petición procesó antes del ``UPDATE``
+    sale con ``conflicto`` en vez de pisarse.
+    """
+    ids = list(dict.fromkeys(ids))
+    resultados = {}
+    validas = []
+    ahora = timezone.now()
+    estado = ACCIONES[accion]
+
+    with transaction.atomic():
+        solicitudes = {
+            s.id: s
+            for s in queryset.select_for_update(of=('self',))
+            .select_related('curso', 'curso__tutor')
+            .filter(pk__in=ids)
+        }
+        for solicitud_id in ids:
+            solicitud = solicitudes.get(solicitud_id)
+            if solicitud is None:
+                resultados[solicitud_id] = _error(solicitud_id, 'No encontrada.')
+            elif not (getattr(user, 'is_staff', False) or user.id == solicitud.curso.tutor_id):
+                resultados[solicitud_id] = _error(
+                    solicitud_id, f'Solo el tutor del curso puede {accion} la solicitud.'
+                )
+            elif solicitud.estado != 'pendiente':
+                resultados[solicitud_id] = _error(solicitud_id, 'La solicitud no está en estado pendiente.')
+            else:
+                validas.append(solicitud)
+
+        # Primera escritura: en SQLite toma el bloqueo antes de buscar choques
+        tomadas = []
+        for solicitud in validas:
+            if _cambiar_si_pendiente(solicitud.pk, estado, ahora):
+                tomadas.append(solicitud)
+            else:
+                resultados[solicitud.id] = _error(
+                    solicitud.id, 'Otra petición procesó la solicitud primero.', conflicto=True,
+                )
+        validas = tomadas
+
+        if accion == 'aceptar':
+            con_hora = [s for s in validas if s.hora_propuesta is not None]
+            if con_hora:
+                tutores = {s.curso.tutor_id: s.curso.tutor for s in con_hora}
+                _bloquear_tutores(list(tutores))
+                ocupados = _sesiones(tutores, {s.fecha_propuesta for s in con_hora})
+                aceptables = []
+                for solicitud in validas:
+                    if solicitud.hora_propuesta is not None:
+                        tutor = solicitud.curso.tutor
+                        inicio, fin = _intervalo(
+                            tutor, solicitud.fecha_propuesta, solicitud.hora_propuesta, _duracion(solicitud)
+                        )
+                        choques = _choques(ocupados[tutor.pk], inicio, fin)
+                        if choques:
+                            # Deshace el cambio de estado de esta solicitud
+                            SolicitudReserva.objects.filter(pk=solicitud.pk).update(
+                                estado='pendiente', actualizado_en=solicitud.actualizado_en,
+                            )
+                            resultados[solicitud.id] = _error(
+                                solicitud.id, 'El tutor ya tiene una tutoría en ese horario.',
+                                tutorias=[c for c in choques if c is not None],
+                            )
+                            continue
+                        # Las del mismo lote también ocupan la franja
+                        ocupados[tutor.pk].append((inicio, fin, None))
+                    aceptables.append(solicitud)
+                validas = aceptables
+
+            if validas:
+                tutorias = Tutoria.objects.bulk_create([_nueva_tutoria(s) for s in validas])
+                reservas = Reserva.objects.bulk_create([
+                    _nueva_reserva(s, tutoria, ahora) for s, tutoria in zip(validas, tutorias)
+                ])
+                for solicitud, tutoria, reserva in zip(validas, tutorias, reservas):
+                    solicitud.tutoria = tutoria
+                    solicitud.reserva = reserva
+                # El estado ya lo fijó el compare-and-swap
+                SolicitudReserva.objects.bulk_update(validas, ['tutoria', 'reserva'])
+            for tutor_id in {s.curso.tutor_id for s in validas}:
+                agenda.programar_reconstruccion(tutor_id)
+
+        for solicitud in validas:
+            solicitud.estado = estado
+            solicitud.actualizado_en = ahora
+        if validas:
+            transaction.on_commit(lambda: cache.invalidar('solicitud'))
+
+    for solicitud in validas:
+        resultado = {'solicitud_id': solicitud.id, 'ok': True, 'estado_solicitud': solicitud.estado}
+        if accion == 'aceptar':
+            resultado['tutoria_id'] = solicitud.tutoria.id_tutoria
+            resultado['reserva_id'] = solicitud.reserva.id_reserva
+        resultados[solicitud.id] = resultado
+    return [resultados[solicitud_id] for solicitud_id in ids]
@@ -0,0 +1,57 @@
+"""Router de la mensajería a su propia base de datos.
+
+``Conversacion`` y ``Mensaje`` viven en el alias ``mensajeria`` (otro archivo
+SQLite), así las ráfagas de mensajes no compiten por el bloqueo de escritura
+con reservas y tutorías. Si ``DATABASES`` no define ese alias todo queda en
+``default``, como antes.
+
+Entre las dos bases no hay claves foráneas reales ni JOIN: las columnas
+``tutor_id``, ``estudiante_id``, ``curso_id`` y ``remitente_id`` son enteros
+sin restricción (``db_constraint=False``) y el borrado de usuarios y cursos se
+propaga a mano desde ``signals``. Nada debe hacer ``select_related`` ni
+filtrar por campos de ``Usuario``/``Curso`` a través de esas relaciones.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+ALIAS_MENSAJERIA = 'mensajeria'
+MODELOS_MENSAJERIA = frozenset({'conversacion', 'mensaje'})
+
+
+def alias_mensajeria():
+    """Alias donde están las tablas de mensajería."""
+    return ALIAS_MENSAJERIA if ALIAS_MENSAJERIA in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+def es_mensajeria(modelo):
+    opts = modelo._meta
+    return opts.app_label == 'gestion_tutorias' and opts.model_name in MODELOS_MENSAJERIA
+
+
+class MensajeriaRouter:
+
+    def _alias(self, model):
+        # Explícito también para el resto: sin router Django usaría la base
+        # de la instancia de origen y un conv.tutor se buscaría en mensajeria
+        return alias_mensajeria() if es_mensajeria(model) else DEFAULT_DB_ALIAS
+
+    def db_for_read(self, model, **hints):
+        return self._alias(model)
+
+    def db_for_write(self, model, **hints):
+        return self._alias(model)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if es_mensajeria(type(obj1)) or es_mensajeria(type(obj2)):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = alias_mensajeria()
+        if alias == DEFAULT_DB_ALIAS:
+            return None
+        if app_label == 'gestion_tutorias' and model_name in MODELOS_MENSAJERIA:
+            return db == alias
+        if db == alias:
+            return False
+        return None
@@ -1,20 +1,23 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
 from django.contrib.auth import get_user_model
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.password_validation import validate_password
 from .models import (
     Usuario, Categoria, Curso, Tutoria, Reseña, Pago, Reserva,
     DisponibilidadSemanal, BloqueoHorario, SolicitudReserva
 )
 from .models_messaging import (Conversacion, Mensaje,)
+from .authentication import tokens_para_usuario
+from .reservas import ACCIONES, MAX_LOTE
 
 User = get_user_model()
 
-class LoginSerializer(serializers.Serializer):
+class LoginDatosSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
+
+class LoginSerializer(LoginDatosSerializer):
     def validate(self, attrs):
         email = attrs.get("email")
         password = attrs.get("password")
@@ -24,17 +27,22 @@ class LoginSerializer(serializers.Serializer):
         if not user:
             raise serializers.ValidationError("Invalid email or password")
 
-        refresh = RefreshToken.for_user(user)
+        return datos_login(user)
+
 
-        return {
-            "refresh": str(refresh),
-            "access": str(refresh.access_token),
-            "user": {
-                "id": user.id, # type: ignore[attr-defined]
-                "username": user.username,
-                "email": user.email,
-            },
-        }
+def datos_login(user):
+    # Los tokens llevan rol e is_staff firmados para autenticar sin ir a la base
+    refresh, access = tokens_para_usuario(user)
+
+    return {
+        "refresh": str(refresh),
+        "access": str(access),
+        "user": {
+            "id": user.id, # type: ignore[attr-defined]
+            "username": user.username,
+            "email": user.email,
+        },
+    }
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -55,7 +63,11 @@ class RegisterSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         user = User(username=validated_data["username"], email=validated_data["email"])
-        user.set_password(validated_data["password"])
+        if validated_data.get("password_hash"):
+            # Hash ya calculado fuera del hilo de la petición (views/users.py)
+            user.password = validated_data["password_hash"]
+        else:
+            user.set_password(validated_data["password"])
         user.save()
         return user
 
@@ -114,7 +126,7 @@ class SolicitudReservaSerializer(serializers.ModelSerializer):
     class Meta:
         model = SolicitudReserva
         fields = [
-            'id', 'estudiante', 'curso', 'tutor', 'fecha_propuesta',
+            'id', 'estudiante', 'curso', 'tutor', 'fecha_propuesta', 'hora_propuesta',
             'modalidad', 'duracion', 'mensaje', 'estado',
             'creado_en', 'actualizado_en', 'tutoria', 'reserva'
         ]
@@ -156,6 +168,13 @@ class SolicitudReservaSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class SolicitudesLoteSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_LOTE
+    )
+    accion = serializers.ChoiceField(choices=list(ACCIONES))
+
+
 class DisponibilidadSemanalSerializer(serializers.ModelSerializer):
     class Meta:
         model = DisponibilidadSemanal
@@ -174,20 +193,37 @@ class ConversacionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Conversacion
         fields = '__all__'
+        # Los mantienen mensajeria.registrar_mensaje y Conversacion.marcar_leidos_por
+        read_only_fields = [
+            'unread_tutor', 'unread_estudiante', 'ultimo_mensaje', 'ultimo_mensaje_preview',
+            'ultimo_mensaje_en', 'ultimo_leido_tutor', 'ultimo_leido_estudiante',
+        ]
 
 
 class MensajeSerializer(serializers.ModelSerializer):
+    # Derivado de la marca de lectura de la conversación
+    leido = serializers.SerializerMethodField()
+
     class Meta:
         model = Mensaje
         fields = '__all__'
         read_only_fields = ['remitente']
 
+    def get_leido(self, obj):
+        return obj.conversacion.mensaje_leido(obj)
+
 
 class MensajeSimpleSerializer(serializers.ModelSerializer):
+    leido = serializers.SerializerMethodField()
+
     class Meta:
         model = Mensaje
         fields = ('id', 'remitente', 'contenido', 'creado_en', 'leido')
 
+    def get_leido(self, obj):
+        conv = self.context.get('conversacion') or obj.conversacion
+        return conv.mensaje_leido(obj)
+
 
 class ConversacionListItemSerializer(serializers.ModelSerializer):
     ultimo_mensaje = serializers.SerializerMethodField()
@@ -198,18 +234,19 @@ class ConversacionListItemSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'tutor', 'estudiante', 'curso', 'estado_solicitud',
             'unread_tutor', 'unread_estudiante', 'updated_at', 'ultimo_mensaje',
-            'no_leidos'
+            'ultimo_mensaje_preview', 'ultimo_mensaje_en', 'no_leidos'
         )
 
     def get_ultimo_mensaje(self, obj):
-        msg = obj.mensajes.order_by('-creado_en').first()
+        # Puntero desnormalizado; la vista lo trae con select_related
+        msg = obj.ultimo_mensaje
         if not msg:
             return None
-        return MensajeSimpleSerializer(msg).data
+        return MensajeSimpleSerializer(msg, context={'conversacion': obj}).data
 
     def get_no_leidos(self, obj):
         request = self.context.get('request')
-        user = getattr(request, 'user', None)
-        if not user:
+        user_id = getattr(getattr(request, 'user', None), 'id', None)
+        if not user_id:
             return 0
-        return obj.unread_tutor if user == obj.tutor else obj.unread_estudiante
+        return obj.unread_tutor if user_id == obj.tutor_id else obj.unread_estudiante
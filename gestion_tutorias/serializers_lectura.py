@@ -0,0 +1,100 @@
+"""Serializadores de solo lectura para los listados grandes.
+
+``ModelSerializer`` resuelve sus campos por introspección y llama a
+``to_representation`` campo por campo en cada objeto; en los listados de
+cursos, mensajes y categorías eso se lleva la mayor parte del CPU. Estas
+clases piden solo las columnas necesarias con ``.values()`` y arman los dicts
+en un único bucle, con la misma salida que el serializador al que sustituyen
+(``tests.LecturaRapidaTests`` lo comprueba). Se usan desde
+``views.mixins.LecturaRapidaMixin`` únicamente para ``list``.
+"""
+from django.utils import timezone
+
+
+def fecha_hora(valor, zona):
+    """Igual que ``serializers.DateTimeField``: en ``zona`` (la actual, que el
+    llamador resuelve una vez por listado) y con ``Z`` para UTC."""
+    if valor is None:
+        return None
+    if valor.tzinfo is not None:
+        valor = valor.astimezone(zona)
+    texto = valor.isoformat()
+    if texto.endswith('+00:00'):
+        texto = texto[:-6] + 'Z'
+    return texto
+
+
+def decimal(valor):
+    """Igual que ``serializers.DecimalField`` con ``COERCE_DECIMAL_TO_STRING``."""
+    return None if valor is None else '{:f}'.format(valor)
+
+
+class LecturaRapida:
+    columnas = ()
+
+    def __init__(self, context=None):
+        self.context = context or {}
+
+    def valores(self, queryset):
+        return queryset.values(*self.columnas)
+
+    def representar(self, filas):
+        raise NotImplementedError
+
+
+class CategoriaLectura(LecturaRapida):
+    """Salida de ``CategoriaSerializer``."""
+    columnas = ('id_categoria', 'nombre', 'descripcion')
+
+    def representar(self, filas):
+        return [
+            {'id_categoria': f['id_categoria'], 'nombre': f['nombre'], 'descripcion': f['descripcion']}
+            for f in filas
+        ]
+
+
+class CursoLectura(LecturaRapida):
+    """Salida de ``CursoSerializer``."""
+    columnas = ('id_curso', 'nombre', 'descripcion', 'modalidad', 'ciudad', 'precio', 'tutor_id', 'categoria_id')
+
+    def representar(self, filas):
+        return [
+            {
+                'id_curso': f['id_curso'],
+                'nombre': f['nombre'],
+                'descripcion': f['descripcion'],
+                'modalidad': f['modalidad'],
+                'ciudad': f['ciudad'],
+                'precio': decimal(f['precio']),
+                'tutor': f['tutor_id'],
+                'categoria': f['categoria_id'],
+            }
+            for f in filas
+        ]
+
+
+class MensajeLectura(LecturaRapida):
+    """Salida de ``MensajeSerializer``; ``leido`` sale de las marcas de la
+    conversación, igual que ``Conversacion.mensaje_leido``."""
+    columnas = (
+        'id', 'contenido', 'creado_en', 'conversacion_id', 'remitente_id',
+        'conversacion__tutor_id', 'conversacion__ultimo_leido_tutor', 'conversacion__ultimo_leido_estudiante',
+    )
+
+    def representar(self, filas):
+        zona = timezone.get_current_timezone()
+        resultado = []
+        for f in filas:
+            if f['remitente_id'] == f['conversacion__tutor_id']:
+                marca = f['conversacion__ultimo_leido_estudiante']
+            else:
+                marca = f['conversacion__ultimo_leido_tutor']
+            resultado.append({
+                'id': f['id'],
+                'leido': f['id'] <= marca,
+                'contenido': f['contenido'],
+                'creado_en': fecha_hora(f['creado_en'], zona),
+                'conversacion': f['conversacion_id'],
+                'remitente': f['remitente_id'],
+            })
+        return resultado
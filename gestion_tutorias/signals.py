@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import agenda, cache
+from .authentication import usuarios
+from .busqueda import get_busqueda
+from .models import Usuario, DisponibilidadSemanal, BloqueoHorario, Tutoria, Curso, Categoria, SolicitudReserva
+from .models_messaging import Conversacion, Mensaje
+from .routers import alias_mensajeria
+
+
+@receiver([post_save, post_delete], sender=DisponibilidadSemanal)
+@receiver([post_save, post_delete], sender=BloqueoHorario)
+def reindexar_agenda_usuario(sender, instance, **kwargs):
+    agenda.programar_reconstruccion(instance.usuario_id)
+
+
+CAMPOS_AGENDA_TUTORIA = {'fecha_tutoria', 'hora_tutoria', 'duracion', 'estado', 'curso'}
+
+
+@receiver([post_save, post_delete], sender=Tutoria)
+def reindexar_agenda_tutoria(sender, instance, update_fields=None, **kwargs):
+    # Guardados parciales que no tocan el horario (p. ej. enlazar la reseña) no cambian la agenda
+    if update_fields and not CAMPOS_AGENDA_TUTORIA.intersection(update_fields):
+        return
+    try:
+        tutor_id = instance.curso.tutor_id
+    except Curso.DoesNotExist:
+        # El curso se borró en cascada junto con sus tutorías
+        return
+    agenda.programar_reconstruccion(tutor_id)
+
+
+@receiver(post_save, sender=Curso)
+def indexar_curso(sender, instance, **kwargs):
+    get_busqueda().indexar(instance)
+
+
+@receiver(post_delete, sender=Curso)
+def desindexar_curso(sender, instance, **kwargs):
+    get_busqueda().eliminar(instance.pk)
+
+
+# Al confirmar: invalidando antes, una lectura concurrente podría guardar las
+# filas aún sin confirmar bajo la versión nueva hasta CATALOGO_CACHE_TTL (o
+# responder 304 con ella)
+
+
+@receiver([post_save, post_delete], sender=Categoria)
+def invalidar_cache_categoria(sender, instance, using, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: cache.invalidar('categoria', pk), using=using)
+
+
+@receiver([post_save, post_delete], sender=Curso)
+def invalidar_cache_curso(sender, instance, using, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: cache.invalidar('curso', pk), using=using)
+
+
+@receiver([post_save, post_delete], sender=DisponibilidadSemanal)
+def invalidar_version_disponibilidad(sender, instance, using, **kwargs):
+    transaction.on_commit(lambda: cache.invalidar('disponibilidad'), using=using)
+
+
+@receiver([post_save, post_delete], sender=SolicitudReserva)
+def invalidar_version_solicitud(sender, instance, using, **kwargs):
+    transaction.on_commit(lambda: cache.invalidar('solicitud'), using=using)
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+def invalidar_usuario_autenticado(sender, instance, using, **kwargs):
+    # Otra vez al confirmar: una petición concurrente pudo volver a guardar la
+    # copia anterior (p. ej. aún activa) antes de que la transacción terminara
+    pk = instance.pk
+    usuarios.invalidar(pk)
+    transaction.on_commit(lambda: usuarios.invalidar(pk), using=using)
+
+
+# La mensajería está en otra base: lo que antes hacía la cascada de la FK se
+# aplica al confirmar el borrado del usuario o del curso
+
+
+@receiver(post_delete, sender=Usuario)
+def borrar_mensajeria_usuario(sender, instance, using, **kwargs):
+    usuario_id = instance.pk
+
+    def borrar():
+        with transaction.atomic(using=alias_mensajeria()):
+            Conversacion.objects.filter(Q(tutor_id=usuario_id) | Q(estudiante_id=usuario_id)).delete()
+            Mensaje.objects.filter(remitente_id=usuario_id).delete()
+
+    transaction.on_commit(borrar, using=using)
+
+
+@receiver(post_delete, sender=Curso)
+def desvincular_conversaciones_curso(sender, instance, using, **kwargs):
+    curso_id = instance.pk
+    transaction.on_commit(
+        lambda: Conversacion.objects.filter(curso_id=curso_id).update(curso=None), using=using
+    )
@@ -1,3 +1,1618 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password, make_password
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from principal import settings_prod
+
+from . import (
+    agenda, authentication, busqueda, cache, calificaciones, facetas, hashing, mensajeria, middleware, realtime,
+    renderers, reservas,
+)
+from .models import (
+    BloqueoHorario, Categoria, Curso, DisponibilidadSemanal, FranjaLibre, Reserva, Reseña, SolicitudReserva, Tutoria,
+    Usuario,
+)
+from .models_messaging import Conversacion, Mensaje
+from .routers import ALIAS_MENSAJERIA, MensajeriaRouter
+from .serializers import CategoriaSerializer, CursoSerializer, MensajeSerializer
+from .serializers_lectura import CategoriaLectura, CursoLectura, MensajeLectura
+from .views.crud import (
+    BloqueoHorarioViewSet, CategoriaViewSet, ConversacionViewSet, CursoFilterView,
+    CursoViewSet, DisponibilidadSemanalViewSet, MensajeViewSet, SolicitudReservaViewSet,
+)
+
+# "SCAN tabla", con o sin "USING [COVERING] INDEX": recorre la tabla o el índice entero
+SCAN_COMPLETO = re.compile(r'^SCAN ')
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN es de SQLite')
+class PlanesDeConsultaTests(TestCase):
+    """El queryset principal de cada vista, tal como lo arma para un usuario
+    no staff, debe resolverse por índice.
+
+    Los listados sin filtro del staff recorren la tabla por diseño y no se
+    comprueban aquí.
+    """
+    databases = {'default', ALIAS_MENSAJERIA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.estudiante = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        cls.categoria = Categoria.objects.create(nombre='Matemáticas')
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [fila[-1] for fila in cursor.fetchall()]
+
+    def queryset_de(self, vista_cls, user, params=None):
+        vista = vista_cls()
+        vista.action = 'list'
+        vista.kwargs = {}
+        vista.format_kwarg = None
+        vista.request = Request(APIRequestFactory().get('/', params or {}))
+        vista.request.user = user
+        return vista.filter_queryset(vista.get_queryset())
+
+    def assertSinScanCompleto(self, queryset, ordenado=False, permitidos=()):
+        """``permitidos``: pasos exactos del plan que recorren todo por diseño."""
+        plan = self.plan(queryset)
+        completos = [paso for paso in plan if SCAN_COMPLETO.match(paso) and paso not in permitidos]
+        self.assertEqual(completos, [], plan)
+        if ordenado:
+            # El índice ya devuelve las filas en el orden pedido
+            self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan, plan)
+
+    def test_solicitudes_del_tutor(self):
+        self.assertSinScanCompleto(self.queryset_de(SolicitudReservaViewSet, self.tutor))
+
+    def test_solicitudes_del_estudiante(self):
+        self.assertSinScanCompleto(self.queryset_de(SolicitudReservaViewSet, self.estudiante), ordenado=True)
+
+    def test_disponibilidades(self):
+        self.assertSinScanCompleto(self.queryset_de(DisponibilidadSemanalViewSet, self.tutor), ordenado=True)
+
+    def test_bloqueos(self):
+        self.assertSinScanCompleto(self.queryset_de(BloqueoHorarioViewSet, self.tutor), ordenado=True)
+
+    def test_conversaciones(self):
+        self.assertSinScanCompleto(self.queryset_de(ConversacionViewSet, self.estudiante))
+
+    def test_mensajes(self):
+        self.assertSinScanCompleto(self.queryset_de(MensajeViewSet, self.estudiante))
+
+    def test_mensajes_de_una_conversacion(self):
+        qs = self.queryset_de(MensajeViewSet, self.estudiante, {'conversacion': 1}).order_by('creado_en', 'id')
+        self.assertSinScanCompleto(qs, ordenado=True)
+
+    def test_categorias(self):
+        # Listado público sin filtro: recorre el índice por nombre, que ya da el orden
+        self.assertSinScanCompleto(
+            self.queryset_de(CategoriaViewSet, self.estudiante), ordenado=True,
+            permitidos={'SCAN gestion_tutorias_categoria USING INDEX categoria_nombre_idx'},
+        )
+
+    def test_cursos_por_categoria(self):
+        qs = self.queryset_de(CursoViewSet, self.estudiante, {'categoria': self.categoria.pk})
+        self.assertSinScanCompleto(qs)
+
+    def test_filtrar_cursos(self):
+        categoria = self.categoria.pk
+        for params in (
+            {'categoria': categoria},
+            {'categoria': categoria, 'ciudad': 'Lima', 'modalidad': 'virtual'},
+            {'ciudad': 'Lima'},
+            {'ciudad': 'Lima', 'modalidad': 'virtual'},
+        ):
+            with self.subTest(params=params):
+                self.assertSinScanCompleto(self.queryset_de(CursoFilterView, self.estudiante, params))
+
+    def test_filtrar_cursos_disponibles(self):
+        desde = datetime(2030, 1, 7, 15, tzinfo=dt_timezone.utc).isoformat()
+        qs = self.queryset_de(CursoFilterView, self.estudiante, {'disponible_desde': desde})
+        self.assertSinScanCompleto(qs)
+
+
+class LecturaRapidaTests(TestCase):
+    """Los serializadores de ``serializers_lectura`` deben producir
+    exactamente lo mismo que los ``ModelSerializer`` que sustituyen."""
+    databases = {'default', ALIAS_MENSAJERIA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.estudiante = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        cls.categoria = Categoria.objects.create(nombre='Música', descripcion='Instrumentos y teoría')
+        Categoria.objects.create(nombre='Álgebra')
+        for i, precio in enumerate(('150', '99.5', '1200.00', '0.01')):
+            Curso.objects.create(
+                nombre=f'Curso ñ {i}', descripcion=None if i % 2 else 'Descripción',
+                modalidad=('presencial', 'virtual', 'ambas')[i % 3], ciudad=None if i == 3 else 'Lima',
+                precio=Decimal(precio), tutor=cls.tutor, categoria=cls.categoria,
+            )
+        cls.conversacion = Conversacion.objects.create(tutor=cls.tutor, estudiante=cls.estudiante)
+        mensajes = [
+            Mensaje.objects.create(
+                conversacion=cls.conversacion,
+                remitente=cls.tutor if i % 2 else cls.estudiante,
+                contenido=f'Mensaje {i} «con acentos»',
+            )
+            for i in range(6)
+        ]
+        # Cada participante leyó una parte distinta
+        Conversacion.objects.filter(pk=cls.conversacion.pk).update(
+            ultimo_leido_tutor=mensajes[3].id, ultimo_leido_estudiante=mensajes[1].id,
+        )
+
+    def assertEquivalente(self, queryset, serializer_class, lectura_class):
+        lectura = lectura_class()
+        esperado = serializer_class(queryset, many=True).data
+        self.assertEqual(lectura.representar(lectura.valores(queryset)), esperado)
+
+    def test_categorias(self):
+        self.assertEquivalente(Categoria.objects.order_by('nombre'), CategoriaSerializer, CategoriaLectura)
+
+    def test_cursos(self):
+        self.assertEquivalente(Curso.objects.order_by('id_curso'), CursoSerializer, CursoLectura)
+
+    def test_mensajes(self):
+        qs = Mensaje.objects.select_related('conversacion').order_by('creado_en', 'id')
+        self.assertEquivalente(qs, MensajeSerializer, MensajeLectura)
+
+    @override_settings(TIME_ZONE='America/Lima')
+    def test_mensajes_en_otra_zona(self):
+        Mensaje.objects.filter(pk=Mensaje.objects.first().pk).update(
+            creado_en=datetime(2030, 1, 1, 3, 4, 5, 678, tzinfo=dt_timezone.utc) - timedelta(days=1),
+        )
+        qs = Mensaje.objects.select_related('conversacion').order_by('creado_en', 'id')
+        self.assertEquivalente(qs, MensajeSerializer, MensajeLectura)
+
+    @override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+    def test_endpoints(self):
+        cache.get_cache().clear()
+        client = APIClient()
+        client.force_authenticate(self.estudiante)
+        casos = (
+            ('/api/auth/crud/categorias/', Categoria.objects.order_by('nombre'), CategoriaSerializer),
+            ('/api/auth/crud/cursos/', Curso.objects.all(), CursoSerializer),
+            ('/api/auth/filtrar-cursos/?ciudad=Lima', Curso.objects.filter(ciudad='Lima').order_by('id_curso'),
+             CursoSerializer),
+            (f'/api/auth/crud/mensajes/?conversacion={self.conversacion.pk}',
+             Mensaje.objects.select_related('conversacion').order_by('creado_en', 'id'), MensajeSerializer),
+        )
+        for url, queryset, serializer_class in casos:
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['results'], serializer_class(queryset, many=True).data)
+
+
+class PerfilSQLiteProduccionTests(SimpleTestCase):
+    """Un escritor con cambios sin confirmar y varios lectores en paralelo, sobre
+    bases temporales: con el perfil de ``settings_prod`` (WAL) todos leen la
+    última versión confirmada; con el journal por defecto todos chocan con el
+    bloqueo del escritor."""
+
+    LECTORES = 4
+    FILAS = 100
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+
+    def conectar(self, ruta, perfil):
+        conexion = sqlite3.connect(ruta, isolation_level=None, check_same_thread=False)
+        if perfil:
+            for comando in settings_prod.SQLITE_INIT_COMMAND.split(';'):
+                conexion.execute(comando)
+        # Un lector bloqueado falla al instante en vez de esperar busy_timeout
+        conexion.execute('PRAGMA busy_timeout=0')
+        return conexion
+
+    def crear_base(self, nombre, perfil):
+        ruta = os.path.join(self.directorio, nombre)
+        conexion = self.conectar(ruta, perfil)
+        conexion.execute('CREATE TABLE mensaje (id INTEGER PRIMARY KEY, contenido TEXT)')
+        conexion.executemany('INSERT INTO mensaje (contenido) VALUES (?)', [('hola',)] * self.FILAS)
+        return ruta, conexion
+
+    def leer_con_escritor_activo(self, nombre, perfil):
+        ruta, escritor = self.crear_base(nombre, perfil)
+        lectores = [self.conectar(ruta, perfil) for _ in range(self.LECTORES)]
+
+        def leer(conexion):
+            try:
+                return conexion.execute('SELECT count(*) FROM mensaje').fetchone()[0]
+            except sqlite3.OperationalError as exc:
+                return str(exc)
+
+        # El escritor como durante su COMMIT: bloqueo exclusivo y una fila pendiente
+        escritor.execute('BEGIN EXCLUSIVE')
+        escritor.execute("INSERT INTO mensaje (contenido) VALUES ('nuevo')")
+        try:
+            with ThreadPoolExecutor(self.LECTORES) as pool:
+                return list(pool.map(leer, lectores))
+        finally:
+            escritor.execute('COMMIT')
+            for conexion in (escritor, *lectores):
+                conexion.close()
+
+    def test_pragmas(self):
+        _, conexion = self.crear_base('pragmas.sqlite3', perfil=True)
+        self.addCleanup(conexion.close)
+        pragmas = settings_prod.SQLITE_PRAGMAS
+        for pragma, esperado in (
+            ('journal_mode', 'wal'),
+            ('synchronous', 1),  # NORMAL
+            ('cache_size', pragmas['cache_size']),
+            ('mmap_size', pragmas['mmap_size']),
+            ('temp_store', 2),  # MEMORY
+        ):
+            with self.subTest(pragma=pragma):
+                self.assertEqual(conexion.execute(f'PRAGMA {pragma}').fetchone()[0], esperado)
+
+    def test_lectores_no_esperan_al_escritor_con_wal(self):
+        resultados = self.leer_con_escritor_activo('wal.sqlite3', perfil=True)
+        self.assertEqual(resultados, [self.FILAS] * self.LECTORES)
+
+    def test_lectores_bloqueados_sin_wal(self):
+        resultados = self.leer_con_escritor_activo('delete.sqlite3', perfil=False)
+        self.assertEqual(resultados, ['database is locked'] * self.LECTORES)
+
+    def test_conexiones_persistentes(self):
+        for alias in ('default', ALIAS_MENSAJERIA):
+            with self.subTest(alias=alias):
+                base = settings_prod.DATABASES[alias]
+                self.assertGreater(base['CONN_MAX_AGE'], 0)
+                self.assertEqual(base['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class MensajeriaRouterTests(TestCase):
+    """Conversaciones y mensajes van a la base ``mensajeria``; el resto se
+    queda en ``default`` y los borrados cruzan de base al confirmarse."""
+    databases = {'default', ALIAS_MENSAJERIA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.estudiante = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        categoria = Categoria.objects.create(nombre='Música')
+        cls.curso = Curso.objects.create(nombre='Guitarra', precio=Decimal('100'), tutor=cls.tutor, categoria=categoria)
+
+    def crear_conversacion(self):
+        client = APIClient()
+        client.force_authenticate(self.estudiante)
+        response = client.post(
+            '/api/auth/crud/conversaciones/', {'tutor': self.tutor.pk, 'estudiante': self.estudiante.pk, 'curso': self.curso.pk}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        conversacion = Conversacion.objects.get(pk=response.json()['id'])
+        response = client.post(
+            '/api/auth/crud/mensajes/', {'conversacion': conversacion.pk, 'contenido': 'Hola'}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return conversacion
+
+    def test_enrutamiento(self):
+        router = MensajeriaRouter()
+        for modelo, alias in ((Conversacion, ALIAS_MENSAJERIA), (Mensaje, ALIAS_MENSAJERIA),
+                              (Usuario, 'default'), (Curso, 'default')):
+            with self.subTest(modelo=modelo.__name__):
+                self.assertEqual(router.db_for_read(modelo), alias)
+                self.assertEqual(router.db_for_write(modelo), alias)
+        self.assertFalse(router.allow_migrate('default', 'gestion_tutorias', model_name='mensaje'))
+        self.assertFalse(router.allow_migrate(ALIAS_MENSAJERIA, 'gestion_tutorias', model_name='curso'))
+        self.assertTrue(router.allow_migrate(ALIAS_MENSAJERIA, 'gestion_tutorias', model_name='conversacion'))
+
+    def test_tablas_en_su_base(self):
+        conversacion = self.crear_conversacion()
+        self.assertEqual(conversacion._state.db, ALIAS_MENSAJERIA)
+        self.assertEqual(Mensaje.objects.using(ALIAS_MENSAJERIA).filter(conversacion=conversacion).count(), 1)
+        tablas = connections['default'].introspection.table_names()
+        self.assertNotIn(Mensaje._meta.db_table, tablas)
+        self.assertNotIn(Conversacion._meta.db_table, tablas)
+        self.assertEqual(conversacion.tutor, self.tutor)
+
+    def test_borrar_usuario_borra_su_mensajeria(self):
+        conversacion = self.crear_conversacion()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.estudiante.delete()
+        self.assertFalse(Conversacion.objects.filter(pk=conversacion.pk).exists())
+        self.assertFalse(Mensaje.objects.filter(conversacion_id=conversacion.pk).exists())
+
+    def test_borrar_curso_desvincula_conversaciones(self):
+        conversacion = self.crear_conversacion()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.curso.delete()
+        conversacion.refresh_from_db()
+        self.assertIsNone(conversacion.curso_id)
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class ConversacionCamposDerivadosTests(TestCase):
+    """Último mensaje, contadores y marcas de lectura no se escriben por la API."""
+    databases = {'default', ALIAS_MENSAJERIA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.estudiante = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        otro = Usuario.objects.create(username='otro', email='otro@x.com', rol='estudiante')
+        cls.conversacion = Conversacion.objects.create(tutor=cls.tutor, estudiante=cls.estudiante)
+        ajena = Conversacion.objects.create(tutor=cls.tutor, estudiante=otro)
+        cls.mensaje_ajeno = Mensaje.objects.create(conversacion=ajena, remitente=otro, contenido='Privado')
+
+    def test_patch_ignora_campos_derivados(self):
+        client = APIClient()
+        client.force_authenticate(self.estudiante)
+        response = client.patch(f'/api/auth/crud/conversaciones/{self.conversacion.pk}/', {
+            'ultimo_mensaje': self.mensaje_ajeno.pk,
+            'ultimo_mensaje_preview': 'Privado',
+            'ultimo_mensaje_en': '2030-01-01T00:00:00Z',
+            'ultimo_leido_tutor': 99,
+            'ultimo_leido_estudiante': 99,
+            'unread_tutor': 5,
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.conversacion.refresh_from_db()
+        self.assertIsNone(self.conversacion.ultimo_mensaje_id)
+        self.assertEqual(self.conversacion.ultimo_mensaje_preview, '')
+        self.assertIsNone(self.conversacion.ultimo_mensaje_en)
+        self.assertEqual((self.conversacion.ultimo_leido_tutor, self.conversacion.ultimo_leido_estudiante), (0, 0))
+        self.assertEqual(self.conversacion.unread_tutor, 0)
+
+        resumen = client.get('/api/auth/crud/conversaciones/resumen/').json()
+        filas = resumen['results'] if isinstance(resumen, dict) else resumen
+        self.assertEqual([fila['ultimo_mensaje'] for fila in filas], [None])
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class ETagCondicionalTests(TestCase):
+    """Con versiones en memoria local (por proceso) no se responde 304: otro
+    proceso pudo cambiar los datos sin que este se entere."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        Categoria.objects.create(nombre='Física')
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def pedir_dos_veces(self):
+        primera = self.client.get('/api/auth/crud/categorias/')
+        segunda = self.client.get('/api/auth/crud/categorias/', HTTP_IF_NONE_MATCH=primera.get('ETag', '"x"'))
+        return primera, segunda
+
+    def test_sin_cache_compartido_no_hay_etag(self):
+        self.assertFalse(cache.compartido())
+        primera, segunda = self.pedir_dos_veces()
+        self.assertNotIn('ETag', primera)
+        self.assertEqual(segunda.status_code, 200)
+
+    @override_settings(ETAG_CONDICIONAL=True)
+    def test_forzado_responde_304(self):
+        primera, segunda = self.pedir_dos_veces()
+        self.assertIn('ETag', primera)
+        self.assertEqual(segunda.status_code, 304)
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class SlotsParametrosTests(TestCase):
+    """Parámetros mal formados en /disponibilidades/slots/ son un 400, no un 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.tutor)
+
+    def test_parametros_invalidos(self):
+        for params in (
+            {'tutor': 'abc'},
+            {'tutor': self.tutor.pk, 'desde': '2024-02-30'},
+            {'tutor': self.tutor.pk, 'desde': '2024-02-01', 'hasta': '2024-13-01'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get('/api/auth/crud/disponibilidades/slots/', params)
+                self.assertEqual(response.status_code, 400, response.content)
+
+    def test_parametros_validos(self):
+        response = self.client.get(
+            '/api/auth/crud/disponibilidades/slots/', {'tutor': self.tutor.pk, 'desde': '2024-02-01'}
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class ResenasAcumuladasTests(TestCase):
+    """Los acumulados de reseñas del tutor no se inflan ni quedan marcados
+    como corregidos en cada corrida de ``reconciliar``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.estudiante = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        categoria = Categoria.objects.create(nombre='Química')
+        curso = Curso.objects.create(nombre='Química', precio=Decimal('100'), tutor=cls.tutor, categoria=categoria)
+        ayer = datetime.now().date() - timedelta(days=1)
+        cls.tutoria = Tutoria.objects.create(fecha_tutoria=ayer, modalidad_tutoria='virtual', curso=curso)
+        cls.reserva = Reserva.objects.create(fecha_reserva=ayer, estudiante=cls.estudiante, tutoria=cls.tutoria)
+
+    def test_reconciliar_limpia_promedio_sin_resenas(self):
+        Usuario.objects.filter(pk=self.tutor.pk).update(calificacion_promedio=Decimal('4.00'))
+        tutor = Usuario.objects.get(pk=self.tutor.pk)
+        self.assertEqual(len(calificaciones.reconciliar([tutor])), 1)
+        tutor = Usuario.objects.get(pk=self.tutor.pk)
+        self.assertIsNone(tutor.calificacion_promedio)
+        self.assertEqual(calificaciones.reconciliar([tutor]), [])
+
+    def test_resena_concurrente_no_suma_dos_veces(self):
+        client = APIClient()
+        client.force_authenticate(self.estudiante)
+        crear = Reseña.objects.create
+
+        def otra_peticion_gana(**kwargs):
+            # Otra petición enlazó su reseña después de la comprobación previa
+            ganadora = crear(puntuacion=Decimal('5'), fecha_reseña=datetime.now().date())
+            Tutoria.objects.filter(pk=self.tutoria.pk).update(**{'rese\u00f1a': ganadora})
+            return crear(**kwargs)
+
+        with mock.patch.object(Reseña.objects, 'create', side_effect=otra_peticion_gana):
+            response = client.post(
+                '/api/auth/resenas/crear/', {'reserva': self.reserva.pk, 'puntuacion': '2'}, format='json',
+            )
+        self.assertEqual(response.status_code, 400, response.content)
+        tutor = Usuario.objects.get(pk=self.tutor.pk)
+        self.assertEqual(tutor.resenas_total, 0)
+        self.assertEqual(Reseña.objects.filter(puntuacion=Decimal('2')).count(), 0)
+
+    def test_cero_negativo(self):
+        client = APIClient()
+        client.force_authenticate(self.estudiante)
+        response = client.post(
+            '/api/auth/resenas/crear/', {'reserva': self.reserva.pk, 'puntuacion': '-0'}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['puntuacion'], '0.00')
+        self.assertFalse(Reseña.objects.get().puntuacion.is_signed())
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=1.0)
+class InstrumentacionASGITests(TestCase):
+    """Bajo ASGI la cadena de middleware es async; las vistas síncronas se
+    siguen midiendo."""
+
+    async def test_vista_sincrona_bajo_asgi(self):
+        await sync_to_async(cache.get_cache().clear)()
+        await sync_to_async(Categoria.objects.create)(nombre='Historia')
+        with self.assertLogs('gestion_tutorias.sql', 'INFO') as registros:
+            response = await self.async_client.get('/api/auth/crud/categorias/')
+        self.assertEqual(response.status_code, 200)
+        linea = json.loads(registros.records[-1].getMessage())
+        self.assertEqual(linea['ruta'], '/api/auth/crud/categorias/')
+        self.assertGreater(linea['consultas'], 0)
+
+    async def test_server_timing_solo_con_debug(self):
+        with self.assertLogs('gestion_tutorias.sql', 'INFO'):
+            response = await self.async_client.get('/api/auth/crud/categorias/')
+        self.assertNotIn('Server-Timing', response)
+        with self.settings(DEBUG=True), self.assertLogs('gestion_tutorias.sql', 'INFO'):
+            response = await self.async_client.get('/api/auth/crud/categorias/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ consultas", total;dur=')
+
+    def test_server_timing_para_el_staff(self):
+        client = APIClient()
+        for is_staff, esperado in ((False, False), (True, True)):
+            with self.subTest(is_staff=is_staff):
+                client.force_authenticate(Usuario.objects.create(
+                    username=f'usuario{is_staff}', email=f'u{is_staff}@x.com', is_staff=is_staff,
+                ))
+                with self.assertLogs('gestion_tutorias.sql', 'INFO'):
+                    response = client.get('/api/auth/crud/categorias/')
+                self.assertEqual('Server-Timing' in response, esperado)
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class InvalidacionCatalogoTests(TestCase):
+    """Las versiones del catálogo y de los ETag cambian al confirmar, no al
+    guardar."""
+
+    def assertInvalidaAlConfirmar(self, modelo, escribir):
+        antes = cache.version(modelo)
+        with self.captureOnCommitCallbacks(execute=True):
+            escribir()
+            self.assertEqual(cache.version(modelo), antes)
+        self.assertNotEqual(cache.version(modelo), antes)
+
+    def test_invalida_al_confirmar(self):
+        antes = cache.version('categoria')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Categoria.objects.create(nombre='Arte')
+            self.assertEqual(cache.version('categoria'), antes)
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(cache.version('categoria'), antes)
+
+    def test_disponibilidad_y_solicitud(self):
+        tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        estudiante = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        curso = Curso.objects.create(
+            nombre='Arte', precio=Decimal('100'), tutor=tutor, categoria=Categoria.objects.create(nombre='Arte')
+        )
+        self.assertInvalidaAlConfirmar('disponibilidad', lambda: DisponibilidadSemanal.objects.create(
+            usuario=tutor, dia_semana=0, hora_inicio=time(9), hora_fin=time(10),
+        ))
+        self.assertInvalidaAlConfirmar('solicitud', lambda: SolicitudReserva.objects.create(
+            estudiante=estudiante, curso=curso, fecha_propuesta=datetime.now().date(), modalidad='virtual',
+        ))
+
+    def test_semana(self):
+        tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        client = APIClient()
+        client.force_authenticate(tutor)
+        # Sin filas previas no hay post_delete: la invalidación es la de la vista
+        self.assertInvalidaAlConfirmar('disponibilidad', lambda: client.put(
+            '/api/auth/crud/disponibilidades/semana/',
+            [{'dia_semana': 0, 'hora_inicio': '09:00', 'hora_fin': '10:00'}], format='json',
+        ))
+
+
+class BrokerEnProcesoTests(SimpleTestCase):
+    """``InProcessBroker``: reparto por canal y cola acotada por suscriptor."""
+
+    async def test_reparte_a_los_suscriptores_del_canal(self):
+        broker = realtime.InProcessBroker()
+        primera, segunda = broker.suscribir('usuario:1'), broker.suscribir('usuario:1')
+        ajena = broker.suscribir('usuario:2')
+        broker.publicar('usuario:1', {'tipo': 'mensaje', 'datos': 1})
+        self.assertEqual(await primera.recibir(timeout=1), {'tipo': 'mensaje', 'datos': 1})
+        self.assertEqual(await segunda.recibir(timeout=1), {'tipo': 'mensaje', 'datos': 1})
+        self.assertIsNone(await ajena.recibir(timeout=0.01))
+
+        primera.cerrar()
+        broker.publicar('usuario:1', {'tipo': 'mensaje', 'datos': 2})
+        self.assertEqual(await segunda.recibir(timeout=1), {'tipo': 'mensaje', 'datos': 2})
+        self.assertIsNone(await primera.recibir(timeout=0.01))
+
+    async def test_cola_llena_descarta(self):
+        broker = realtime.InProcessBroker(max_cola=2)
+        suscripcion = broker.suscribir('usuario:1')
+        for i in range(3):
+            broker.publicar('usuario:1', {'tipo': 'mensaje', 'datos': i})
+        await asyncio.sleep(0)
+        recibidos = [await suscripcion.recibir(timeout=0.01) for _ in range(3)]
+        self.assertEqual(recibidos, [{'tipo': 'mensaje', 'datos': 0}, {'tipo': 'mensaje', 'datos': 1}, None])
+
+    async def test_eventos_sin_autenticar(self):
+        response = await self.async_client.get('/api/auth/eventos/')
+        self.assertEqual(response.status_code, 401)
+
+
+class PublicacionAlConfirmarTests(TestCase):
+    """Los eventos salen al confirmar la transacción de la base de mensajería."""
+    databases = {'default', ALIAS_MENSAJERIA}
+
+    def test_publica_al_confirmar_mensajeria(self):
+        broker = mock.Mock()
+        with mock.patch.object(realtime, 'get_broker', return_value=broker):
+            with self.captureOnCommitCallbacks(using='default') as en_default:
+                with self.captureOnCommitCallbacks(using=ALIAS_MENSAJERIA, execute=True) as en_mensajeria:
+                    realtime.publicar_a_usuarios((1, 2, 2), 'mensaje', {'id': 5})
+                    broker.publicar.assert_not_called()
+        self.assertEqual(en_default, [])
+        self.assertEqual(len(en_mensajeria), 1)
+        self.assertEqual(
+            sorted(llamada.args for llamada in broker.publicar.call_args_list),
+            [('usuario:1', {'tipo': 'mensaje', 'datos': {'id': 5}}), ('usuario:2', {'tipo': 'mensaje', 'datos': {'id': 5}})],
+        )
+
+
+class ReconstruccionAgendaTests(TestCase):
+    """``programar_reconstruccion`` reconstruye una vez por tutor y
+    transacción, también si parte de la transacción se revierte."""
+
+    def programar(self, *tutor_ids):
+        for tutor_id in tutor_ids:
+            agenda.programar_reconstruccion(tutor_id)
+
+    def test_una_vez_por_tutor_y_transaccion(self):
+        with mock.patch.object(agenda, 'reconstruir_indice') as reconstruir:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.programar(1, 2, 1, 1)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.programar(1)
+        self.assertEqual([llamada.args for llamada in reconstruir.call_args_list], [(1,), (2,), (1,)])
+
+    def test_savepoint_revertido(self):
+        with mock.patch.object(agenda, 'reconstruir_indice') as reconstruir:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        self.programar(1)
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                self.programar(1)
+        self.assertEqual([llamada.args for llamada in reconstruir.call_args_list], [(1,)])
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class AceptarSolicitudesTests(TestCase):
+    """Aceptación individual y en lote: una sola gana, los choques de horario
+    no cambian nada y el lote informa cada id por separado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.otro_tutor = Usuario.objects.create(username='otro', email='otro@x.com', rol='tutor')
+        categoria = Categoria.objects.create(nombre='Historia')
+        cls.curso = Curso.objects.create(nombre='Historia', precio=Decimal('100'), tutor=cls.tutor, categoria=categoria)
+        cls.curso_ajeno = Curso.objects.create(
+            nombre='Geografía', precio=Decimal('100'), tutor=cls.otro_tutor, categoria=categoria
+        )
+        cls.fecha = datetime.now().date() + timedelta(days=7)
+        cls.ocupada = Tutoria.objects.create(
+            fecha_tutoria=cls.fecha, hora_tutoria=time(10), duracion=60, estado=True,
+            modalidad_tutoria='virtual', curso=cls.curso,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.tutor)
+
+    def solicitud(self, hora, curso=None, **extra):
+        # Una pendiente por estudiante, curso y día: cada solicitud con su estudiante
+        n = SolicitudReserva.objects.count()
+        estudiante = Usuario.objects.create(username=f'est{n}', email=f'est{n}@x.com', rol='estudiante')
+        return SolicitudReserva.objects.create(
+            estudiante=estudiante, curso=curso or self.curso, fecha_propuesta=self.fecha,
+            hora_propuesta=hora, modalidad='virtual', duracion=60, **extra,
+        )
+
+    def test_dos_aceptaciones_gana_una(self):
+        solicitud = self.solicitud(time(12))
+        # Las dos peticiones leyeron la solicitud aún pendiente
+        primera = SolicitudReserva.objects.select_related('curso__tutor').get(pk=solicitud.pk)
+        segunda = SolicitudReserva.objects.select_related('curso__tutor').get(pk=solicitud.pk)
+        tutorias = Tutoria.objects.count()
+        reservas.aceptar(primera)
+        with self.assertRaises(reservas.SolicitudNoPendiente):
+            reservas.aceptar(segunda)
+        self.assertEqual(Tutoria.objects.count(), tutorias + 1)
+        self.assertEqual(Reserva.objects.filter(tutoria__curso=self.curso).count(), 1)
+        solicitud.refresh_from_db()
+        self.assertEqual(solicitud.estado, 'aceptada')
+        self.assertEqual(solicitud.tutoria_id, primera.tutoria.pk)
+
+    def test_choque_de_horario_responde_409(self):
+        solicitud = self.solicitud(time(10, 30))
+        tutorias = Tutoria.objects.count()
+        response = self.client.post(f'/api/auth/crud/solicitudes-reserva/{solicitud.pk}/aceptar/')
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual(response.json()['tutorias'], [self.ocupada.pk])
+        solicitud.refresh_from_db()
+        self.assertEqual(solicitud.estado, 'pendiente')
+        self.assertIsNone(solicitud.tutoria_id)
+        self.assertEqual(Tutoria.objects.count(), tutorias)
+        self.assertFalse(Reserva.objects.exists())
+
+    def test_choque_con_sesion_del_dia_siguiente(self):
+        Tutoria.objects.create(
+            fecha_tutoria=self.fecha + timedelta(days=1), hora_tutoria=time(0), duracion=60, estado=True,
+            modalidad_tutoria='virtual', curso=self.curso,
+        )
+        # 23:30 + 60 min termina a las 00:30 del día siguiente
+        nocturna = self.solicitud(time(23, 30))
+        with self.assertRaises(reservas.ConflictoHorario):
+            reservas.aceptar(SolicitudReserva.objects.select_related('curso__tutor').get(pk=nocturna.pk))
+        otra = self.solicitud(time(23, 30))
+        resultado, = reservas.procesar_lote(SolicitudReserva.objects.all(), self.tutor, [otra.pk], 'aceptar')
+        self.assertFalse(resultado['ok'])
+        self.assertEqual(SolicitudReserva.objects.filter(estado='aceptada').count(), 0)
+
+    def test_lote_no_pisa_una_aceptacion_intercalada(self):
+        primera, segunda = self.solicitud(time(12)), self.solicitud(time(15))
+        cambiar = reservas._cambiar_si_pendiente
+        intercalada = []
+
+        def aceptar_antes(solicitud_id, estado, ahora):
+            # Otra petición acepta la primera entre la lectura del lote y su UPDATE
+            if solicitud_id == primera.pk and not intercalada:
+                intercalada.append(solicitud_id)
+                reservas.aceptar(SolicitudReserva.objects.select_related('curso__tutor').get(pk=primera.pk))
+            return cambiar(solicitud_id, estado, ahora)
+
+        with mock.patch.object(reservas, '_cambiar_si_pendiente', side_effect=aceptar_antes):
+            resultados = reservas.procesar_lote(
+                SolicitudReserva.objects.all(), self.tutor, [primera.pk, segunda.pk], 'aceptar'
+            )
+        self.assertFalse(resultados[0]['ok'])
+        self.assertTrue(resultados[0]['conflicto'])
+        self.assertTrue(resultados[1]['ok'])
+        self.assertEqual(Reserva.objects.count(), 2)
+        primera.refresh_from_db()
+        self.assertEqual(Tutoria.objects.filter(solicitudes=primera).count(), 1)
+        self.assertEqual(primera.reserva.tutoria_id, primera.tutoria_id)
+
+    def test_lote_informa_cada_solicitud(self):
+        libre = self.solicitud(time(12))
+        chocante = self.solicitud(time(9, 30))
+        # Libre contra la agenda, pero choca con ``libre`` dentro del mismo lote
+        misma_franja = self.solicitud(time(12, 30))
+        rechazada = self.solicitud(time(15), estado='rechazada')
+        ajena = self.solicitud(time(15), curso=self.curso_ajeno)
+        ids = [libre.pk, chocante.pk, misma_franja.pk, rechazada.pk, ajena.pk, 999999]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/auth/crud/solicitudes-reserva/bulk/', {'ids': ids, 'accion': 'aceptar'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        cuerpo = response.json()
+        self.assertEqual(cuerpo['procesadas'], 1)
+        resultados = cuerpo['resultados']
+        self.assertEqual([r['solicitud_id'] for r in resultados], ids)
+        self.assertEqual([r['ok'] for r in resultados], [True, False, False, False, False, False])
+        self.assertEqual(resultados[0]['estado_solicitud'], 'aceptada')
+        self.assertEqual(resultados[1]['tutorias'], [self.ocupada.pk])
+        self.assertEqual(resultados[2]['tutorias'], [])
+        self.assertEqual(resultados[3]['detail'], 'La solicitud no está en estado pendiente.')
+        # La ajena no es visible para este tutor
+        self.assertEqual(resultados[4]['detail'], 'No encontrada.')
+        self.assertEqual(resultados[5]['detail'], 'No encontrada.')
+
+        estados = dict(SolicitudReserva.objects.filter(pk__in=ids).values_list('pk', 'estado'))
+        self.assertEqual(estados, {
+            libre.pk: 'aceptada', chocante.pk: 'pendiente', misma_franja.pk: 'pendiente',
+            rechazada.pk: 'rechazada', ajena.pk: 'pendiente',
+        })
+        libre.refresh_from_db()
+        self.assertEqual(Reserva.objects.get().pk, libre.reserva_id)
+
+
+class IntervalosTests(SimpleTestCase):
+    """Operaciones puras sobre intervalos ``[inicio, fin)`` de ``agenda``."""
+
+    def h(self, hora, minuto=0, dia=3):
+        return datetime(2031, 3, dia, hora, minuto, tzinfo=dt_timezone.utc)
+
+    def test_fusionar_contiguos_y_solapados(self):
+        self.assertEqual(
+            agenda.fusionar([
+                (self.h(12), self.h(13)), (self.h(9), self.h(10)), (self.h(10), self.h(11)),
+                (self.h(12, 30), self.h(12, 45)), (self.h(12, 50), self.h(14)),
+            ]),
+            [(self.h(9), self.h(11)), (self.h(12), self.h(14))],
+        )
+
+    def test_restar_un_recorte_que_cubre_varios_intervalos(self):
+        base = [(self.h(8), self.h(10)), (self.h(11), self.h(12)), (self.h(13), self.h(15))]
+        self.assertEqual(
+            agenda.restar(base, [(self.h(9), self.h(14)), (self.h(14, 30), self.h(16))]),
+            [(self.h(8), self.h(9)), (self.h(14), self.h(14, 30))],
+        )
+
+    def test_cortar_descarta_el_resto_corto(self):
+        self.assertEqual(
+            agenda.cortar([(self.h(9), self.h(11, 30)), (self.h(12), self.h(12, 45))], 60),
+            [(self.h(9), self.h(10)), (self.h(10), self.h(11))],
+        )
+
+    def test_semana_con_cambio_de_hora(self):
+        madrid = ZoneInfo('Europe/Madrid')
+        # El domingo 30 de marzo de 2031 las 02:00 pasan a ser las 03:00
+        intervalos = agenda.expandir_semana(
+            [(5, time(1), time(4)), (6, time(1), time(4))], date(2031, 3, 24), date(2031, 3, 30), madrid,
+        )
+        self.assertEqual(intervalos, [
+            (self.h(0, dia=29), self.h(3, dia=29)),
+            (self.h(0, dia=30), self.h(2, dia=30)),
+        ])
+        self.assertEqual(len(agenda.cortar(intervalos, 60)), 5)
+
+
+class MotorAgendaTests(TestCase):
+    """``agenda``: intervalos libres a partir de la disponibilidad semanal, los
+    bloqueos y las tutorías."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(
+            username='tutor', email='tutor@x.com', rol='tutor', zona_horaria='UTC', duracion_sesion_minutos=60,
+        )
+        cls.curso = Curso.objects.create(
+            nombre='Arte', precio=Decimal('100'), tutor=cls.tutor, categoria=Categoria.objects.create(nombre='Arte'),
+        )
+        # Un lunes lejano: nada queda en el pasado
+        cls.lunes = datetime(2031, 3, 3).date()
+        cls.pasado = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+
+    def utc(self, fecha, hora, minuto=0):
+        return datetime.combine(fecha, time(hora, minuto), tzinfo=dt_timezone.utc)
+
+    def test_sesion_de_la_vispera_que_cruza_la_medianoche(self):
+        DisponibilidadSemanal.objects.create(usuario=self.tutor, dia_semana=0, hora_inicio=time(0), hora_fin=time(3))
+        Tutoria.objects.create(
+            fecha_tutoria=self.lunes - timedelta(days=1), hora_tutoria=time(23, 30), duracion=60, estado=True,
+            modalidad_tutoria='virtual', curso=self.curso,
+        )
+        libres = agenda.intervalos_libres(self.tutor, self.lunes, self.lunes, ahora=self.pasado)
+        self.assertEqual(libres, [(self.utc(self.lunes, 0, 30), self.utc(self.lunes, 3))])
+
+    def test_slots_restan_bloqueos_y_tutorias(self):
+        DisponibilidadSemanal.objects.create(usuario=self.tutor, dia_semana=0, hora_inicio=time(9), hora_fin=time(14))
+        BloqueoHorario.objects.create(
+            usuario=self.tutor, inicio=self.utc(self.lunes, 10), fin=self.utc(self.lunes, 11, 30),
+        )
+        Tutoria.objects.create(
+            fecha_tutoria=self.lunes, hora_tutoria=time(12, 30), duracion=60, estado=True,
+            modalidad_tutoria='virtual', curso=self.curso,
+        )
+        # Anulada: no ocupa la franja
+        Tutoria.objects.create(
+            fecha_tutoria=self.lunes, hora_tutoria=time(9), duracion=60, estado=False,
+            modalidad_tutoria='virtual', curso=self.curso,
+        )
+        slots = agenda.slots_libres(self.tutor, self.lunes, self.lunes, ahora=self.pasado)
+        # De 13:30 a 14:00 no cabe una sesión
+        self.assertEqual(slots, [
+            (self.utc(self.lunes, 9), self.utc(self.lunes, 10)),
+            (self.utc(self.lunes, 11, 30), self.utc(self.lunes, 12, 30)),
+        ])
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class SemanaDisponibilidadTests(TestCase):
+    """PUT /disponibilidades/semana/ reemplaza la semana completa del tutor."""
+
+    url = '/api/auth/crud/disponibilidades/semana/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor', zona_horaria='UTC')
+        cls.anterior = DisponibilidadSemanal.objects.create(
+            usuario=cls.tutor, dia_semana=2, hora_inicio=time(8), hora_fin=time(9),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.tutor)
+
+    def filas(self):
+        return list(
+            DisponibilidadSemanal.objects.filter(usuario=self.tutor)
+            .values_list('dia_semana', 'hora_inicio', 'hora_fin')
+        )
+
+    def test_reemplaza_la_semana_y_reconstruye_al_confirmar(self):
+        semana = [
+            {'dia_semana': dia, 'hora_inicio': '09:00', 'hora_fin': '12:00'} for dia in range(7)
+        ] + [{'dia_semana': 0, 'hora_inicio': '14:00', 'hora_fin': '16:00'}]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(self.url, {'bloques': semana}, format='json')
+            self.assertFalse(FranjaLibre.objects.filter(tutor=self.tutor).exists())
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(response.json()), 8)
+        self.assertEqual(self.filas(), sorted(
+            [(dia, time(9), time(12)) for dia in range(7)] + [(0, time(14), time(16))]
+        ))
+        self.assertTrue(FranjaLibre.objects.filter(tutor=self.tutor).exists())
+
+    def test_solapamiento_responde_409(self):
+        response = self.client.put(self.url, [
+            {'dia_semana': 1, 'hora_inicio': '09:00', 'hora_fin': '11:00'},
+            {'dia_semana': 1, 'hora_inicio': '10:00', 'hora_fin': '12:00'},
+            {'dia_semana': 2, 'hora_inicio': '10:00', 'hora_fin': '12:00'},
+        ], format='json')
+        self.assertEqual(response.status_code, 409, response.content)
+        self.assertEqual(response.json()['solapamientos'], [{
+            'bloques': [0, 1], 'dia_semana': 1, 'a': ['09:00:00', '11:00:00'], 'b': ['10:00:00', '12:00:00'],
+        }])
+        self.assertEqual(self.filas(), [(2, time(8), time(9))])
+
+    def test_cuerpo_invalido_responde_400(self):
+        for cuerpo in ({'bloques': 'lunes'}, 'lunes', [{'dia_semana': 1, 'hora_inicio': '11:00', 'hora_fin': '10:00'}]):
+            with self.subTest(cuerpo=cuerpo):
+                response = self.client.put(self.url, cuerpo, format='json')
+                self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(self.filas(), [(2, time(8), time(9))])
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class MarcasLecturaTests(TestCase):
+    """Lo leído sale de la marca ``ultimo_leido_*`` de cada participante: un
+    mensaje está leído si su id no la pasa."""
+    databases = {'default', ALIAS_MENSAJERIA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.estudiante = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        cls.conversacion = Conversacion.objects.create(tutor=cls.tutor, estudiante=cls.estudiante)
+
+    def cliente(self, usuario):
+        client = APIClient()
+        client.force_authenticate(usuario)
+        return client
+
+    def enviar(self, usuario, contenido):
+        response = self.cliente(usuario).post(
+            '/api/auth/crud/mensajes/', {'conversacion': self.conversacion.pk, 'contenido': contenido}, format='json',
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def marcar(self, usuario):
+        response = self.cliente(usuario).post(f'/api/auth/crud/conversaciones/{self.conversacion.pk}/marcar_leidos/')
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def resumen(self, usuario):
+        fila, = self.cliente(usuario).get('/api/auth/crud/conversaciones/resumen/').json()['results']
+        return fila
+
+    def leidos(self, usuario):
+        response = self.cliente(usuario).get('/api/auth/crud/mensajes/', {'conversacion': self.conversacion.pk})
+        return {m['id']: m['leido'] for m in response.json()['results']}
+
+    def test_la_marca_no_retrocede(self):
+        self.enviar(self.estudiante, 'Hola')
+        vieja = Conversacion.objects.get(pk=self.conversacion.pk)
+        # Otra pestaña ya leyó hasta un mensaje posterior
+        Conversacion.objects.filter(pk=vieja.pk).update(ultimo_leido_tutor=vieja.ultimo_mensaje_id + 50)
+        vieja.marcar_leidos_por(self.tutor)
+        actual = Conversacion.objects.get(pk=vieja.pk)
+        self.assertEqual(actual.ultimo_leido_tutor, vieja.ultimo_mensaje_id + 50)
+        self.assertEqual(actual.unread_tutor, 0)
+
+    def test_marcar_es_un_update(self):
+        self.enviar(self.estudiante, 'Hola')
+        conversacion = Conversacion.objects.get(pk=self.conversacion.pk)
+        with self.assertNumQueries(1, using=ALIAS_MENSAJERIA), self.assertNumQueries(0):
+            conversacion.marcar_leidos_por(self.tutor)
+        # Sin nada pendiente no escribe
+        with self.assertNumQueries(0, using=ALIAS_MENSAJERIA):
+            conversacion.marcar_leidos_por(self.tutor)
+
+    def test_no_leidos_por_participante(self):
+        m1 = self.enviar(self.estudiante, 'Uno')
+        m2 = self.enviar(self.estudiante, 'Dos')
+        self.marcar(self.tutor)
+        m3 = self.enviar(self.tutor, 'Tres')
+        m4 = self.enviar(self.estudiante, 'Cuatro')
+
+        self.assertEqual(self.resumen(self.tutor)['no_leidos'], 1)
+        self.assertEqual(self.resumen(self.estudiante)['no_leidos'], 1)
+        self.assertEqual(self.leidos(self.tutor), {m1: True, m2: True, m3: False, m4: False})
+
+        self.marcar(self.estudiante)
+        fila = self.resumen(self.estudiante)
+        self.assertEqual(fila['no_leidos'], 0)
+        self.assertEqual(fila['ultimo_mensaje']['id'], m4)
+        # El último es del estudiante y el tutor no lo ha leído
+        self.assertFalse(fila['ultimo_mensaje']['leido'])
+        self.assertEqual(self.leidos(self.estudiante), {m1: True, m2: True, m3: True, m4: False})
+        self.assertEqual(self.resumen(self.tutor)['no_leidos'], 1)
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class PaginacionMensajesTests(TestCase):
+    """``?conversacion=`` pagina por ``(creado_en, id)``; sin ella, por número
+    de página."""
+    databases = {'default', ALIAS_MENSAJERIA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.estudiante = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        cls.conversacion = Conversacion.objects.create(tutor=cls.tutor, estudiante=cls.estudiante)
+        cls.ids = [
+            Mensaje.objects.create(conversacion=cls.conversacion, remitente=cls.estudiante, contenido=str(i)).pk
+            for i in range(5)
+        ]
+        # Todos en el mismo instante: el orden lo decide el id
+        Mensaje.objects.filter(pk__in=cls.ids).update(creado_en=datetime(2030, 1, 1, tzinfo=dt_timezone.utc))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.estudiante)
+
+    def pagina(self, **params):
+        response = self.client.get(
+            '/api/auth/crud/mensajes/', {'conversacion': self.conversacion.pk, 'page_size': 2, **params},
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def parametro(self, enlace, nombre):
+        return parse_qs(urlsplit(enlace).query)[nombre][0] if enlace else None
+
+    def ids_de(self, pagina):
+        return [m['id'] for m in pagina['results']]
+
+    def test_historial_hacia_atras(self):
+        m = self.ids
+        pagina = self.pagina()
+        self.assertEqual(self.ids_de(pagina), m[3:])
+        self.assertFalse(pagina['has_more'])
+        self.assertNotIn('count', pagina)
+        antes = self.parametro(pagina['previous'], 'before')
+        self.assertEqual(antes, str(m[3]))
+
+        pagina = self.pagina(before=antes)
+        self.assertEqual(self.ids_de(pagina), m[1:3])
+        self.assertTrue(pagina['has_more'])
+        pagina = self.pagina(before=self.parametro(pagina['previous'], 'before'))
+        self.assertEqual(self.ids_de(pagina), m[:1])
+        self.assertIsNone(pagina['previous'])
+
+    def test_sondeo_hacia_adelante(self):
+        m = self.ids
+        pagina = self.pagina(after=m[0])
+        self.assertEqual(self.ids_de(pagina), m[1:3])
+        self.assertTrue(pagina['has_more'])
+        pagina = self.pagina(after=self.parametro(pagina['next'], 'after'))
+        self.assertEqual(self.ids_de(pagina), m[3:])
+        self.assertFalse(pagina['has_more'])
+        # Sin nada nuevo, el enlace sigue apuntando al último visto
+        pagina = self.pagina(after=m[4])
+        self.assertEqual(pagina['results'], [])
+        self.assertEqual(self.parametro(pagina['next'], 'after'), str(m[4]))
+
+    def test_cursor_desconocido_o_invalido(self):
+        for param in ('after', 'before'):
+            with self.subTest(param=param):
+                pagina = self.pagina(**{param: 999999})
+                self.assertEqual(pagina['results'], [])
+                # Más nuevos sí hay, pero nada anterior
+                self.assertEqual(pagina['has_more'], param == 'before')
+                self.assertIsNone(pagina['previous'])
+                response = self.client.get(
+                    '/api/auth/crud/mensajes/', {'conversacion': self.conversacion.pk, param: 'x'},
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.json())
+
+    def test_sin_conversacion_pagina_por_numero(self):
+        datos = self.client.get('/api/auth/crud/mensajes/').json()
+        self.assertEqual(datos['count'], 5)
+        self.assertEqual(sorted(m['id'] for m in datos['results']), self.ids)
+
+
+class ContadoresMensajeriaTests(TestCase):
+    """``registrar_mensaje`` con ``UPDATE ... F()`` y con el coalescedor."""
+    databases = {'default', ALIAS_MENSAJERIA}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.estudiante = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante')
+        cls.conversacion = Conversacion.objects.create(tutor=cls.tutor, estudiante=cls.estudiante)
+
+    def mensaje(self, conversacion, remitente, contenido='Hola'):
+        return Mensaje.objects.create(conversacion=conversacion, remitente=remitente, contenido=contenido)
+
+    def test_dos_escrituras_sin_refrescar(self):
+        # Dos peticiones que cargaron la conversación antes de escribir
+        primera = Conversacion.objects.get(pk=self.conversacion.pk)
+        segunda = Conversacion.objects.get(pk=self.conversacion.pk)
+        mensajeria.registrar_mensaje(self.mensaje(primera, self.tutor))
+        ultimo = self.mensaje(segunda, self.tutor, 'Adiós')
+        mensajeria.registrar_mensaje(ultimo)
+        self.assertEqual(segunda.unread_estudiante, 2)
+        conversacion = Conversacion.objects.get(pk=self.conversacion.pk)
+        self.assertEqual((conversacion.unread_estudiante, conversacion.unread_tutor), (2, 0))
+        self.assertEqual(conversacion.ultimo_mensaje_id, ultimo.pk)
+        self.assertEqual(conversacion.ultimo_mensaje_preview, 'Adiós')
+
+    def test_coalescedor_vacia_lo_acumulado(self):
+        coalescedor = mensajeria.CoalescedorContadores(intervalo=60)
+        primero = self.mensaje(self.conversacion, self.tutor)
+        ultimo = self.mensaje(self.conversacion, self.estudiante, 'Respuesta')
+        coalescedor.agregar(self.conversacion.pk, 'unread_estudiante', primero)
+        coalescedor.agregar(self.conversacion.pk, 'unread_estudiante', primero)
+        coalescedor.agregar(self.conversacion.pk, 'unread_tutor', ultimo)
+        self.assertEqual(Conversacion.objects.get(pk=self.conversacion.pk).unread_estudiante, 0)
+
+        coalescedor.vaciar()
+        conversacion = Conversacion.objects.get(pk=self.conversacion.pk)
+        self.assertEqual((conversacion.unread_estudiante, conversacion.unread_tutor), (2, 1))
+        self.assertEqual(conversacion.ultimo_mensaje_id, ultimo.pk)
+        # Ya no queda nada pendiente
+        with self.assertNumQueries(0, using=ALIAS_MENSAJERIA):
+            coalescedor.vaciar()
+
+    def test_coalescedor_vacia_con_el_temporizador(self):
+        coalescedor = mensajeria.CoalescedorContadores(intervalo=0.01)
+        vaciado = threading.Event()
+        with mock.patch.object(coalescedor, 'vaciar', side_effect=vaciado.set):
+            coalescedor.agregar(self.conversacion.pk, 'unread_tutor', self.mensaje(self.conversacion, self.estudiante))
+            self.assertTrue(vaciado.wait(5))
+
+    @override_settings(MENSAJES_COALESCER_CONTADORES=True)
+    def test_coalescedor_ignora_lo_revertido(self):
+        coalescedor = mensajeria.CoalescedorContadores(intervalo=60)
+        with mock.patch.object(mensajeria, 'get_coalescedor', return_value=coalescedor), \
+                mock.patch.object(coalescedor, 'agregar') as agregar:
+            with self.captureOnCommitCallbacks(execute=True, using=ALIAS_MENSAJERIA):
+                try:
+                    with transaction.atomic(using=ALIAS_MENSAJERIA):
+                        mensajeria.registrar_mensaje(self.mensaje(self.conversacion, self.tutor))
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            agregar.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True, using=ALIAS_MENSAJERIA):
+                mensaje = self.mensaje(self.conversacion, self.tutor)
+                mensajeria.registrar_mensaje(mensaje)
+                agregar.assert_not_called()
+            agregar.assert_called_once_with(self.conversacion.pk, 'unread_estudiante', mensaje)
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class BusquedaCursosTests(TestCase):
+    """``?search=`` de /filtrar-cursos/ y el índice que mantienen las señales."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        categoria = Categoria.objects.create(nombre='Ciencias')
+        datos = dict(precio=Decimal('100'), tutor=tutor, categoria=categoria, modalidad='virtual')
+        cls.fisica = Curso.objects.create(nombre='Física', descripcion='Con repaso de matemáticas', **datos)
+        cls.matematicas = Curso.objects.create(nombre='Matemáticas básicas', descripcion='Álgebra', **datos)
+        cls.historia = Curso.objects.create(nombre='Historia', ciudad='Lima', **datos)
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.addCleanup(busqueda.get_busqueda.cache_clear)
+
+    def buscar(self, texto):
+        response = APIClient().get('/api/auth/filtrar-cursos/', {'search': texto})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [curso['id_curso'] for curso in response.json()['results']]
+
+    def ids(self, backend, texto):
+        return [curso.pk for curso in backend.filtrar(Curso.objects.all(), texto)]
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'FTS5 es de SQLite')
+    def test_sin_tildes_ni_mayusculas_y_por_relevancia(self):
+        # El acierto en el nombre pesa más que el de la descripción
+        self.assertEqual(self.buscar('matematicas'), [self.matematicas.pk, self.fisica.pk])
+        self.assertEqual(self.buscar('ALGEBRA'), [self.matematicas.pk])
+        self.assertEqual(self.buscar('lima'), [self.historia.pk])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'FTS5 es de SQLite')
+    def test_prefijo(self):
+        self.assertEqual(self.buscar('fis'), [self.fisica.pk])
+        self.assertEqual(self.buscar('matem bas'), [self.matematicas.pk])
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'FTS5 es de SQLite')
+    def test_indice_sigue_a_los_cursos(self):
+        backend = busqueda.SQLiteFTS5BusquedaCursos()
+        self.historia.nombre = 'Historia de las matemáticas'
+        self.historia.save()
+        self.assertEqual(
+            self.ids(backend, 'matematicas'), [self.matematicas.pk, self.historia.pk, self.fisica.pk]
+        )
+        self.assertEqual(self.ids(backend, 'historia'), [self.historia.pk])
+        self.matematicas.delete()
+        self.assertEqual(self.ids(backend, 'matematicas'), [self.historia.pk, self.fisica.pk])
+        self.assertEqual(self.ids(backend, 'algebra'), [])
+
+    @override_settings(BUSQUEDA_CURSOS_BACKEND='gestion_tutorias.busqueda.ContainsBusquedaCursos')
+    def test_respaldo_con_icontains(self):
+        busqueda.get_busqueda.cache_clear()
+        self.assertIsInstance(busqueda.get_busqueda(), busqueda.ContainsBusquedaCursos)
+        self.assertEqual(sorted(self.buscar('mate')), [self.fisica.pk, self.matematicas.pk])
+        # Cada término debe aparecer en algún campo
+        self.assertEqual(self.buscar('mate repaso'), [self.fisica.pk])
+        self.assertEqual(self.buscar('lima'), [self.historia.pk])
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class ListadosResenasTests(TestCase):
+    """/resenas/recibidas/ y /resenas/enviadas/: participantes resueltos con
+    subconsultas y paginación por cursor."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.ana = Usuario.objects.create(username='ana', email='ana@x.com', rol='estudiante')
+        cls.luis = Usuario.objects.create(username='luis', email='luis@x.com', rol='estudiante')
+        categoria = Categoria.objects.create(nombre='Idiomas')
+        cls.curso = Curso.objects.create(nombre='Inglés', precio=Decimal('100'), tutor=cls.tutor, categoria=categoria)
+        cls.iniciales = dict(cls.crear_resena(estudiante) for estudiante in (cls.ana, cls.luis, cls.ana))
+
+    def setUp(self):
+        self.esperado = dict(self.iniciales)
+
+    @classmethod
+    def crear_resena(cls, estudiante):
+        """Reseña de una tutoría de ``estudiante``; devuelve su id y participantes."""
+        ayer = datetime.now().date() - timedelta(days=1)
+        resena = Reseña.objects.create(puntuacion=Decimal('4'), fecha_reseña=ayer)
+        tutoria = Tutoria.objects.create(
+            fecha_tutoria=ayer, modalidad_tutoria='virtual', curso=cls.curso, **{'rese\u00f1a': resena},
+        )
+        Reserva.objects.create(fecha_reserva=ayer, estudiante=estudiante, tutoria=tutoria)
+        return resena.pk, {'tutor_id': cls.tutor.pk, 'estudiante_id': estudiante.pk, 'tutoria_id': tutoria.pk}
+
+    def cliente(self, usuario):
+        client = APIClient()
+        client.force_authenticate(usuario)
+        return client
+
+    def participantes(self, resultados):
+        return {
+            r['id_rese\u00f1a']: {campo: r[campo] for campo in ('tutor_id', 'estudiante_id', 'tutoria_id')}
+            for r in resultados
+        }
+
+    def test_recibidas_y_enviadas(self):
+        recibidas = self.cliente(self.tutor).get('/api/auth/resenas/recibidas/').json()['results']
+        self.assertEqual(self.participantes(recibidas), self.esperado)
+        # De la más reciente a la más antigua
+        self.assertEqual([r['id_rese\u00f1a'] for r in recibidas], sorted(self.esperado, reverse=True))
+
+        enviadas = self.cliente(self.luis).get('/api/auth/resenas/enviadas/').json()['results']
+        self.assertEqual(
+            self.participantes(enviadas),
+            {pk: datos for pk, datos in self.esperado.items() if datos['estudiante_id'] == self.luis.pk},
+        )
+
+    def test_continua_por_cursor(self):
+        client = self.cliente(self.tutor)
+        url, vistas = '/api/auth/resenas/recibidas/?page_size=2', []
+        while url:
+            pagina = client.get(url).json()
+            self.assertNotIn('count', pagina)
+            vistas.extend(r['id_rese\u00f1a'] for r in pagina['results'])
+            url = pagina['next']
+        self.assertEqual(vistas, sorted(self.esperado, reverse=True))
+
+    def test_consultas_constantes(self):
+        client = self.cliente(self.tutor)
+
+        def consultas():
+            with CaptureQueriesContext(connection) as capturadas:
+                response = client.get('/api/auth/resenas/recibidas/')
+            self.assertEqual(len(response.json()['results']), len(self.esperado))
+            return len(capturadas)
+
+        antes = consultas()
+        self.esperado.update(self.crear_resena(e) for e in (self.luis, self.ana, self.luis, self.ana))
+        self.assertEqual(consultas(), antes)
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class AutenticacionCacheTests(TestCase):
+    """``UsuarioCacheMixin``: el usuario del JWT sale del LRU y se expulsa al
+    guardarlo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(username='est', email='est@x.com', rol='estudiante', telefono='111')
+
+    def setUp(self):
+        authentication.usuarios.limpiar()
+        self.addCleanup(authentication.usuarios.limpiar)
+
+    def me(self, usuario=None):
+        _, access = authentication.tokens_para_usuario(usuario or self.usuario)
+        return APIClient().get('/api/auth/me/', HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def guardar(self, **cambios):
+        usuario = Usuario.objects.get(pk=self.usuario.pk)
+        for campo, valor in cambios.items():
+            setattr(usuario, campo, valor)
+        with self.captureOnCommitCallbacks(execute=True):
+            usuario.save()
+        return usuario
+
+    def test_segunda_peticion_sin_consultas(self):
+        self.assertEqual(self.me().status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.me()
+        self.assertEqual(response.json()['telefono'], '111')
+
+    def test_guardar_expulsa_del_cache(self):
+        _, access = authentication.tokens_para_usuario(self.usuario)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        client.get('/api/auth/me/')
+        self.guardar(telefono='222')
+        with self.assertNumQueries(1):
+            response = client.get('/api/auth/me/')
+        self.assertEqual(response.json()['telefono'], '222')
+
+    def test_desactivar_rechaza_el_token(self):
+        _, access = authentication.tokens_para_usuario(self.usuario)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(client.get('/api/auth/me/').status_code, 200)
+        self.guardar(is_active=False)
+        self.assertEqual(client.get('/api/auth/me/').status_code, 401)
+
+    def test_claims_que_ya_no_coinciden(self):
+        for cambios in ({'rol': 'tutor'}, {'is_staff': True}):
+            with self.subTest(cambios=cambios):
+                _, access = authentication.tokens_para_usuario(Usuario.objects.get(pk=self.usuario.pk))
+                client = APIClient()
+                client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+                self.assertEqual(client.get('/api/auth/me/').status_code, 200)
+                actualizado = self.guardar(**cambios)
+                self.assertEqual(client.get('/api/auth/me/').status_code, 401)
+                # Con un token nuevo vuelve a entrar
+                self.assertEqual(self.me(actualizado).status_code, 200)
+
+
+@override_settings(
+    INSTRUMENTACION_SQL_MUESTREO=0,
+    # MD5 preferido para que los tests no paguen PBKDF2; el resto sigue verificándose
+    PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    ],
+)
+class AccesoAsyncTests(TestCase):
+    """/login/ y /register/: vistas async sin DRF con el hash en ``hashing``.
+    Fijan también la forma de los errores, que antes daba DRF."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create(
+            username='ana', email='ana@x.com', password=make_password('clave-segura-123', hasher='md5'),
+        )
+
+    def post(self, url, datos):
+        return self.client.post(url, datos, content_type='application/json')
+
+    def login(self, password='clave-segura-123'):
+        return self.post('/api/auth/login/', {'email': 'ana@x.com', 'password': password})
+
+    def test_login(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200, response.content)
+        datos = response.json()
+        self.assertEqual(datos['user'], {'id': self.usuario.pk, 'username': 'ana', 'email': 'ana@x.com'})
+        self.assertEqual(
+            APIClient().get('/api/auth/me/', HTTP_AUTHORIZATION=f"Bearer {datos['access']}").status_code, 200,
+        )
+
+    def test_credenciales_invalidas(self):
+        for response in (
+            self.login('otra-clave'),
+            self.post('/api/auth/login/', {'email': 'nadie@x.com', 'password': 'clave-segura-123'}),
+        ):
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'non_field_errors': ['Invalid email or password']})
+        response = self.post('/api/auth/login/', {'email': 'ana@x.com'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(list(response.json()), ['password'])
+        response = self.client.post('/api/auth/login/', '{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()['detail'].startswith('JSON parse error'))
+        self.assertEqual(self.client.get('/api/auth/login/').status_code, 405)
+
+    def test_pool_saturado(self):
+        with mock.patch.object(hashing, 'get_pool', return_value=hashing.PoolHashing(1, 0)):
+            for response in (
+                self.login(),
+                self.post('/api/auth/register/', {'username': 'luis', 'email': 'luis@x.com', 'password': 'clave-segura-456'}),
+            ):
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], '1')
+                self.assertIn('detail', response.json())
+        self.assertFalse(Usuario.objects.filter(username='luis').exists())
+
+    def test_rehash_al_cambiar_el_hasher(self):
+        antiguo = PBKDF2PasswordHasher().encode('clave-segura-123', 'sal1234567890', iterations=1000)
+        Usuario.objects.filter(pk=self.usuario.pk).update(password=antiguo)
+        self.assertEqual(self.login().status_code, 200)
+        nuevo = Usuario.objects.get(pk=self.usuario.pk).password
+        self.assertTrue(nuevo.startswith('md5$'))
+        self.assertTrue(check_password('clave-segura-123', nuevo))
+
+    def test_registro(self):
+        datos = {'username': 'luis', 'email': 'luis@x.com', 'password': 'clave-segura-456'}
+        response = self.post('/api/auth/register/', datos)
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json(), {'id': Usuario.objects.get(username='luis').pk, 'username': 'luis', 'email': 'luis@x.com'})
+        self.assertTrue(Usuario.objects.get(username='luis').check_password('clave-segura-456'))
+
+        response = self.post('/api/auth/register/', datos)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'username', 'email'})
+        self.assertEqual(Usuario.objects.filter(email='luis@x.com').count(), 1)
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class FacetasTests(TestCase):
+    """``?facetas=1`` en /filtrar-cursos/: conteos del conjunto filtrado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        cls.ciencias = Categoria.objects.create(nombre='Ciencias')
+        cls.letras = Categoria.objects.create(nombre='Letras')
+        for nombre, categoria, ciudad, modalidad, precio in (
+            ('Matemáticas', cls.ciencias, 'Lima', 'virtual', 150),
+            ('Física', cls.ciencias, 'Lima', 'presencial', 500),
+            ('Matemáticas avanzadas', cls.ciencias, 'Cusco', 'virtual', 1200),
+            ('Historia', cls.letras, 'Lima', 'virtual', 250),
+        ):
+            Curso.objects.create(
+                nombre=nombre, categoria=categoria, ciudad=ciudad, modalidad=modalidad,
+                precio=Decimal(precio), tutor=tutor,
+            )
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def facetas(self, **params):
+        response = APIClient().get('/api/auth/filtrar-cursos/', {**params, 'facetas': 1})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['facetas']
+
+    def totales(self, datos, faceta, campo='valor'):
+        return {fila[campo]: fila['total'] for fila in datos[faceta]}
+
+    def test_conteos_del_conjunto_filtrado(self):
+        datos = self.facetas(ciudad='Lima')
+        self.assertEqual(self.totales(datos, 'categoria', 'nombre'), {'Ciencias': 2, 'Letras': 1})
+        self.assertEqual(self.totales(datos, 'ciudad'), {'Lima': 3})
+        self.assertEqual(self.totales(datos, 'modalidad'), {'virtual': 2, 'presencial': 1})
+        self.assertEqual([fila['total'] for fila in datos['precio']], [1, 1, 1, 0, 0])
+        self.assertEqual((datos['precio'][0]['desde'], datos['precio'][-1]['hasta']), (0, None))
+
+    def test_con_busqueda(self):
+        datos = self.facetas(search='matematicas')
+        self.assertEqual(self.totales(datos, 'ciudad'), {'Lima': 1, 'Cusco': 1})
+        self.assertEqual(self.totales(datos, 'categoria', 'nombre'), {'Ciencias': 2})
+        self.assertEqual([fila['total'] for fila in datos['precio']], [1, 0, 0, 0, 1])
+
+    def test_clave_de_cache(self):
+        def clave(**params):
+            return facetas.clave(Request(APIRequestFactory().get('/api/auth/filtrar-cursos/', params)))
+
+        base = clave(ciudad='Lima')
+        self.assertEqual(clave(ciudad='Lima', page=2, facetas=1), base)
+        self.assertNotEqual(clave(ciudad='Cusco'), base)
+        self.assertNotEqual(clave(ciudad='Lima', search='mate'), base)
+        cache.invalidar('curso')
+        self.assertNotEqual(clave(ciudad='Lima'), base)
+
+    def test_cambio_en_el_catalogo(self):
+        self.assertEqual(self.totales(self.facetas(ciudad='Cusco'), 'ciudad'), {'Cusco': 1})
+        with self.captureOnCommitCallbacks(execute=True):
+            Curso.objects.create(
+                nombre='Química', categoria=self.ciencias, ciudad='Cusco', modalidad='virtual',
+                precio=Decimal(300), tutor=Usuario.objects.get(username='tutor'),
+            )
+        self.assertEqual(self.totales(self.facetas(ciudad='Cusco'), 'ciudad'), {'Cusco': 2})
+
+
+@override_settings(INSTRUMENTACION_SQL_MUESTREO=0)
+class RenderizadoJSONTests(TestCase):
+    """Los ``Decimal`` viajan como cadena y el parser los lee sin pasar por float."""
+
+    def test_decimal_como_cadena(self):
+        for rapido in (True, False):
+            with self.subTest(rapido=rapido):
+                self.assertEqual(renderers.dumps({'precio': Decimal('150.50')}, rapido=rapido), b'{"precio":"150.50"}')
+
+    def test_precio_en_un_endpoint(self):
+        tutor = Usuario.objects.create(username='tutor', email='tutor@x.com', rol='tutor')
+        Curso.objects.create(
+            nombre='Álgebra', categoria=Categoria.objects.create(nombre='Ciencias'), ciudad='Lima',
+            modalidad='virtual', precio=Decimal('99.90'), tutor=tutor,
+        )
+        response = APIClient().get('/api/auth/filtrar-cursos/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn(b'"precio":"99.90"', response.content)
+
+    def test_loads_usa_decimal_y_rechaza_nan(self):
+        self.assertEqual(renderers.loads('{"precio": 0.1}'), {'precio': Decimal('0.1')})
+        for constante in ('NaN', 'Infinity', '-Infinity'):
+            with self.subTest(constante=constante), self.assertRaises(ValueError):
+                renderers.loads(f'{{"precio": {constante}}}')
+
+    def test_parser(self):
+        parser = renderers.JSONParser()
+        self.assertEqual(parser.parse(io.BytesIO(b'{"precio": 12.30}')), {'precio': Decimal('12.30')})
+        with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+            parser.parse(io.BytesIO(b'{"precio": NaN}'))
+
+
+class CompresionTests(SimpleTestCase):
+    """``CompresionMiddleware``: brotli > gzip > sin comprimir, y nada de streams."""
+
+    cuerpo = json.dumps([{'id': i, 'nombre': 'Álgebra lineal'} for i in range(200)]).encode()
+
+    def setUp(self):
+        # Un brotli de mentira: el paquete no tiene por qué estar instalado
+        self.brotli = mock.Mock(compress=mock.Mock(return_value=b'br'))
+
+    def procesar(self, response, **cabeceras):
+        request = RequestFactory().get('/api/auth/cursos/', **cabeceras)
+        return middleware.CompresionMiddleware(lambda request: response)(request)
+
+    def test_elegir_codificacion(self):
+        with mock.patch.object(middleware, 'brotli', self.brotli):
+            self.assertEqual(middleware.elegir_codificacion('gzip, deflate, br'), 'br')
+            self.assertEqual(middleware.elegir_codificacion('br;q=0, gzip'), 'gzip')
+            self.assertEqual(middleware.elegir_codificacion('*'), 'br')
+            self.assertEqual(middleware.elegir_codificacion('gzip, br', brotli_permitido=False), 'gzip')
+            self.assertIsNone(middleware.elegir_codificacion('identity'))
+            self.assertIsNone(middleware.elegir_codificacion(''))
+        with mock.patch.object(middleware, 'brotli', None):
+            self.assertEqual(middleware.elegir_codificacion('br, gzip'), 'gzip')
+
+    def test_gzip(self):
+        response = self.procesar(
+            HttpResponse(self.cuerpo, content_type='application/json'), HTTP_ACCEPT_ENCODING='gzip',
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), self.cuerpo)
+
+    def test_brotli_solo_sin_credenciales(self):
+        with mock.patch.object(middleware, 'brotli', self.brotli):
+            response = self.procesar(
+                HttpResponse(self.cuerpo, content_type='application/json'), HTTP_ACCEPT_ENCODING='br, gzip',
+            )
+            self.assertEqual((response['Content-Encoding'], response.content), ('br', b'br'))
+            for cabeceras in ({'HTTP_AUTHORIZATION': 'Bearer x'}, {'HTTP_COOKIE': 'djangojwtauth_cookie=x'}):
+                with self.subTest(cabeceras=cabeceras):
+                    response = self.procesar(
+                        HttpResponse(self.cuerpo, content_type='application/json'),
+                        HTTP_ACCEPT_ENCODING='br, gzip', **cabeceras,
+                    )
+                    self.assertEqual(response['Content-Encoding'], 'gzip')
+                    self.assertEqual(gzip.decompress(response.content), self.cuerpo)
+
+    def test_sin_comprimir(self):
+        pequena = self.procesar(HttpResponse(b'{}', content_type='application/json'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(pequena.has_header('Content-Encoding'))
+        imagen = self.procesar(HttpResponse(self.cuerpo, content_type='image/png'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(imagen.has_header('Content-Encoding'))
+
+    def test_streams_intactos(self):
+        for tipo in ('application/json', 'text/event-stream'):
+            with self.subTest(tipo=tipo):
+                response = self.procesar(
+                    StreamingHttpResponse(iter([self.cuerpo]), content_type=tipo), HTTP_ACCEPT_ENCODING='gzip',
+                )
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(b''.join(response.streaming_content), self.cuerpo)
@@ -2,6 +2,8 @@ from django.urls import path, include
 from rest_framework_simplejwt.views import TokenRefreshView, TokenObtainPairView
 from .views.users import LoginView, RegisterView, MeView  
 from .views.reviews import crear_resena, resenas_recibidas, resenas_enviadas
+from .views.eventos import eventos
+from .views.estadisticas import estadisticas_cache, estadisticas_hashing, estadisticas_sql
 from rest_framework.routers import DefaultRouter
 from .views.crud import (
     UsuarioViewSet, CategoriaViewSet, CursoViewSet,
@@ -40,6 +42,14 @@ urlpatterns = [
     path('refresh/', TokenRefreshView.as_view(), name='refresh'),
     path('jwt/refresh/', TokenRefreshView.as_view(), name='jwt_refresh'),
     path('filtrar-cursos/', CursoFilterView.as_view(), name='filtrar-cursos'),
+    # Stream SSE de mensajes y no leídos (requiere servidor ASGI)
+    path('eventos/', eventos, name='eventos'),
+    # Aciertos/fallos del caché del catálogo (solo staff)
+    path('estadisticas/cache/', estadisticas_cache, name='estadisticas_cache'),
+    # Cola y tiempos del hash de contraseñas en login/registro (solo staff)
+    path('estadisticas/hashing/', estadisticas_hashing, name='estadisticas_hashing'),
+    # Consultas SQL por vista y sospechas de N+1 (solo staff)
+    path('estadisticas/sql/', estadisticas_sql, name='estadisticas_sql'),
     path('crud/', include(router.urls)),
 ]
 
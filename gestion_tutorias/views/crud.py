@@ -7,20 +7,31 @@ from ..serializers import (
     UsuarioSerializer, CategoriaSerializer, CursoSerializer, TutoriaSerializer,
     ReseñaSerializer, PagoSerializer, ReservaSerializer,
     DisponibilidadSemanalSerializer, BloqueoHorarioSerializer,
-    ConversacionSerializer, MensajeSerializer, SolicitudReservaSerializer, ConversacionListItemSerializer
+    ConversacionSerializer, MensajeSerializer, SolicitudReservaSerializer, ConversacionListItemSerializer,
+    SolicitudesLoteSerializer,
 )
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from django.db import transaction
 from django.db.models import Q, Avg
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from ..models_messaging import Conversacion, Mensaje
+from ..routers import alias_mensajeria
+from .. import agenda, cache, facetas, mensajeria, realtime, reservas
+from ..pagination import MensajeKeysetPagination
+from ..busqueda import CursoSearchFilter
+from ..serializers_lectura import CategoriaLectura, CursoLectura, MensajeLectura
+from .mixins import CatalogoCacheMixin, ETagMixin, LecturaRapidaMixin
 from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.shortcuts import get_object_or_404
+from datetime import timedelta
 from rest_framework.generics import ListAPIView
 from django_filters.rest_framework import DjangoFilterBackend
 from ..models import Curso
@@ -38,20 +49,26 @@ class DefaultPagination(PageNumberPagination):
     page_size_query_param = "page_size"
     max_page_size = 50
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(ETagMixin, CatalogoCacheMixin, LecturaRapidaMixin, viewsets.ModelViewSet):
+    cache_modelo = "categoria"
+    etag_modelos = ("categoria",)
     queryset = Categoria.objects.all().order_by("nombre")
     serializer_class = CategoriaSerializer
+    lectura_class = CategoriaLectura
     permission_classes = [permissions.AllowAny]
     pagination_class = DefaultPagination
     filter_backends = [filters.SearchFilter]
     search_fields = ["nombre", "descripcion"]
 
-class CursoViewSet(viewsets.ModelViewSet):
+class CursoViewSet(ETagMixin, CatalogoCacheMixin, LecturaRapidaMixin, viewsets.ModelViewSet):
+    cache_modelo = "curso"
+    etag_modelos = ("curso",)
     queryset = Curso.objects.select_related("tutor", "categoria").all()
     serializer_class = CursoSerializer
+    lectura_class = CursoLectura
     permission_classes = [permissions.IsAuthenticated]
     pagination_class = DefaultPagination
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [CursoSearchFilter]
     search_fields = ["nombre", "descripcion", "ciudad"]
 
     def get_queryset(self):
@@ -89,7 +106,8 @@ class ReservaViewSet(viewsets.ModelViewSet):
     serializer_class = ReservaSerializer
 
 
-class SolicitudReservaViewSet(viewsets.ModelViewSet):
+class SolicitudReservaViewSet(ETagMixin, viewsets.ModelViewSet):
+    etag_modelos = ('solicitud',)
     queryset = SolicitudReserva.objects.select_related('curso', 'curso__tutor', 'estudiante').all().order_by('-creado_en')
     serializer_class = SolicitudReservaSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -119,28 +137,16 @@ class SolicitudReservaViewSet(viewsets.ModelViewSet):
         if solicitud.estado != 'pendiente':
             return Response({'detail': 'La solicitud no está en estado pendiente.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Crear Tutoria y Reserva automáticamente (ignorar pago)
-        duracion_min = solicitud.duracion or getattr(solicitud.curso.tutor, 'duracion_sesion_minutos', 60)
-        tutoria = Tutoria.objects.create(
-            duracion=duracion_min,
-            fecha_tutoria=solicitud.fecha_propuesta,
-            estado=True,
-            modalidad_tutoria=solicitud.modalidad,
-            reseña=None,
-            curso=solicitud.curso,
-        )
-        reserva = Reserva.objects.create(
-            fecha_reserva=timezone.now().date(),
-            estado_reserva=True,
-            estudiante=solicitud.estudiante,
-            pago=None,
-            tutoria=tutoria,
-        )
-
-        solicitud.estado = 'aceptada'
-        solicitud.tutoria = tutoria
-        solicitud.reserva = reserva
-        solicitud.save(update_fields=['estado', 'actualizado_en', 'tutoria', 'reserva'])
+        # Crear Tutoria y Reserva automáticamente (ignorar pago), en una transacción
+        try:
+            tutoria, reserva = reservas.aceptar(solicitud)
+        except reservas.SolicitudNoPendiente:
+            return Response({'detail': 'La solicitud no está en estado pendiente.'}, status=status.HTTP_400_BAD_REQUEST)
+        except reservas.ConflictoHorario as exc:
+            return Response({
+                'detail': 'El tutor ya tiene una tutoría en ese horario.',
+                'tutorias': exc.tutorias,
+            }, status=status.HTTP_409_CONFLICT)
 
         return Response({
             'solicitud_id': solicitud.id,
@@ -159,13 +165,35 @@ class SolicitudReservaViewSet(viewsets.ModelViewSet):
         if solicitud.estado != 'pendiente':
             return Response({'detail': 'La solicitud no está en estado pendiente.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        solicitud.estado = 'rechazada'
-        solicitud.save(update_fields=['estado', 'actualizado_en'])
+        try:
+            reservas.cambiar_estado(solicitud, 'rechazada')
+        except reservas.SolicitudNoPendiente:
+            return Response({'detail': 'La solicitud no está en estado pendiente.'}, status=status.HTTP_400_BAD_REQUEST)
         return Response({
             'solicitud_id': solicitud.id,
             'estado_solicitud': solicitud.estado,
         }, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """Acepta o rechaza varias solicitudes en una transacción.
+
+        Body: ``{"ids": [1, 2, ...], "accion": "aceptar" | "rechazar"}``. Responde
+        un resultado por id; los que fallan no impiden procesar el resto y los
+        que otra petición procesó a la vez llevan ``conflicto``.
+        """
+        serializer = SolicitudesLoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        accion = serializer.validated_data['accion']
+        resultados = reservas.procesar_lote(
+            self.get_queryset(), request.user, serializer.validated_data['ids'], accion
+        )
+        return Response({
+            'accion': accion,
+            'procesadas': sum(1 for r in resultados if r['ok']),
+            'resultados': resultados,
+        }, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], url_path='cancelar')
     def cancelar(self, request, pk=None):
         solicitud = self.get_object()
@@ -175,14 +203,17 @@ class SolicitudReservaViewSet(viewsets.ModelViewSet):
         if solicitud.estado != 'pendiente':
             return Response({'detail': 'Solo se pueden cancelar solicitudes en estado pendiente.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        solicitud.estado = 'cancelada'
-        solicitud.save(update_fields=['estado', 'actualizado_en'])
+        try:
+            reservas.cambiar_estado(solicitud, 'cancelada')
+        except reservas.SolicitudNoPendiente:
+            return Response({'detail': 'Solo se pueden cancelar solicitudes en estado pendiente.'}, status=status.HTTP_400_BAD_REQUEST)
         return Response({
             'solicitud_id': solicitud.id,
             'estado_solicitud': solicitud.estado,
         }, status=status.HTTP_200_OK)
 
-class DisponibilidadSemanalViewSet(viewsets.ModelViewSet):
+class DisponibilidadSemanalViewSet(ETagMixin, viewsets.ModelViewSet):
+    etag_modelos = ('disponibilidad',)
     serializer_class = DisponibilidadSemanalSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -196,6 +227,89 @@ class DisponibilidadSemanalViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(usuario=self.request.user)
 
+    @action(detail=False, methods=['put'], url_path='semana')
+    def semana(self, request):
+        datos = request.data.get('bloques') if isinstance(request.data, dict) else request.data
+        serializer = self.get_serializer(data=datos, many=True)
+        serializer.is_valid(raise_exception=True)
+        bloques = serializer.validated_data
+
+        invalidos = [i for i, b in enumerate(bloques) if b['hora_inicio'] >= b['hora_fin']]
+        if invalidos:
+            return Response({
+                'detail': 'La hora de inicio debe ser menor a la de fin.',
+                'bloques': invalidos,
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        pares = agenda.detectar_solapamientos(bloques)
+        if pares:
+            return Response({
+                'detail': 'Hay bloques que se superponen.',
+                'solapamientos': [
+                    {
+                        'bloques': [a, b],
+                        'dia_semana': bloques[a]['dia_semana'],
+                        'a': [bloques[a]['hora_inicio'], bloques[a]['hora_fin']],
+                        'b': [bloques[b]['hora_inicio'], bloques[b]['hora_fin']],
+                    }
+                    for a, b in pares
+                ],
+            }, status=status.HTTP_409_CONFLICT)
+
+        user = request.user
+        with transaction.atomic():
+            DisponibilidadSemanal.objects.filter(usuario=user).delete()
+            creados = DisponibilidadSemanal.objects.bulk_create(
+                DisponibilidadSemanal(usuario=user, **b) for b in bloques
+            )
+            # bulk_create no dispara post_save
+            agenda.programar_reconstruccion(user.id)
+            transaction.on_commit(lambda: cache.invalidar('disponibilidad'))
+        creados.sort(key=lambda b: (b.dia_semana, b.hora_inicio))
+        return Response(self.get_serializer(creados, many=True).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='slots')
+    def slots(self, request):
+        tutor_id = request.query_params.get('tutor')
+        if not tutor_id:
+            return Response({'detail': 'Falta el parámetro tutor.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            tutor = get_object_or_404(
+                Usuario.objects.only('id', 'zona_horaria', 'duracion_sesion_minutos'), pk=tutor_id
+            )
+        except ValueError:
+            return Response({'detail': 'El parámetro tutor debe ser un id numérico.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        tz = agenda.zona_del_tutor(tutor)
+        hoy = timezone.now().astimezone(tz).date()
+        desde_param = request.query_params.get('desde')
+        hasta_param = request.query_params.get('hasta')
+        try:
+            desde = parse_date(desde_param) if desde_param else hoy
+            hasta = parse_date(hasta_param) if hasta_param else (desde and desde + timedelta(days=27))
+        except ValueError:
+            # Bien formadas pero inexistentes (2024-02-30)
+            desde = hasta = None
+        if not desde or not hasta:
+            return Response({'detail': 'Fechas inválidas, usa el formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        if hasta < desde:
+            return Response({'detail': 'La fecha hasta debe ser posterior a desde.'}, status=status.HTTP_400_BAD_REQUEST)
+        if (hasta - desde).days >= agenda.MAX_DIAS_CONSULTA:
+            return Response(
+                {'detail': f'El rango máximo es de {agenda.MAX_DIAS_CONSULTA} días.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        slots = agenda.slots_libres(tutor, desde, hasta)
+        return Response({
+            'tutor': tutor.id,
+            'zona_horaria': str(tz),
+            'duracion_minutos': tutor.duracion_sesion_minutos,
+            'desde': desde,
+            'hasta': hasta,
+            'slots': [{'inicio': inicio, 'fin': fin} for inicio, fin in slots],
+        })
+
 
 class BloqueoHorarioViewSet(viewsets.ModelViewSet):
     serializer_class = BloqueoHorarioSerializer
@@ -234,7 +348,12 @@ class ConversacionViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def resumen(self, request):
-        convs = self.get_queryset()
+        # Una consulta para la página (con el último mensaje unido) y otra para el conteo
+        convs = self.get_queryset().select_related('ultimo_mensaje')
+        page = self.paginate_queryset(convs)
+        if page is not None:
+            data = ConversacionListItemSerializer(page, many=True, context={'request': request}).data
+            return self.get_paginated_response(data)
         data = ConversacionListItemSerializer(convs, many=True, context={'request': request}).data
         return Response(data)
 
@@ -268,16 +387,34 @@ class ConversacionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def marcar_leidos(self, request, pk=None):
         conv = self.get_object()
-        if request.user not in (conv.tutor, conv.estudiante) and not getattr(request.user, 'is_staff', False):
+        if request.user.id not in (conv.tutor_id, conv.estudiante_id) and not getattr(request.user, 'is_staff', False):
             return Response({'detail': 'No puedes modificar esta conversación.'}, status=status.HTTP_403_FORBIDDEN)
         conv.marcar_leidos_por(request.user)
+        realtime.publicar_no_leidos(conv)
         return Response(ConversacionSerializer(conv).data)
 
 
-class MensajeViewSet(viewsets.ModelViewSet):
+class MensajeViewSet(LecturaRapidaMixin, viewsets.ModelViewSet):
     serializer_class = MensajeSerializer
+    lectura_class = MensajeLectura
     permission_classes = [permissions.IsAuthenticated]
 
+    pagination_class = PageNumberPagination
+    # Los mensajes de una conversación se paginan por clave (sin COUNT ni OFFSET)
+    paginacion_conversacion_class = MensajeKeysetPagination
+
+    def paginate_queryset(self, queryset):
+        if not self.request.query_params.get('conversacion'):
+            return super().paginate_queryset(queryset)
+        self._paginacion_conversacion = self.paginacion_conversacion_class()
+        return self._paginacion_conversacion.paginate_queryset(queryset, self.request, view=self)
+
+    def get_paginated_response(self, data):
+        paginacion = getattr(self, '_paginacion_conversacion', None)
+        if paginacion is None:
+            return super().get_paginated_response(data)
+        return paginacion.get_paginated_response(data)
+
     def get_queryset(self):
         user = self.request.user
         qs = Mensaje.objects.select_related('conversacion').all()
@@ -292,21 +429,63 @@ class MensajeViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         conversacion = serializer.validated_data.get('conversacion')
-        if conversacion and self.request.user not in (conversacion.tutor, conversacion.estudiante) and not getattr(self.request.user, 'is_staff', False):
+        if conversacion and self.request.user.id not in (conversacion.tutor_id, conversacion.estudiante_id) and not getattr(self.request.user, 'is_staff', False):
             raise PermissionDenied('No perteneces a esta conversación.')
-        mensaje = serializer.save(remitente=self.request.user)
-        # actualizar contadores de no leídos y timestamp de conversación
-        conv = mensaje.conversacion
-        if self.request.user == conv.tutor:
-            conv.unread_estudiante = (conv.unread_estudiante or 0) + 1
-        else:
-            conv.unread_tutor = (conv.unread_tutor or 0) + 1
-        conv.save(update_fields=['unread_tutor', 'unread_estudiante', 'updated_at'])
-
-class CursoFilterView(ListAPIView):
+        # Inserción y contadores en una sola transacción; el UPDATE usa F() para no perder incrementos
+        with transaction.atomic(using=alias_mensajeria()):
+            mensaje = serializer.save(remitente=self.request.user)
+            mensajeria.registrar_mensaje(mensaje)
+            conv = mensaje.conversacion
+            realtime.publicar_a_usuarios((conv.tutor_id, conv.estudiante_id), 'mensaje', serializer.data)
+
+class CursoFilterView(ETagMixin, CatalogoCacheMixin, LecturaRapidaMixin, ListAPIView):
+    """Buscador de cursos. Con ``?facetas=1`` la página incluye además los
+    conteos por categoría, ciudad, modalidad y rango de precio del conjunto
+    filtrado (ver ``facetas``)."""
+    cache_modelo = 'curso'
+    etag_modelos = ('curso',)
     serializer_class = CursoSerializer
-    queryset = Curso.objects.all()
+    lectura_class = CursoLectura
+    queryset = Curso.objects.select_related('tutor', 'categoria').order_by('id_curso')
+    pagination_class = DefaultPagination
 
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    search_fields = ['nombre']  # for ?search=
-    filterset_fields = ['categoria', 'ciudad', 'modalidad']  # for ?categoria=, etc.
\ No newline at end of file
+    filter_backends = [DjangoFilterBackend, CursoSearchFilter]
+    search_fields = ['nombre', 'descripcion', 'ciudad']  # for ?search=
+    filterset_fields = ['categoria', 'ciudad', 'modalidad']  # for ?categoria=, etc.
+
+    def cache_habilitada(self, request):
+        # La disponibilidad cambia con la agenda, no con el catálogo
+        return 'disponible_desde' not in request.query_params
+
+    etag_habilitado = cache_habilitada
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200 and facetas.solicitadas(request):
+            response.data['facetas'] = facetas.obtener(
+                request, self.filter_queryset(self.get_queryset()),
+                usar_cache=self.cache_habilitada(request),
+            )
+        return response
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        desde_param = self.request.query_params.get('disponible_desde')
+        hasta_param = self.request.query_params.get('disponible_hasta')
+        if not desde_param:
+            return qs
+        try:
+            desde = parse_datetime(desde_param)
+            hasta = parse_datetime(hasta_param) if hasta_param else (desde and desde + timedelta(hours=1))
+        except ValueError:
+            desde = hasta = None
+        if not desde or not hasta:
+            raise ValidationError({'detail': 'Ventana de disponibilidad inválida.'})
+        if timezone.is_naive(desde):
+            desde = timezone.make_aware(desde)
+        if timezone.is_naive(hasta):
+            hasta = timezone.make_aware(hasta)
+        if hasta <= desde:
+            raise ValidationError({'detail': 'disponible_hasta debe ser posterior a disponible_desde.'})
+        # Una búsqueda por índice sobre las franjas libres precalculadas
+        return qs.filter(tutor_id__in=agenda.tutores_libres(desde, hasta))
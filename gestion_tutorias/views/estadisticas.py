@@ -0,0 +1,36 @@
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .. import cache, hashing
+from ..middleware import estadisticas as estadisticas_sql_por_vista
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def estadisticas_cache(request):
+    """Aciertos y fallos del caché del catálogo en este proceso."""
+    return Response(cache.estadisticas.resumen())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def estadisticas_hashing(request):
+    """Cola y tiempos del pool de hash de contraseñas de este proceso."""
+    pool = hashing.get_pool()
+    return Response({
+        'workers': pool.workers,
+        'max_pendientes': pool.max_pendientes,
+        **pool.metricas.resumen(),
+    })
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([permissions.IsAdminUser])
+def estadisticas_sql(request):
+    """Consultas y tiempo de base por vista (peticiones muestreadas de este
+    proceso). ``DELETE`` reinicia los contadores."""
+    if request.method == 'DELETE':
+        estadisticas_sql_por_vista.reiniciar()
+        return Response(status=204)
+    return Response(estadisticas_sql_por_vista.resumen())
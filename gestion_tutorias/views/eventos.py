@@ -0,0 +1,58 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from ..realtime import canal_usuario, get_broker
+from ..renderers import dumps
+
+
+def _autenticar(request):
+    # Mismos autenticadores que el resto de la API (cookie JWT, Bearer, sesión...)
+    drf_request = Request(
+        request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    return user if user and user.is_authenticated else None
+
+
+def _formatear(evento):
+    datos = dumps(evento['datos']).decode('utf-8')
+    return f"event: {evento['tipo']}\ndata: {datos}\n\n"
+
+
+async def eventos(request):
+    """Stream SSE con los mensajes nuevos y contadores de no leídos del usuario.
+
+    Necesita un servidor ASGI: bajo WSGI Django consumiría el stream entero
+    antes de responder.
+    """
+    user = await sync_to_async(_autenticar)(request)
+    if user is None:
+        return JsonResponse({'detail': 'No autenticado.'}, status=401)
+
+    heartbeat = getattr(settings, 'REALTIME_HEARTBEAT_SEGUNDOS', 15)
+
+    async def stream():
+        suscripcion = get_broker().suscribir(canal_usuario(user.id))
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                evento = await suscripcion.recibir(timeout=heartbeat)
+                if evento is None:
+                    # Comentario SSE para mantener viva la conexión
+                    yield ': ping\n\n'
+                else:
+                    yield _formatear(evento)
+        finally:
+            suscripcion.cerrar()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,99 @@
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .. import cache
+
+
+class ETagMixin:
+    """GET condicional para ``list`` y ``retrieve``.
+
+    El ETag se calcula sin tocar la base: versiones de ``etag_modelos`` (que
+    las señales incrementan en cada cambio), el usuario y la URL. Si coincide
+    con ``If-None-Match`` se responde 304 sin consultar ni serializar nada.
+    Solo con versiones compartidas entre procesos (``cache.etag_disponible``).
+    """
+    etag_modelos = ()
+
+    def etag_habilitado(self, request):
+        return True
+
+    def etag_actual(self, request):
+        partes = [f'{modelo}:{cache.version(modelo)}' for modelo in self.etag_modelos]
+        partes.append(f'u:{getattr(request.user, "pk", None)}')
+        partes.append(f'{request.path}?{sorted(request.query_params.lists())}')
+        return 'W/"%s"' % hashlib.sha1('|'.join(partes).encode('utf-8')).hexdigest()
+
+    def _condicional(self, vista, request, *args, **kwargs):
+        if not cache.etag_disponible() or not self.etag_habilitado(request):
+            return vista(request, *args, **kwargs)
+        etag = self.etag_actual(request)
+        enviados = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in enviados or '*' in enviados:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = vista(request, *args, **kwargs)
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._condicional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._condicional(super().retrieve, request, *args, **kwargs)
+
+
+class CatalogoCacheMixin:
+    """Sirve ``list`` y ``retrieve`` desde el caché del catálogo.
+
+    ``cache_modelo`` es el nombre con el que las señales invalidan las
+    entradas. Los permisos se siguen comprobando antes de leer el caché.
+    """
+    cache_modelo = None
+
+    def cache_habilitada(self, request):
+        return True
+
+    def list(self, request, *args, **kwargs):
+        if not self.cache_habilitada(request):
+            return super().list(request, *args, **kwargs)
+        clave = cache.clave_lista(self.cache_modelo, request)
+        datos = cache.obtener(self.cache_modelo, clave)
+        if datos is not None:
+            return Response(datos)
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.guardar(clave, response.data)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.query_params or not self.cache_habilitada(request):
+            return super().retrieve(request, *args, **kwargs)
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not str(pk).isdigit():
+            return super().retrieve(request, *args, **kwargs)
+        clave = cache.clave_detalle(self.cache_modelo, int(pk))
+        datos = cache.obtener(self.cache_modelo, clave)
+        if datos is not None:
+            return Response(datos)
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.guardar(clave, response.data)
+        return response
+
+
+class LecturaRapidaMixin:
+    """``list`` con un serializador de ``serializers_lectura``: pagina sobre
+    ``.values()`` y arma los dicts sin pasar por ``ModelSerializer``. El resto
+    de acciones siguen usando ``serializer_class``."""
+    lectura_class = None
+
+    def list(self, request, *args, **kwargs):
+        lectura = self.lectura_class(context=self.get_serializer_context())
+        filas = lectura.valores(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(filas)
+        if page is not None:
+            return self.get_paginated_response(lectura.representar(page))
+        return Response(lectura.representar(filas))
@@ -2,10 +2,14 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework import permissions, status
 from rest_framework.response import Response
 from django.utils import timezone
-from django.db.models import Avg
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from django.apps import apps
+from decimal import Decimal
 
-from ..models import Reserva
+from ..models import Reserva, Tutoria
+from ..pagination import ResenaCursorPagination
+from .. import calificaciones
 
 # Obtener el modelo de Reseña evitando problemas con el caracter ñ
 ResenaModel = apps.get_model('gestion_tutorias', 'Rese\u00f1a')
@@ -15,42 +19,40 @@ from rest_framework import serializers
 
 
 class ResenaSimpleSerializer(serializers.ModelSerializer):
-    tutor_id = serializers.SerializerMethodField()
-    estudiante_id = serializers.SerializerMethodField()
-    tutoria_id = serializers.SerializerMethodField()
+    # Vienen anotados por resenas_con_participantes(); sin anotación salen en null
+    tutor_id = serializers.IntegerField(read_only=True, allow_null=True)
+    estudiante_id = serializers.IntegerField(read_only=True, allow_null=True)
+    tutoria_id = serializers.IntegerField(read_only=True, allow_null=True)
+
     class Meta:
         model = ResenaModel
         fields = '__all__'
 
-    def get_tutoria_id(self, obj):
-        t = getattr(obj, 'tutorias', None)
-        if t is None:
-            return None
-        first = t.first()
-        return getattr(first, 'id_tutoria', None) if first else None
-
-    def get_tutor_id(self, obj):
-        t = getattr(obj, 'tutorias', None)
-        if not t:
-            return None
-        tut = t.first()
-        if not tut:
-            return None
-        curso = getattr(tut, 'curso', None)
-        return getattr(getattr(curso, 'tutor', None), 'id', None)
-
-    def get_estudiante_id(self, obj):
-        t = getattr(obj, 'tutorias', None)
-        if not t:
-            return None
-        tut = t.first()
-        if not tut:
-            return None
-        reserva = getattr(tut, 'reservas', None)
-        if not reserva:
-            return None
-        r = reserva.first()
-        return getattr(getattr(r, 'estudiante', None), 'id', None) if r else None
+
+def resenas_con_participantes():
+    """Reseñas con el id de su primera tutoría, el tutor y el estudiante de
+    esa tutoría resueltos con subconsultas, en una sola consulta."""
+    primera_tutoria = (
+        Tutoria.objects
+        .filter(**{'rese\u00f1a': OuterRef('pk')})
+        .order_by('pk')
+    )
+    primera_reserva = (
+        Reserva.objects
+        .filter(tutoria_id=OuterRef('tutoria_id'))
+        .order_by('pk')
+    )
+    return ResenaModel.objects.annotate(
+        tutoria_id=Subquery(primera_tutoria.values('id_tutoria')[:1]),
+        tutor_id=Subquery(primera_tutoria.values('curso__tutor_id')[:1]),
+        estudiante_id=Subquery(primera_reserva.values('estudiante_id')[:1]),
+    )
+
+
+def _listar(request, qs):
+    paginator = ResenaCursorPagination()
+    page = paginator.paginate_queryset(qs, request)
+    return paginator.get_paginated_response(ResenaSimpleSerializer(page, many=True).data)
 
 
 @api_view(['POST'])
@@ -82,31 +84,39 @@ def crear_resena(request):
         return Response({'detail': 'Solo puedes calificar tutorías ya realizadas.'}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        val = float(puntuacion)
+        val = Decimal(str(puntuacion)).quantize(Decimal('0.01'))
     except Exception:
         return Response({'detail': 'Puntuación inválida.'}, status=status.HTTP_400_BAD_REQUEST)
-    if val < 0 or val > 5:
+    if not val.is_finite() or val < 0 or val > 5:
         return Response({'detail': 'La puntuación debe estar entre 0 y 5.'}, status=status.HTTP_400_BAD_REQUEST)
+    # "-0" pasa el rango pero se guardaría como -0.00
+    val = abs(val)
+
+    with transaction.atomic():
+        # Crear reseña
+        resena = ResenaModel.objects.create(
+            comentario=comentario,
+            puntuacion=val,
+            fecha_reseña=timezone.now().date()
+        )
+
+        # Enlazar con la tutoría solo si sigue sin reseña: dos POST simultáneos
+        # pasan ambos la comprobación de arriba, pero solo uno enlaza aquí
+        enlazadas = Tutoria.objects.filter(
+            pk=tutoria.pk, **{'rese\u00f1a__isnull': True}
+        ).update(**{'rese\u00f1a': resena})
+        if not enlazadas:
+            transaction.set_rollback(True)
+        else:
+            # Actualizar el promedio del tutor con sus acumulados, sin recorrer todas sus reseñas
+            calificaciones.registrar_resena(tutoria.curso.tutor_id, val)
+
+    if not enlazadas:
+        return Response({'detail': 'La tutoría ya tiene una reseña.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Crear reseña
-    resena = ResenaModel.objects.create(
-        comentario=comentario,
-        puntuacion=val,
-        fecha_reseña=timezone.now().date()
-    )
-
-    # Enlazar con la tutoría
-    setattr(tutoria, 'rese\u00f1a', resena)
-    tutoria.save(update_fields=['rese\u00f1a'])
-
-    # Recalcular promedio del tutor
-    tutor = tutoria.curso.tutor
-    avg = (ResenaModel.objects
-           .filter(tutorias__curso__tutor=tutor)
-           .aggregate(a=Avg('puntuacion'))['a'])
-    tutor.calificacion_promedio = avg or 0
-    tutor.save(update_fields=['calificacion_promedio'])
-
+    resena.tutoria_id = tutoria.id_tutoria
+    resena.tutor_id = tutoria.curso.tutor_id
+    resena.estudiante_id = reserva.estudiante_id
     return Response(ResenaSimpleSerializer(resena).data, status=status.HTTP_201_CREATED)
 
 
@@ -116,8 +126,10 @@ def resenas_recibidas(request):
     user = request.user
     if getattr(user, 'rol', None) != 'tutor' and not getattr(user, 'is_staff', False):
         return Response({'detail': 'Solo tutores o staff.'}, status=status.HTTP_403_FORBIDDEN)
-    qs = ResenaModel.objects.filter(tutorias__curso__tutor=user).distinct()
-    return Response(ResenaSimpleSerializer(qs, many=True).data)
+    qs = resenas_con_participantes().filter(
+        pk__in=Tutoria.objects.filter(curso__tutor=user).values('rese\u00f1a')
+    )
+    return _listar(request, qs)
 
 
 @api_view(['GET'])
@@ -126,5 +138,7 @@ def resenas_enviadas(request):
     user = request.user
     if getattr(user, 'rol', None) != 'estudiante' and not getattr(user, 'is_staff', False):
         return Response({'detail': 'Solo estudiantes o staff.'}, status=status.HTTP_403_FORBIDDEN)
-    qs = ResenaModel.objects.filter(tutorias__reservas__estudiante=user).distinct()
-    return Response(ResenaSimpleSerializer(qs, many=True).data)
+    qs = resenas_con_participantes().filter(
+        pk__in=Tutoria.objects.filter(reservas__estudiante=user).values('rese\u00f1a')
+    )
+    return _listar(request, qs)
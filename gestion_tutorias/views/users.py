@@ -1,22 +1,132 @@
-from rest_framework import generics, permissions, status
-from rest_framework.response import Response
+from asgiref.sync import sync_to_async
+from rest_framework import generics, permissions
 from django.contrib.auth import get_user_model
-from ..serializers import LoginSerializer, RegisterSerializer, UserSerializer
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.contrib.auth.signals import user_login_failed
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from .. import hashing, renderers
+from ..serializers import LoginDatosSerializer, RegisterSerializer, UserSerializer, datos_login
 
 User = get_user_model()
 
-class LoginView(generics.GenericAPIView):
-    serializer_class = LoginSerializer
-    permission_classes = [permissions.AllowAny]
 
-    def post(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        return Response(serializer.validated_data, status=status.HTTP_200_OK)
+def _json(datos, status=200):
+    # Mismo formato que el JSONRenderer de la API
+    return HttpResponse(renderers.dumps(datos), status=status, content_type='application/json')
 
-class RegisterView(generics.CreateAPIView):
-    serializer_class = RegisterSerializer
-    permission_classes = [permissions.AllowAny]
+
+def _saturado():
+    response = _json({'detail': 'Demasiadas peticiones de acceso simultáneas, intenta de nuevo.'}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _leer_datos(request):
+    if request.content_type == 'application/json':
+        return renderers.loads(request.body or b'{}')
+    return request.POST
+
+
+def _buscar_usuario(email):
+    try:
+        return User._default_manager.get_by_natural_key(email)
+    except User.DoesNotExist:
+        return None
+
+
+def _requiere_rehash(encoded):
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    preferido = get_hasher('default')
+    return hasher.algorithm != preferido.algorithm or preferido.must_update(encoded)
+
+
+def _guardar_password(user, encoded):
+    user.password = encoded
+    user.save(update_fields=['password'])
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncHashView(View):
+    """Vistas async cuyo hash de contraseña corre en ``hashing.get_pool()``.
+
+    Bajo ASGI el worker sigue atendiendo otras peticiones mientras se calcula
+    el hash; bajo WSGI al menos queda acotado cuántos se calculan a la vez.
+    """
+    http_method_names = ['post', 'options']
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = _json({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        response['Allow'] = ', '.join(m.upper() for m in self._allowed_methods())
+
+        async def func():
+            return response
+
+        return func()
+
+
+class LoginView(AsyncHashView):
+    async def post(self, request, *args, **kwargs):
+        try:
+            serializer = LoginDatosSerializer(data=_leer_datos(request))
+        except ValueError as exc:
+            return _json({'detail': f'JSON parse error - {exc}'}, status=400)
+        if not serializer.is_valid():
+            return _json(serializer.errors, status=400)
+        email = serializer.validated_data['email']
+        password = serializer.validated_data['password']
+
+        pool = hashing.get_pool()
+        user = await sync_to_async(_buscar_usuario)(email)
+        try:
+            if user is None:
+                # Como ModelBackend: mismo costo aunque el usuario no exista
+                await pool.ejecutar(make_password, password)
+                valido = False
+            else:
+                valido = await pool.ejecutar(check_password, password, user.password)
+        except hashing.PoolSaturado:
+            return _saturado()
+
+        if not valido or not user.is_active:
+            await sync_to_async(user_login_failed.send)(
+                sender=__name__, credentials={'username': email}, request=request
+            )
+            return _json({'non_field_errors': ['Invalid email or password']}, status=400)
+
+        if _requiere_rehash(user.password):
+            try:
+                encoded = await pool.ejecutar(make_password, password)
+            except hashing.PoolSaturado:
+                pass  # Se actualizará en el próximo login
+            else:
+                await sync_to_async(_guardar_password)(user, encoded)
+
+        return _json(await sync_to_async(datos_login)(user))
+
+
+class RegisterView(AsyncHashView):
+    async def post(self, request, *args, **kwargs):
+        try:
+            serializer = RegisterSerializer(data=_leer_datos(request))
+        except ValueError as exc:
+            return _json({'detail': f'JSON parse error - {exc}'}, status=400)
+        # Validadores de unicidad y de contraseña (consultan la base)
+        if not await sync_to_async(serializer.is_valid)():
+            return _json(serializer.errors, status=400)
+        try:
+            encoded = await hashing.get_pool().ejecutar(
+                make_password, serializer.validated_data['password']
+            )
+        except hashing.PoolSaturado:
+            return _saturado()
+        await sync_to_async(serializer.save)(password_hash=encoded)
+        return _json(serializer.data, status=201)
 
 class MeView(generics.RetrieveAPIView):
     serializer_class = UserSerializer
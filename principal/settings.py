@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     
     'django.middleware.security.SecurityMiddleware',
+    'gestion_tutorias.middleware.CompresionMiddleware',
+    'gestion_tutorias.middleware.InstrumentacionSQLMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -90,8 +93,40 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Conversaciones y mensajes en su propio archivo (ver gestion_tutorias/routers.py);
+    # se migra aparte con: python manage.py migrate --database=mensajeria
+    'mensajeria': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'mensajeria.sqlite3',
+    },
 }
+DATABASE_ROUTERS = ['gestion_tutorias.routers.MensajeriaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Catálogo público; con varios procesos conviene un caché compartido (Redis, Memcached)
+    'catalogo': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalogo',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+CATALOGO_CACHE_ALIAS = 'catalogo'
+CATALOGO_CACHE_TTL = 300  # segundos
+CURSO_FACETAS_TTL = 30  # segundos; conteos por faceta de /filtrar-cursos/
+# Versiones por modelo (claves de listados y ETag). Con memoria local cada
+# proceso tiene las suyas: caducan para acotar cuánto puede quedar atrasado uno
+# que no vio la escritura
+CATALOGO_VERSION_TTL = 3600  # segundos
+# GET condicional (ETag/304): None = solo si el caché 'catalogo' es compartido
+ETAG_CONDICIONAL = None
 
 
 # Password validation
@@ -141,11 +176,20 @@ REST_AUTH ={
 
 REST_FRAMEWORK= {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'dj_rest_auth.jwt_auth.JWTCookieAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'gestion_tutorias.authentication.CachedJWTCookieAuthentication',
+        'gestion_tutorias.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'gestion_tutorias.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'gestion_tutorias.renderers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
@@ -163,8 +207,50 @@ CORS_ALLOW_CREDENTIALS = True
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=2),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'TOKEN_OBTAIN_SERIALIZER': 'gestion_tutorias.authentication.ClaimsTokenObtainPairSerializer',
 }
 
+# Caché por proceso de usuarios autenticados por JWT
+AUTH_USUARIOS_CACHE_MAX = 1024
+AUTH_USUARIOS_CACHE_TTL = 300  # segundos
+
 # Sesiones de Django (para SessionAuthentication y admin)
 SESSION_COOKIE_AGE = 60 * 60 * 2  # 2 horas
 SESSION_SAVE_EVERY_REQUEST = False
+
+# Tiempo real: broker de eventos para el stream SSE de mensajería
+REALTIME_BROKER = 'gestion_tutorias.realtime.InProcessBroker'
+REALTIME_HEARTBEAT_SEGUNDOS = 15
+
+# Mensajería: acumular los incrementos de no leídos y escribirlos por lotes
+MENSAJES_COALESCER_CONTADORES = False
+MENSAJES_COALESCER_INTERVALO = 0.2  # segundos
+
+# Búsqueda de cursos: None elige FTS5 en SQLite e icontains en otras bases
+BUSQUEDA_CURSOS_BACKEND = None
+
+# Hash de contraseñas en login/registro: hilos del pool y trabajos admitidos
+# (en cola + en curso) antes de responder 503. None = valores por defecto.
+PASSWORD_HASH_WORKERS = None  # min(4, núcleos)
+PASSWORD_HASH_MAX_PENDIENTES = None  # 8 por hilo
+
+# Instrumentación SQL por petición (gestion_tutorias/middleware.py): fracción de
+# peticiones medidas y repeticiones de una misma consulta que cuentan como N+1.
+# Apagada por defecto; en desarrollo, INSTRUMENTACION_SQL_MUESTREO=1 en el entorno
+INSTRUMENTACION_SQL_MUESTREO = float(os.environ.get('INSTRUMENTACION_SQL_MUESTREO', 0))
+INSTRUMENTACION_SQL_UMBRAL_REPETIDAS = 5
+
+# Compresión de respuestas (brotli si el paquete está instalado, si no el gzip de Django)
+COMPRESION_MINIMO_BYTES = 1024
+COMPRESION_BROTLI_CALIDAD = 4  # 0-11; más alto comprime más pero cuesta más CPU por respuesta
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'gestion_tutorias.sql': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -0,0 +1,58 @@
+"""
+Perfil de producción: ``DJANGO_SETTINGS_MODULE=principal.settings_prod``.
+
+Parte de ``settings`` y solo cambia lo necesario para servir la API.
+"""
+import copy
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, LOGGING, REST_FRAMEWORK
+
+DEBUG = False
+
+ALLOWED_HOSTS = [h for h in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if h]
+
+# La API solo usa JWT (cabecera o cookie); Basic y Session sobran en cada petición.
+# El admin sigue autenticando con la sesión de Django a través de su middleware.
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'gestion_tutorias.authentication.CachedJWTAuthentication',
+        'gestion_tutorias.authentication.CachedJWTCookieAuthentication',
+    ],
+}
+
+# Si se activa la instrumentación SQL, registrar solo las peticiones sospechosas de N+1
+LOGGING = copy.deepcopy(LOGGING)
+LOGGING['loggers']['gestion_tutorias.sql']['level'] = 'WARNING'
+
+# SQLite en producción. Con WAL los lectores no esperan al escritor (leen la
+# última versión confirmada) y synchronous=NORMAL solo sincroniza el WAL en
+# los checkpoints: un corte de luz puede perder la última transacción, nunca
+# corromper la base. busy_timeout hace esperar a un segundo escritor en vez de
+# fallar con "database is locked"; transaction_mode IMMEDIATE toma el bloqueo
+# de escritura al abrir la transacción, así esa espera ocurre al principio y no
+# a mitad de una transacción que ya leyó.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # ms
+    'cache_size': -64000,  # KiB (negativo = tamaño, no páginas): ~64 MB por conexión
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+SQLITE_INIT_COMMAND = ';'.join(f'PRAGMA {nombre}={valor}' for nombre, valor in SQLITE_PRAGMAS.items())
+
+DATABASES = copy.deepcopy(DATABASES)
+# Mismo perfil para la base principal y la de mensajería; cada archivo tiene su propio WAL
+for _base in DATABASES.values():
+    _base.update({
+        # Conexiones persistentes: sin abrir el archivo ni repetir los PRAGMA en cada petición
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_INIT_COMMAND,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })